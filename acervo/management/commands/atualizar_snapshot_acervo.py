@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from acervo.snapshot import atualizar_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera ou atualiza o snapshot do acervo (acervo/snapshot.py), incremental a partir do atual. '
+        'No deploy, para o primeiro snapshot, e no cron quando ACERVO_SNAPSHOT_SEGUNDO_PLANO = False.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Relê o acervo inteiro, mesmo com um snapshot anterior aproveitável.')
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            resumo = atualizar_snapshot(cursor, completo=options['completo'], podar=True)
+        if resumo is None:
+            raise CommandError('Outro processo está atualizando o snapshot do acervo.')
+
+        snapshot = resumo['snapshot']
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot do acervo na versão {snapshot.versao} ({resumo['modo']}): "
+            f"{snapshot.quantidade} livro(s), {resumo['relidos']} relido(s) do banco, "
+            f"{resumo['podadas']} alteração(ões) antiga(s) apagada(s)."
+        ))
@@ -0,0 +1,102 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        # Esquema base do sistema (antes criado à mão, fora do repositório).
+        # As tabelas não têm models: as views usam SQL direto, e esta
+        # migration é a fonte de verdade da estrutura.
+        #
+        # CREATE TABLE IF NOT EXISTS: em bancos já existentes não altera nada.
+        # A ordem do `migrate` vem só das dependências: as migrations que
+        # usam as tabelas base (emprestimos/0001, gestao_biblioteca/0001,
+        # livros/0003, relatorios/0001) dependem desta; livros/0001 e 0002
+        # só criam tabelas próprias e podem rodar antes.
+        #
+        # Banco que aplicou aquelas migrations antes de esta existir: o
+        # `migrate` acusa InconsistentMigrationHistory. Como as tabelas já
+        # estão lá, basta registrar esta como aplicada, uma vez:
+        #     INSERT INTO django_migrations (app, name, applied)
+        #     VALUES ('acervo', '0001_esquema_base', now());
+        #
+        # As chaves estrangeiras não têm ON DELETE: as views contam com o
+        # IntegrityError para impedir exclusões com vínculos.
+        # Reverter esta migration não apaga as tabelas (nem os dados).
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS Funcionario (
+                    id_funcionario SERIAL PRIMARY KEY,
+                    nome VARCHAR(150) NOT NULL,
+                    email VARCHAR(100) NOT NULL,
+                    senha VARCHAR(150) NOT NULL,
+                    telefone VARCHAR(20),
+                    cpf VARCHAR(11) NOT NULL,
+                    dt_nascimento DATE,
+                    endereco VARCHAR(200),
+                    status VARCHAR(20) NOT NULL DEFAULT 'Ativo'
+                );
+
+                CREATE TABLE IF NOT EXISTS Leitor (
+                    id_leitor SERIAL PRIMARY KEY,
+                    nome VARCHAR(150) NOT NULL,
+                    email VARCHAR(100),
+                    telefone VARCHAR(20),
+                    cpf VARCHAR(11) NOT NULL,
+                    dt_nascimento DATE,
+                    endereco VARCHAR(200),
+                    id_funcionario INTEGER REFERENCES Funcionario (id_funcionario)
+                );
+
+                CREATE TABLE IF NOT EXISTS Autor (
+                    id_autor SERIAL PRIMARY KEY,
+                    nome VARCHAR(150) NOT NULL,
+                    nacionalidade VARCHAR(100),
+                    biografia TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS Livro (
+                    id_livro SERIAL PRIMARY KEY,
+                    nome VARCHAR(200) NOT NULL,
+                    genero VARCHAR(100),
+                    isbn VARCHAR(13),
+                    qtde_exemplares INTEGER NOT NULL DEFAULT 0,
+                    status VARCHAR(20)
+                );
+
+                CREATE TABLE IF NOT EXISTS autor_livro (
+                    id_livro INTEGER NOT NULL REFERENCES Livro (id_livro),
+                    id_autor INTEGER NOT NULL REFERENCES Autor (id_autor),
+                    PRIMARY KEY (id_livro, id_autor)
+                );
+
+                CREATE TABLE IF NOT EXISTS Exemplar (
+                    id_exemplar SERIAL PRIMARY KEY,
+                    id_livro INTEGER NOT NULL REFERENCES Livro (id_livro),
+                    numero_patrimonio INTEGER NOT NULL,
+                    localizacao VARCHAR(500),
+                    dt_aquisicao DATE,
+                    dt_publicacao DATE,
+                    edicao VARCHAR(300)
+                );
+
+                CREATE TABLE IF NOT EXISTS Emprestimo (
+                    id_emprestimo SERIAL PRIMARY KEY,
+                    id_exemplar INTEGER NOT NULL REFERENCES Exemplar (id_exemplar),
+                    id_leitor INTEGER NOT NULL REFERENCES Leitor (id_leitor),
+                    id_funcionario INTEGER REFERENCES Funcionario (id_funcionario),
+                    dt_emprestimo DATE NOT NULL,
+                    dt_prevista_devolucao DATE NOT NULL,
+                    dt_devolucao DATE,
+                    multa NUMERIC(10, 2),
+                    ocorrencia TEXT,
+                    status VARCHAR(20) NOT NULL DEFAULT 'Em Andamento'
+                );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0001_esquema_base'),
+    ]
+
+    operations = [
+        # Índices dos predicados e ordenações que as views realmente usam.
+        # Os de Emprestimo.status (empréstimos ativos e atrasos) ficam em
+        # emprestimos/0004, junto da troca do tipo da coluna.
+        #
+        # Bancos criados à mão podem não ter a PK de autor_livro nem CPF
+        # único: se a migration falhar por duplicidade, remova as linhas
+        # repetidas e rode de novo.
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_constraint
+                        WHERE conrelid = 'autor_livro'::regclass AND contype = 'p'
+                    ) THEN
+                        ALTER TABLE autor_livro ADD PRIMARY KEY (id_livro, id_autor);
+                    END IF;
+                END $$;
+
+                -- Livros de um autor (índice de busca, exclusão de autor)
+                CREATE INDEX IF NOT EXISTS autor_livro_autor_idx
+                    ON autor_livro (id_autor);
+
+                -- Exemplares de um livro (histórico, disponibilidade, filtros)
+                CREATE INDEX IF NOT EXISTS exemplar_livro_idx
+                    ON Exemplar (id_livro);
+
+                -- Cadastro de leitor: checagem de CPF duplicado
+                CREATE UNIQUE INDEX IF NOT EXISTS leitor_cpf_uidx
+                    ON Leitor (cpf);
+
+                -- Login
+                CREATE INDEX IF NOT EXISTS funcionario_email_idx
+                    ON Funcionario (email);
+
+                -- Empréstimos de um leitor (filtro da listagem, exclusão de leitor)
+                CREATE INDEX IF NOT EXISTS emprestimo_leitor_idx
+                    ON Emprestimo (id_leitor);
+
+                -- Histórico do livro: empréstimos dos exemplares por data (keyset)
+                CREATE INDEX IF NOT EXISTS emprestimo_exemplar_data_idx
+                    ON Emprestimo (id_exemplar, dt_emprestimo, id_emprestimo);
+
+                -- Listagens paginadas por nome (gestao_biblioteca/paginacao.py)
+                CREATE INDEX IF NOT EXISTS livro_nome_ordem_idx ON Livro (nome, id_livro);
+                CREATE INDEX IF NOT EXISTS autor_nome_ordem_idx ON Autor (nome, id_autor);
+                CREATE INDEX IF NOT EXISTS leitor_nome_ordem_idx ON Leitor (nome, id_leitor);
+                CREATE INDEX IF NOT EXISTS funcionario_nome_ordem_idx ON Funcionario (nome, id_funcionario);
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS autor_livro_autor_idx;
+                DROP INDEX IF EXISTS exemplar_livro_idx;
+                DROP INDEX IF EXISTS leitor_cpf_uidx;
+                DROP INDEX IF EXISTS funcionario_email_idx;
+                DROP INDEX IF EXISTS emprestimo_leitor_idx;
+                DROP INDEX IF EXISTS emprestimo_exemplar_data_idx;
+                DROP INDEX IF EXISTS livro_nome_ordem_idx;
+                DROP INDEX IF EXISTS autor_nome_ordem_idx;
+                DROP INDEX IF EXISTS leitor_nome_ordem_idx;
+                DROP INDEX IF EXISTS funcionario_nome_ordem_idx;
+            """,
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Tabelas cuja escrita muda o que a página pública do acervo mostra
+TABELAS_ACERVO = [
+    'livro', 'exemplar', 'autor', 'autor_livro', 'emprestimo',
+    # derivadas, lidas pela página (contadores e índice de busca)
+    'livro_disponibilidade', 'livro_busca',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0002_indices_consultas'),
+        ('livros', '0002_busca_livro'),
+    ]
+
+    operations = [
+        # Versão do catálogo (acervo/versao.py): uma linha só, incrementada
+        # por trigger a cada comando que escreve nas tabelas do acervo,
+        # inclusive fora das views (comandos, importação, psql). A linha fica
+        # travada até o COMMIT de quem escreveu, então ninguém lê a versão
+        # nova antes dos dados novos.
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS acervo_versao (
+                    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                    versao BIGINT NOT NULL DEFAULT 1,
+                    alterado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                INSERT INTO acervo_versao (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+                CREATE OR REPLACE FUNCTION incrementar_versao_acervo() RETURNS trigger AS $$
+                BEGIN
+                    UPDATE acervo_versao SET versao = versao + 1, alterado_em = now() WHERE id = 1;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """
+            + ''.join(
+                f"""
+                DROP TRIGGER IF EXISTS versao_acervo_trg ON {tabela};
+                CREATE TRIGGER versao_acervo_trg
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabela}
+                    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_acervo();
+                """
+                for tabela in TABELAS_ACERVO
+            ),
+            reverse_sql=''.join(
+                f"DROP TRIGGER IF EXISTS versao_acervo_trg ON {tabela};\n" for tabela in TABELAS_ACERVO
+            )
+            + """
+                DROP FUNCTION IF EXISTS incrementar_versao_acervo();
+                DROP TABLE IF EXISTS acervo_versao;
+            """,
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Tabelas com id_livro que mudam o que o snapshot guarda de um livro. A
+# troca do nome de um autor chega pelo livro_busca, regerado pelas views.
+TABELAS_SNAPSHOT = ['livro', 'autor_livro', 'livro_busca', 'livro_disponibilidade']
+EVENTOS = {
+    'insert': "INSERT REFERENCING NEW TABLE AS novos",
+    'update': "UPDATE REFERENCING NEW TABLE AS novos",
+    'delete': "DELETE REFERENCING OLD TABLE AS antigos",
+}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0003_versao_acervo'),
+    ]
+
+    operations = [
+        # Livros alterados, para a reconstrução incremental do snapshot do
+        # acervo (acervo/snapshot.py). `xid` é a transação que escreveu: o
+        # snapshot guarda o xmin de quando foi lido e, na próxima vez, relê
+        # só os livros das transações a partir dele (nenhum commit atrasado
+        # fica de fora, ao contrário de um id sequencial). Um trigger por
+        # comando e evento, com tabelas de transição: a reconstrução do
+        # índice de busca inteiro é um INSERT só aqui também.
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS acervo_alteracao (
+                    id_livro INTEGER NOT NULL,
+                    xid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+                    alterado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                CREATE INDEX IF NOT EXISTS acervo_alteracao_xid_idx ON acervo_alteracao (xid);
+                CREATE INDEX IF NOT EXISTS acervo_alteracao_em_idx ON acervo_alteracao (alterado_em);
+
+                CREATE OR REPLACE FUNCTION registrar_alteracao_acervo() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        INSERT INTO acervo_alteracao (id_livro) SELECT DISTINCT id_livro FROM antigos;
+                    ELSE
+                        INSERT INTO acervo_alteracao (id_livro) SELECT DISTINCT id_livro FROM novos;
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """
+            + ''.join(
+                f"""
+                DROP TRIGGER IF EXISTS alteracao_acervo_{evento}_trg ON {tabela};
+                CREATE TRIGGER alteracao_acervo_{evento}_trg
+                    AFTER {clausula}
+                    FOR EACH STATEMENT EXECUTE FUNCTION registrar_alteracao_acervo();
+                """
+                for tabela in TABELAS_SNAPSHOT
+                for evento, clausula in EVENTOS.items()
+            ),
+            reverse_sql=''.join(
+                f"DROP TRIGGER IF EXISTS alteracao_acervo_{evento}_trg ON {tabela};\n"
+                for tabela in TABELAS_SNAPSHOT
+                for evento in EVENTOS
+            )
+            + """
+                DROP FUNCTION IF EXISTS registrar_alteracao_acervo();
+                DROP TABLE IF EXISTS acervo_alteracao;
+            """,
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# Empréstimo e devolução chegam à página pelo livro_disponibilidade: o
+# trigger direto em Emprestimo só fazia a versão subir mais vezes
+TABELAS_REMOVIDAS = ['emprestimo']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0004_alteracoes_acervo'),
+    ]
+
+    operations = [
+        # Versão do catálogo (acervo/versao.py) sobe uma vez por transação, no
+        # COMMIT. Antes, todo comando nas tabelas do acervo fazia UPDATE na
+        # linha única de acervo_versao e a segurava até o COMMIT: empréstimos,
+        # devoluções e importações simultâneos esperavam uns pelos outros.
+        #
+        # Agora o trigger por comando só marca a transação (set_config local,
+        # sem trava) e grava uma linha em acervo_versao_pendente; o constraint
+        # trigger adiado dessa tabela incrementa a versão na hora do COMMIT.
+        # A linha de acervo_versao fica travada só durante o próprio COMMIT, e
+        # a versão nova continua aparecendo junto com os dados novos.
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS acervo_versao_pendente (
+                    xid XID8 PRIMARY KEY DEFAULT pg_current_xact_id()
+                );
+
+                CREATE OR REPLACE FUNCTION incrementar_versao_acervo() RETURNS trigger AS $$
+                BEGIN
+                    IF current_setting('biblioteca.versao_acervo_xid', true)
+                            IS DISTINCT FROM pg_current_xact_id()::text THEN
+                        PERFORM set_config('biblioteca.versao_acervo_xid', pg_current_xact_id()::text, true);
+                        INSERT INTO acervo_versao_pendente DEFAULT VALUES ON CONFLICT DO NOTHING;
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION aplicar_versao_acervo() RETURNS trigger AS $$
+                BEGIN
+                    UPDATE acervo_versao SET versao = versao + 1, alterado_em = now() WHERE id = 1;
+                    DELETE FROM acervo_versao_pendente WHERE xid = NEW.xid;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS aplicar_versao_acervo_trg ON acervo_versao_pendente;
+                CREATE CONSTRAINT TRIGGER aplicar_versao_acervo_trg
+                    AFTER INSERT ON acervo_versao_pendente
+                    DEFERRABLE INITIALLY DEFERRED
+                    FOR EACH ROW EXECUTE FUNCTION aplicar_versao_acervo();
+            """
+            + ''.join(f"DROP TRIGGER IF EXISTS versao_acervo_trg ON {tabela};\n" for tabela in TABELAS_REMOVIDAS),
+            reverse_sql=''.join(
+                f"""
+                CREATE TRIGGER versao_acervo_trg
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabela}
+                    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_acervo();
+                """
+                for tabela in TABELAS_REMOVIDAS
+            )
+            + """
+                CREATE OR REPLACE FUNCTION incrementar_versao_acervo() RETURNS trigger AS $$
+                BEGIN
+                    UPDATE acervo_versao SET versao = versao + 1, alterado_em = now() WHERE id = 1;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TABLE IF EXISTS acervo_versao_pendente;
+                DROP FUNCTION IF EXISTS aplicar_versao_acervo();
+            """,
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+EVENTOS = ['insert', 'update', 'delete']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0005_versao_por_transacao'),
+    ]
+
+    operations = [
+        # acervo_alteracao (acervo/0004) passa a registrar só mudanças de
+        # catálogo (livro, autor_livro, livro_busca). A disponibilidade muda a
+        # cada empréstimo e devolução: o snapshot relê os contadores inteiros
+        # a cada atualização (acervo/snapshot.py), sem precisar do registro,
+        # que assim não cresce com a circulação. As linhas antigas saem na
+        # poda por ACERVO_SNAPSHOT_RETENCAO.
+        migrations.RunSQL(
+            sql=''.join(
+                f"DROP TRIGGER IF EXISTS alteracao_acervo_{evento}_trg ON livro_disponibilidade;\n"
+                for evento in EVENTOS
+            ),
+            reverse_sql=''.join(
+                f"""
+                CREATE TRIGGER alteracao_acervo_{evento}_trg
+                    AFTER {evento.upper()} ON livro_disponibilidade
+                    REFERENCING {'OLD' if evento == 'delete' else 'NEW'} TABLE AS {'antigos' if evento == 'delete' else 'novos'}
+                    FOR EACH STATEMENT EXECUTE FUNCTION registrar_alteracao_acervo();
+                """
+                for evento in EVENTOS
+            ),
+        ),
+    ]
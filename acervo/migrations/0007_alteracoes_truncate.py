@@ -0,0 +1,44 @@
+from django.db import migrations
+
+TABELAS_CATALOGO = ['livro', 'autor_livro', 'livro_busca']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0006_alteracoes_so_catalogo'),
+    ]
+
+    operations = [
+        # TRUNCATE não dispara os triggers de linha nem tem tabela de
+        # transição: registra o marcador id_livro = 0 (ALTERACAO_TRUNCATE em
+        # acervo/snapshot.py), que leva a próxima reconstrução do snapshot a
+        # reler tudo. Sem isso, depois de um limpar_dados com menos livros, a
+        # reconstrução incremental mantinha os livros apagados na página.
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION registrar_truncate_acervo() RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO acervo_alteracao (id_livro) VALUES (0);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """
+            + ''.join(
+                f"""
+                DROP TRIGGER IF EXISTS alteracao_acervo_truncate_trg ON {tabela};
+                CREATE TRIGGER alteracao_acervo_truncate_trg
+                    AFTER TRUNCATE ON {tabela}
+                    FOR EACH STATEMENT EXECUTE FUNCTION registrar_truncate_acervo();
+                """
+                for tabela in TABELAS_CATALOGO
+            ),
+            reverse_sql=''.join(
+                f"DROP TRIGGER IF EXISTS alteracao_acervo_truncate_trg ON {tabela};\n"
+                for tabela in TABELAS_CATALOGO
+            )
+            + """
+                DROP FUNCTION IF EXISTS registrar_truncate_acervo();
+            """,
+        ),
+    ]
@@ -0,0 +1,576 @@
+"""
+Snapshot do catálogo em arquivo, mapeado em memória pelos workers.
+
+A página pública do acervo é quase só leitura, mas cada busca ia ao banco
+(livros, autores e contadores). O snapshot é um arquivo binário compacto
+com tudo o que ela mostra, gravado em ACERVO_SNAPSHOT_DIR e aberto com
+mmap por todos os processos do servidor: o sistema operacional guarda uma
+cópia só na memória, e a listagem e a busca rodam sobre ele sem consultar
+o banco.
+
+Formato (inteiros de 32 bits na ordem de bytes da máquina que gravou):
+
+    cabeçalho    CABECALHO: versão do acervo, xmin, horários e tamanhos
+    ids          int32[n]      id_livro, na ordem de exibição (por nome)
+    total        int32[n]      total_exemplares
+    emprestados  int32[n]      qtd_emprestados
+    disponiveis  int32[n]      exemplares_disponiveis
+    pos_exibicao uint32[4n+1]  início do nome, gênero, ISBN e autores de cada livro
+    pos_doc      uint32[n+1]   início do documento de busca de cada livro
+    exibição     UTF-8         os textos exibidos, em sequência
+    documentos   UTF-8         livro_busca.documento de cada livro, terminado
+                               em \\0 para uma busca não emendar dois livros
+
+Requisições nunca gravam o snapshot: a cada ACERVO_SNAPSHOT_VERIFICAR
+segundos cada processo remapeia o arquivo `atual` e compara a versão dele
+com a do banco (acervo_versao), numa consulta de uma linha. Se ficou para
+trás, a reconstrução vai para uma thread em segundo plano (uma por
+processo; entre processos, trava no banco) ou para o cron com
+`manage.py atualizar_snapshot_acervo`. Enquanto isso:
+
+- mudou o catálogo (título, autores, gênero, ISBN: há linhas novas em
+  `acervo_alteracao`, acervo/0004 e 0006), a página consulta o banco;
+- só giraram empréstimos, o snapshot continua servindo por até
+  ACERVO_SNAPSHOT_TOLERANCIA segundos, com a disponibilidade um pouco
+  atrasada.
+
+A reconstrução é incremental: os contadores de disponibilidade são
+relidos inteiros (uma leitura estreita de livro_disponibilidade), mas os
+textos só dos livros alterados; sem alteração no catálogo, o resto do
+arquivo anterior é copiado byte a byte, sem reordenar nada.
+
+Cada arquivo tem nome único e o arquivo `atual` aponta para o mais novo:
+trocar o ponteiro (os.replace) não atrapalha quem ainda lê o anterior. Um
+TRUNCATE (limpar_dados dos dados sintéticos, por exemplo) não tem linhas
+para registrar: o trigger grava o marcador ALTERACAO_TRUNCATE
+(acervo/0007) e a próxima reconstrução é completa.
+"""
+import array
+import bisect
+import heapq
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from gestao_biblioteca.replica import alias_leitura
+
+logger = logging.getLogger('biblioteca.acervo')
+
+MAGICO = b'ACVS'
+FORMATO = 1
+# mágico, formato, little-endian, versão, xmin, alterado_em, gerado_em,
+# quantidade, bytes de exibição, bytes de documentos, reservado
+CABECALHO = struct.Struct('<4sHHqqddIIII')
+CAMPOS_EXIBICAO = 4  # nome, gênero, ISBN, autores
+SEPARADOR_AUTORES = '\x1f'
+PONTEIRO = 'atual'
+ARQUIVOS_MANTIDOS = 3
+CHAVE_TRAVA = 'acervo:snapshot'
+# id_livro registrado em acervo_alteracao por um TRUNCATE (nenhum livro tem id 0)
+ALTERACAO_TRUNCATE = 0
+
+# Estado do catálogo no momento da leitura. O xmin é a transação mais
+# antiga ainda aberta: tudo antes dele já está nos dados lidos em seguida
+SQL_ESTADO = """
+    SELECT
+        versao,
+        EXTRACT(EPOCH FROM alterado_em)::float8,
+        pg_snapshot_xmin(pg_current_snapshot())::text::bigint,
+        EXTRACT(EPOCH FROM now())::float8
+    FROM acervo_versao WHERE id = 1
+"""
+
+SQL_LIVROS = """
+    SELECT
+        Livro.id_livro, Livro.nome, Livro.genero, Livro.isbn,
+        (
+            SELECT string_agg(nome, %s ORDER BY nome) FROM Autor
+            WHERE id_autor IN (SELECT id_autor FROM autor_livro WHERE id_livro = Livro.id_livro)
+        ) AS autores,
+        livro_busca.documento
+    FROM Livro
+    LEFT JOIN livro_busca ON livro_busca.id_livro = Livro.id_livro
+    {filtro}
+"""
+
+SQL_CONTADORES = """
+    SELECT id_livro, total_exemplares, qtd_emprestados, exemplares_disponiveis
+    FROM livro_disponibilidade
+"""
+
+# Conferência feita pelas requisições: versão, se o catálogo mudou desde o
+# xmin do snapshot (índice em xid) e a hora do banco
+SQL_CONFERIR = """
+    SELECT
+        versao,
+        EXISTS (SELECT 1 FROM acervo_alteracao WHERE xid >= %s::text::xid8),
+        EXTRACT(EPOCH FROM now())::float8
+    FROM acervo_versao WHERE id = 1
+"""
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, como o lower(unaccent(...)) do documento de busca."""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+
+def _radical(palavra):
+    """Corta o plural ("livros" -> "livro", "flores" -> "flor"), no lugar do stemming do full-text."""
+    if len(palavra) > 4 and palavra.endswith('es'):
+        return palavra[:-2]
+    if len(palavra) > 3 and palavra.endswith('s'):
+        return palavra[:-1]
+    return palavra
+
+
+def _trigramas(texto):
+    """Trigramas de cada palavra, com as mesmas bordas do pg_trgm."""
+    trigramas = set()
+    for palavra in re.findall(r'\w+', texto):
+        palavra = f'  {palavra} '
+        trigramas.update(palavra[k:k + 3] for k in range(len(palavra) - 2))
+    return trigramas
+
+
+def similaridade(a, b):
+    """similarity() do pg_trgm: trigramas em comum / trigramas no total."""
+    trigramas_a, trigramas_b = _trigramas(a), _trigramas(b)
+    if not trigramas_a or not trigramas_b:
+        return 0.0
+    return len(trigramas_a & trigramas_b) / len(trigramas_a | trigramas_b)
+
+
+class SnapshotAcervo:
+    """Um arquivo de snapshot, mapeado só para leitura. Os arrays são vistas sobre o mmap (sem cópia)."""
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        with open(self.caminho, 'rb') as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magico, formato, little_endian, self.versao, self.xmin, alterado_em, self.gerado_em,
+         quantidade, tamanho_exibicao, tamanho_documentos, _reservado) = CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO or formato != FORMATO or bool(little_endian) != (sys.byteorder == 'little'):
+            raise ValueError(f'{self.caminho.name}: formato de snapshot desconhecido')
+        tamanho_esperado = (
+            CABECALHO.size + 4 * (quantidade * (4 + CAMPOS_EXIBICAO + 1) + 2)
+            + tamanho_exibicao + tamanho_documentos
+        )
+        if len(self._mapa) != tamanho_esperado:
+            raise ValueError(f'{self.caminho.name}: arquivo truncado')
+
+        self.alterado_em = datetime.fromtimestamp(alterado_em, tz=dt_timezone.utc)
+        self.quantidade = quantidade
+
+        visao = memoryview(self._mapa)
+        posicao = CABECALHO.size
+
+        def fatia(tamanho, tipo=None):
+            nonlocal posicao
+            parte = visao[posicao:posicao + tamanho]
+            posicao += tamanho
+            return parte.cast(tipo) if tipo else parte
+
+        self.ids = fatia(4 * quantidade, 'i')
+        self.total = fatia(4 * quantidade, 'i')
+        self.emprestados = fatia(4 * quantidade, 'i')
+        self.disponiveis = fatia(4 * quantidade, 'i')
+        # Daqui até o fim (posições e textos) só muda quando muda o catálogo
+        self._inicio_textos = posicao
+        self.pos_exibicao = fatia(4 * (CAMPOS_EXIBICAO * quantidade + 1), 'I')
+        self.pos_doc = fatia(4 * (quantidade + 1), 'I')
+        self._exibicao = fatia(tamanho_exibicao)
+        # Os documentos são buscados direto no mmap (mmap.find), por posição
+        self._inicio_documentos = posicao
+        self._fim_documentos = posicao + tamanho_documentos
+
+    def _campos(self, i):
+        base = i * CAMPOS_EXIBICAO
+        return [
+            str(self._exibicao[self.pos_exibicao[base + k]:self.pos_exibicao[base + k + 1]], 'utf-8')
+            for k in range(CAMPOS_EXIBICAO)
+        ]
+
+    def documento(self, i):
+        inicio = self._inicio_documentos + self.pos_doc[i]
+        fim = self._inicio_documentos + self.pos_doc[i + 1] - 1
+        return str(self._mapa[inicio:fim], 'utf-8')
+
+    def registro(self, i):
+        """Textos do livro `i` no formato gravado (usados na reconstrução incremental)."""
+        nome, genero, isbn, autores = self._campos(i)
+        return (self.ids[i], nome, genero, isbn, autores, self.documento(i))
+
+    def livro(self, i):
+        """Livro `i` com os mesmos campos que o `_buscar_livros` do acervo monta a partir do banco."""
+        nome, genero, isbn, autores = self._campos(i)
+        return {
+            'pk': self.ids[i],
+            'nome': nome,
+            'genero': genero or None,
+            'isbn': isbn or None,
+            'autores_list': [{'nome': autor} for autor in autores.split(SEPARADOR_AUTORES) if autor],
+            'total_exemplares': self.total[i],
+            'qtd_emprestados': self.emprestados[i],
+            'exemplares_disponiveis': self.disponiveis[i],
+        }
+
+    def livros(self):
+        """O acervo inteiro, por nome."""
+        return [self.livro(i) for i in range(self.quantidade)]
+
+    def _contendo(self, trecho):
+        """Índices dos livros cujo documento contém `trecho` (bytes): mmap.find pula de livro em livro."""
+        encontrados = []
+        posicao = self._mapa.find(trecho, self._inicio_documentos, self._fim_documentos)
+        while posicao != -1:
+            i = bisect.bisect_right(self.pos_doc, posicao - self._inicio_documentos) - 1
+            encontrados.append(i)
+            posicao = self._mapa.find(
+                trecho, self._inicio_documentos + self.pos_doc[i + 1], self._fim_documentos
+            )
+        return encontrados
+
+    def buscar(self, termo):
+        """
+        Livros que casam com `termo`, os mais relevantes primeiro, no lugar
+        de condicao_busca/relevancia_busca (livros/busca.py):
+
+        - casa quem contém o termo inteiro (o LIKE) ou todas as palavras,
+          sem o plural (aproxima o full-text em português);
+        - relevância: palavras no título valem mais que no resto (os pesos
+          A/B/C do tsvector) + similaridade por trigramas; empate por nome.
+        """
+        termo = normalizar(termo.strip())
+        radicais = [_radical(palavra) for palavra in re.findall(r'\w+', termo)]
+        chave = max(radicais, key=len) if radicais else termo
+        if not chave:
+            return []
+
+        pontuados = []
+        for i in self._contendo(chave.encode('utf-8')):
+            documento = self.documento(i)
+            if termo not in documento and not all(radical in documento for radical in radicais):
+                continue
+            titulo = normalizar(self._campos(i)[0])
+            peso = (
+                sum(1.0 if radical in titulo else 0.4 for radical in radicais) / len(radicais)
+                if radicais else 0.0
+            )
+            pontuados.append((-(peso + similaridade(documento, termo)), i))
+
+        pontuados.sort()
+        return [self.livro(i) for _relevancia, i in pontuados]
+
+
+# --- Gravação ---
+
+def _diretorio():
+    return Path(getattr(settings, 'ACERVO_SNAPSHOT_DIR', Path(settings.BASE_DIR) / 'snapshot_acervo'))
+
+
+def _registro(linha):
+    """Linha de SQL_LIVROS -> textos gravados no snapshot."""
+    id_livro, nome, genero, isbn, autores, documento = linha
+    nome, genero, isbn, autores = nome or '', genero or '', isbn or '', autores or ''
+    if documento is None:
+        # Livro ainda sem índice de busca: mesmo texto que atualizar_indice_busca gravaria
+        documento = normalizar(' '.join(
+            filter(None, [nome, autores.replace(SEPARADOR_AUTORES, ' '), genero, isbn])
+        ))
+    return (id_livro, nome, genero, isbn, autores, documento.replace('\0', ' '))
+
+
+def _ordem(registro):
+    return (normalizar(registro[1]), registro[0])
+
+
+def _arrays_contadores(ids, contadores):
+    """total, emprestados e disponíveis na ordem de `ids` (livro sem contador: zeros)."""
+    total, emprestados, disponiveis = (array.array('i') for _ in range(3))
+    for id_livro in ids:
+        qtd_total, qtd_emprestados, qtd_disponiveis = contadores.get(id_livro, (0, 0, 0))
+        total.append(qtd_total or 0)
+        emprestados.append(qtd_emprestados or 0)
+        disponiveis.append(qtd_disponiveis or 0)
+    return total, emprestados, disponiveis
+
+
+def _escrever(diretorio, estado, quantidade, tamanho_exibicao, tamanho_documentos, partes):
+    """Grava cabeçalho + `partes` num arquivo novo (nome único) e devolve o nome dele."""
+    versao, xmin, alterado_em, gerado_em = estado
+    cabecalho = CABECALHO.pack(
+        MAGICO, FORMATO, sys.byteorder == 'little', versao, xmin, alterado_em, gerado_em,
+        quantidade, tamanho_exibicao, tamanho_documentos, 0,
+    )
+    nome_arquivo = f'acervo-{versao}-{os.getpid()}-{time.time_ns()}.snap'
+    temporario = diretorio / f'{nome_arquivo}.tmp'
+    with open(temporario, 'wb') as arquivo:
+        for parte in (cabecalho, *partes):
+            arquivo.write(parte)
+    os.replace(temporario, diretorio / nome_arquivo)
+    return nome_arquivo
+
+
+def _gravar(diretorio, registros, contadores, estado):
+    """Grava `registros` (já na ordem de exibição) com os `contadores` atuais."""
+    ids = array.array('i')
+    pos_exibicao, pos_doc = array.array('I', [0]), array.array('I', [0])
+    exibicao, documentos = bytearray(), bytearray()
+
+    for id_livro, nome, genero, isbn, autores, documento in registros:
+        ids.append(id_livro)
+        for texto in (nome, genero, isbn, autores):
+            exibicao += texto.encode('utf-8')
+            pos_exibicao.append(len(exibicao))
+        documentos += documento.encode('utf-8') + b'\0'
+        pos_doc.append(len(documentos))
+
+    return _escrever(
+        diretorio, estado, len(ids), len(exibicao), len(documentos),
+        (ids, *_arrays_contadores(ids, contadores), pos_exibicao, pos_doc, exibicao, documentos),
+    )
+
+
+def _gravar_contadores(diretorio, anterior, contadores, estado):
+    """Mesmos livros e textos do `anterior` (copiados byte a byte), com os contadores novos."""
+    tamanho_exibicao = len(anterior._exibicao)
+    tamanho_documentos = anterior._fim_documentos - anterior._inicio_documentos
+    return _escrever(
+        diretorio, estado, anterior.quantidade, tamanho_exibicao, tamanho_documentos,
+        (anterior.ids, *_arrays_contadores(anterior.ids, contadores), anterior._mapa[anterior._inicio_textos:]),
+    )
+
+
+def _apontar(diretorio, nome_arquivo):
+    temporario = diretorio / f'{PONTEIRO}.{os.getpid()}.tmp'
+    temporario.write_text(nome_arquivo, encoding='utf-8')
+    os.replace(temporario, diretorio / PONTEIRO)
+
+
+def _limpar(diretorio, atual):
+    """
+    Apaga os arquivos antigos. Quem ainda tem um deles mapeado continua
+    lendo (no Windows o arquivo mapeado não sai; fica para a próxima).
+    """
+    try:
+        arquivos = sorted(diretorio.glob('acervo-*.snap'), key=lambda caminho: caminho.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for caminho in arquivos[ARQUIVOS_MANTIDOS:]:
+        if caminho.name != atual:
+            try:
+                caminho.unlink()
+            except OSError:
+                pass
+
+
+# Snapshot mapeado por este processo (trocado quando `atual` muda)
+_mapeado = {'snapshot': None}
+
+
+def abrir_atual():
+    """Snapshot apontado por `atual`, mapeado uma vez por processo; None se ainda não existe."""
+    diretorio = _diretorio()
+    try:
+        nome_arquivo = (diretorio / PONTEIRO).read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+
+    atual = _mapeado['snapshot']
+    if atual is not None and atual.caminho.name == nome_arquivo:
+        return atual
+    try:
+        atual = SnapshotAcervo(diretorio / nome_arquivo)
+    except (OSError, ValueError) as erro:
+        logger.warning('Snapshot do acervo ilegível (%s): %s', nome_arquivo, erro)
+        return None
+    # O anterior é fechado pelo coletor quando a última requisição que o usa terminar
+    _mapeado['snapshot'] = atual
+    return atual
+
+
+def reconstruir(cursor, completo=False):
+    """
+    Atualiza o snapshot para a versão do catálogo no banco de `cursor`,
+    sempre a partir do atual quando possível. Devolve um resumo
+    {'snapshot', 'modo', 'relidos'}; modo: 'em dia', 'contadores' (só a
+    disponibilidade mudou), 'incremental' ou 'completo'.
+    """
+    anterior = None if completo else abrir_atual()
+    cursor.execute(SQL_ESTADO)
+    versao, alterado_em, xmin, agora = cursor.fetchone()
+    if anterior is not None and anterior.versao >= versao:
+        return {'snapshot': anterior, 'modo': 'em dia', 'relidos': 0}
+
+    # Incremental só enquanto as alterações desde o anterior ainda estão
+    # guardadas; alterações demais, mais barato reler tudo de uma vez
+    alterados = None
+    retencao = getattr(settings, 'ACERVO_SNAPSHOT_RETENCAO', 24 * 60 * 60)
+    if anterior is not None and agora - anterior.gerado_em < retencao:
+        cursor.execute(
+            "SELECT DISTINCT id_livro FROM acervo_alteracao WHERE xid >= %s::text::xid8",
+            [str(anterior.xmin)]
+        )
+        alterados = {row[0] for row in cursor.fetchall()}
+        # Depois de um TRUNCATE, o anterior pode ter livros que não existem mais
+        if ALTERACAO_TRUNCATE in alterados or len(alterados) > anterior.quantidade // 2:
+            alterados = None
+
+    cursor.execute(SQL_CONTADORES)
+    contadores = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    diretorio = _diretorio()
+    diretorio.mkdir(parents=True, exist_ok=True)
+    estado = (versao, xmin, alterado_em, agora)
+    if alterados is None:
+        cursor.execute(SQL_LIVROS.format(filtro=''), [SEPARADOR_AUTORES])
+        registros = sorted((_registro(linha) for linha in cursor.fetchall()), key=_ordem)
+        nome_arquivo = _gravar(diretorio, registros, contadores, estado)
+        modo, relidos = 'completo', len(registros)
+    elif not alterados:
+        nome_arquivo = _gravar_contadores(diretorio, anterior, contadores, estado)
+        modo, relidos = 'contadores', 0
+    else:
+        cursor.execute(
+            SQL_LIVROS.format(filtro='WHERE Livro.id_livro = ANY(%s)'),
+            [SEPARADOR_AUTORES, list(alterados)]
+        )
+        novos = sorted((_registro(linha) for linha in cursor.fetchall()), key=_ordem)
+        # Os não alterados já estão em ordem: intercala em vez de reordenar tudo
+        mantidos = (
+            anterior.registro(i) for i in range(anterior.quantidade) if anterior.ids[i] not in alterados
+        )
+        nome_arquivo = _gravar(diretorio, heapq.merge(mantidos, novos, key=_ordem), contadores, estado)
+        modo, relidos = 'incremental', len(alterados)
+
+    # Outro processo pode ter gravado um mais novo enquanto isso: o ponteiro só avança
+    atual = abrir_atual()
+    if atual is None or atual.versao < versao:
+        _apontar(diretorio, nome_arquivo)
+    _limpar(diretorio, nome_arquivo)
+
+    logger.info('Snapshot do acervo na versão %s (%s, %s livro(s) relido(s)).', versao, modo, relidos)
+    return {'snapshot': abrir_atual(), 'modo': modo, 'relidos': relidos}
+
+
+def podar_alteracoes(cursor):
+    """Apaga as alterações mais velhas que ACERVO_SNAPSHOT_RETENCAO (só no primário)."""
+    retencao = getattr(settings, 'ACERVO_SNAPSHOT_RETENCAO', 24 * 60 * 60)
+    cursor.execute(
+        "DELETE FROM acervo_alteracao WHERE alterado_em < now() - make_interval(secs => %s)",
+        [retencao]
+    )
+    return cursor.rowcount
+
+
+def atualizar_snapshot(cursor, completo=False, podar=False):
+    """`reconstruir` sob a trava do banco: None se outro processo já está reconstruindo."""
+    cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [CHAVE_TRAVA])
+    if not cursor.fetchone()[0]:
+        return None
+    try:
+        resumo = reconstruir(cursor, completo)
+        if podar:
+            resumo['podadas'] = podar_alteracoes(cursor)
+        return resumo
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [CHAVE_TRAVA])
+
+
+# --- Uso pelas requisições ---
+
+# Última conferência da versão, por banco de leitura (réplica e primário
+# podem estar em versões diferentes), compartilhada pelas threads
+_estados = {}
+_trava = threading.Lock()
+_segundo_plano = {'thread': None}
+
+
+def _reconstruir_em_segundo_plano(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            atualizar_snapshot(cursor, podar=alias == DEFAULT_DB_ALIAS)
+    except Exception:
+        logger.exception('Falha ao reconstruir o snapshot do acervo.')
+    finally:
+        # A conexão é desta thread; e a próxima requisição já confere o arquivo novo
+        connections[alias].close()
+        _estados.clear()
+
+
+def _agendar_reconstrucao(alias):
+    """Dispara a reconstrução numa thread (no máximo uma por processo), fora da requisição."""
+    if not getattr(settings, 'ACERVO_SNAPSHOT_SEGUNDO_PLANO', True):
+        return
+    thread = _segundo_plano['thread']
+    if thread is not None and thread.is_alive():
+        return
+    thread = threading.Thread(
+        target=_reconstruir_em_segundo_plano, args=(alias,), name='snapshot-acervo', daemon=True
+    )
+    _segundo_plano['thread'] = thread
+    thread.start()
+
+
+def _verificar(alias):
+    """Snapshot que pode servir as leituras de `alias` agora, ou None. Nunca reconstrói aqui."""
+    snapshot = abrir_atual()
+    try:
+        with connections[alias].cursor() as cursor:
+            if snapshot is None:
+                cursor.execute("SELECT versao, true, 0 FROM acervo_versao WHERE id = 1")
+            else:
+                cursor.execute(SQL_CONFERIR, [str(snapshot.xmin)])
+            versao, catalogo_alterado, agora = cursor.fetchone()
+    except DatabaseError as erro:
+        logger.warning('Snapshot do acervo não conferido, consultando o banco: %s', erro)
+        return None
+
+    if snapshot is not None and snapshot.versao >= versao:
+        return snapshot
+    _agendar_reconstrucao(alias)
+    # Só a disponibilidade atrasada (empréstimos): serve enquanto a thread atualiza
+    tolerancia = getattr(settings, 'ACERVO_SNAPSHOT_TOLERANCIA', 60)
+    if snapshot is not None and not catalogo_alterado and agora - snapshot.gerado_em < tolerancia:
+        return snapshot
+    return None
+
+
+def snapshot_em_dia():
+    """
+    Snapshot para a requisição atual, se ele pode servir as leituras do
+    banco dela; senão None (e o acervo consulta o banco). Conferido a cada
+    ACERVO_SNAPSHOT_VERIFICAR segundos por uma thread só; as outras usam a
+    conferência anterior.
+    """
+    if not getattr(settings, 'ACERVO_SNAPSHOT', False):
+        return None
+
+    alias = alias_leitura()
+    estado = _estados.get(alias)
+    intervalo = getattr(settings, 'ACERVO_SNAPSHOT_VERIFICAR', 5)
+    if estado is not None and time.monotonic() - estado['verificado_em'] < intervalo:
+        return estado['snapshot']
+    if not _trava.acquire(blocking=False):
+        # Outra thread conferindo: esta vai ao banco
+        return None
+
+    try:
+        snapshot = _verificar(alias)
+        _estados[alias] = {'verificado_em': time.monotonic(), 'snapshot': snapshot}
+        return snapshot
+    finally:
+        _trava.release()
@@ -0,0 +1,114 @@
+"""
+Versão do catálogo e cache da página pública do acervo.
+
+`acervo_versao` é incrementada por trigger (acervo/0003 e 0005) uma vez
+por transação que escreve em Livro, Exemplar, Autor, autor_livro ou nas
+tabelas derivadas que a página lê (contadores e índice de busca), no
+COMMIT. Empréstimos chegam pelos contadores. Com ela:
+
+- GET condicional: ETag = versão + busca (+ funcionário logado, pois o
+  menu muda) e Last-Modified = hora da última escrita. Quem já tem a
+  página recebe 304 sem nenhuma consulta além da versão;
+- cache de fragmento: o HTML dos resultados fica no cache sob
+  `acervo:resultados:<versão>:<busca>`. Uma escrita muda a versão e as
+  chaves antigas simplesmente deixam de ser lidas (expiram sozinhas).
+
+A versão é lida pela conexão de leitura da requisição (réplica ou
+primário, gestao_biblioteca/replica.py), a mesma dos resultados.
+
+Com o snapshot do acervo em dia (acervo/snapshot.py), a versão é a dele e
+os fragmentos ficam num cache local do processo: a página não consulta o
+banco (nem o cache, que também fica no banco).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from gestao_biblioteca.replica import conexao_leitura
+from .snapshot import snapshot_em_dia
+
+# Tempo máximo de vida de um fragmento (a versão já invalida)
+TEMPO_CACHE = 60 * 60
+# Fragmentos guardados por processo quando a página vem do snapshot
+FRAGMENTOS_LOCAIS = 64
+
+_fragmentos = OrderedDict()
+_trava_fragmentos = threading.Lock()
+
+
+def snapshot_acervo(request):
+    """Snapshot em dia para a requisição, ou None (consulta o banco). Conferido uma vez por requisição."""
+    if not hasattr(request, '_snapshot_acervo'):
+        request._snapshot_acervo = snapshot_em_dia()
+    return request._snapshot_acervo
+
+
+def versao_acervo(request):
+    """(versão, alterado_em) do catálogo, lida uma vez por requisição."""
+    if not hasattr(request, '_versao_acervo'):
+        snapshot = snapshot_acervo(request)
+        if snapshot is not None:
+            request._versao_acervo = (snapshot.versao, snapshot.alterado_em)
+            return request._versao_acervo
+        try:
+            with conexao_leitura().cursor() as cursor:
+                cursor.execute("SELECT versao, alterado_em FROM acervo_versao WHERE id = 1")
+                row = cursor.fetchone()
+        except DatabaseError:
+            # Sem versão (banco fora do ar, migration pendente): sem cache,
+            # a view trata o erro como antes
+            row = None
+        request._versao_acervo = row or (None, None)
+    return request._versao_acervo
+
+
+def _resumo_busca(query):
+    return hashlib.sha1(query.strip().encode('utf-8')).hexdigest()[:16]
+
+
+def etag_acervo(request):
+    versao, _alterado_em = versao_acervo(request)
+    if versao is None:
+        return None
+    funcionario = request.session.get('funcionario_logado_id', '')
+    return f"acervo-{versao}-{funcionario}-{_resumo_busca(request.GET.get('q', ''))}"
+
+
+def ultima_alteracao_acervo(request):
+    return versao_acervo(request)[1]
+
+
+def resultados_em_cache(request, query, montar):
+    """HTML dos resultados de `query` do cache, ou `montar()` (que consulta o banco)."""
+    versao, _alterado_em = versao_acervo(request)
+    if versao is None:
+        return montar()
+
+    chave = f'acervo:resultados:{versao}:{_resumo_busca(query)}'
+    if snapshot_acervo(request) is not None:
+        return _fragmento_local(chave, montar)
+
+    html = cache.get(chave)
+    if html is None:
+        html = montar()
+        cache.set(chave, html, TEMPO_CACHE)
+    return html
+
+
+def _fragmento_local(chave, montar):
+    """Cache LRU do processo: as chaves trazem a versão, então só o tamanho precisa de limite."""
+    with _trava_fragmentos:
+        html = _fragmentos.get(chave)
+        if html is not None:
+            _fragmentos.move_to_end(chave)
+            return html
+
+    html = montar()
+    with _trava_fragmentos:
+        _fragmentos[chave] = html
+        while len(_fragmentos) > FRAGMENTOS_LOCAIS:
+            _fragmentos.popitem(last=False)
+    return html
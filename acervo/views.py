@@ -1,6 +1,12 @@
 from django.shortcuts import render
 from django.contrib import messages
-from django.db import connection
+from django.template.loader import render_to_string
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from gestao_biblioteca.hidratacao import hidratar, hidratar_autores
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
+from livros.busca import condicao_busca, relevancia_busca
+from .versao import etag_acervo, resultados_em_cache, snapshot_acervo, ultima_alteracao_acervo
 
 # --- Helper Function ---
 def dictfetchall(cursor):
@@ -8,93 +14,77 @@ def dictfetchall(cursor):
     columns = [col[0] for col in cursor.description]
     return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-def _get_autores_para_livro(livro_id):
-    """Busca autores de um livro específico SEM JOIN."""
-    with connection.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT nome 
-            FROM Autor 
-            WHERE id_autor IN (
-                SELECT id_autor FROM autor_livro WHERE id_livro = %s
-            )
-            ORDER BY nome
-            """,
-            [livro_id]
-        )
-        return dictfetchall(cursor)
-
 # --- View Principal do Acervo ---
 
-def acervo_view(request):
+def _buscar_livros(request, query):
     """
-    Busca e exibe todos os livros com disponibilidade calculada.
-    SEM JOIN (usando sub-queries e Python).
+    Busca os livros com disponibilidade.
+    SEM JOIN (usando sub-queries, contadores e Python).
+    Com o snapshot em dia, sem banco nenhum (acervo/snapshot.py).
     """
-    query = request.GET.get('q', '')
-    contexto = {'query': query}
-    
-    try:
-        with connection.cursor() as cursor:
-            # 1. Busca os Livros (Tabela Principal)
-            sql = "SELECT id_livro AS pk, nome, genero, isbn FROM Livro"
-            params = []
-            
-            if query:
-                # Filtro de busca SEM JOIN
-                sql += """
-                    WHERE nome ILIKE %s 
-                    OR genero ILIKE %s
-                    OR id_livro IN (
-                        SELECT id_livro FROM autor_livro 
-                        WHERE id_autor IN (SELECT id_autor FROM Autor WHERE nome ILIKE %s)
-                    )
-                """
-                params.extend([f'%{query}%', f'%{query}%', f'%{query}%'])
-            
+    snapshot = snapshot_acervo(request)
+    if snapshot is not None:
+        return snapshot.buscar(query) if query else snapshot.livros()
+
+    with conexao_leitura().cursor() as cursor:
+        # 1. Busca os Livros (Tabela Principal)
+        sql = "SELECT id_livro AS pk, nome, genero, isbn FROM Livro"
+        params = []
+
+        if query:
+            # Busca SEM JOIN no índice textual (título, gênero, autores e ISBN,
+            # sem acentos), com os resultados mais relevantes primeiro
+            relevancia, params_relevancia = relevancia_busca(query, 'Livro.id_livro')
+            filtro, params_filtro = condicao_busca(query)
+            sql = f"""
+                SELECT id_livro AS pk, nome, genero, isbn, {relevancia} AS relevancia
+                FROM Livro
+                WHERE id_livro IN ({filtro})
+                ORDER BY relevancia DESC, nome
+            """
+            params = params_relevancia + params_filtro
+        else:
             sql += " ORDER BY nome"
-            
-            cursor.execute(sql, params)
-            livros = dictfetchall(cursor)
-            
-            # 2. Processamento (Enriquecimento dos dados)
-            for livro in livros:
-                livro_id = livro['pk']
 
-                # A) Conta TOTAL de exemplares físicos
-                cursor.execute("SELECT COUNT(*) FROM Exemplar WHERE id_livro = %s", [livro_id])
-                total_exemplares = cursor.fetchone()[0]
-                livro['total_exemplares'] = total_exemplares
+        cursor.execute(sql, params)
+        livros = dictfetchall(cursor)
+
+        # 2. Processamento (Enriquecimento dos dados)
+        # Disponibilidade lida dos contadores (livro_disponibilidade) e autores
+        # carregados em lote: o número de queries não depende do tamanho do acervo.
+        hidratar(request, cursor, livros, {'pk': 'livro_disponibilidade'})
+        hidratar_autores(request, cursor, livros, campo='pk')
 
-                # B) Conta quantos estão EMPRESTADOS (Em Andamento)
-                # Sub-query: Conta na tabela Emprestimo onde o exemplar pertence a este livro
-                cursor.execute(
-                    """
-                    SELECT COUNT(*) 
-                    FROM Emprestimo 
-                    WHERE status = 'Em Andamento'
-                    AND id_exemplar IN (SELECT id_exemplar FROM Exemplar WHERE id_livro = %s)
-                    """, 
-                    [livro_id]
-                )
-                qtd_emprestados = cursor.fetchone()[0]
-                livro['qtd_emprestados'] = qtd_emprestados
-                
-                # C) Cálculo Matemático da Disponibilidade
-                # Se tenho 5 livros e 2 estão emprestados -> 3 disponíveis
-                livro['exemplares_disponiveis'] = total_exemplares - qtd_emprestados
-                
-                # Força zero se der negativo (segurança)
-                if livro['exemplares_disponiveis'] < 0:
-                    livro['exemplares_disponiveis'] = 0
+    for livro in livros:
+        contadores = livro['livro_disponibilidade'] or {}
+        livro['total_exemplares'] = contadores.get('total_exemplares', 0)
+        livro['qtd_emprestados'] = contadores.get('qtd_emprestados', 0)
+        livro['exemplares_disponiveis'] = contadores.get('exemplares_disponiveis', 0)
+    return livros
 
-                # D) Busca lista de autores
-                livro['autores_list'] = _get_autores_para_livro(livro_id)
-            
-            contexto['livros'] = livros
 
+# GET condicional pela versão do catálogo (acervo/versao.py): sem escrita no
+# acervo desde a última visita, a resposta é 304. no-cache faz o navegador
+# sempre revalidar em vez de exibir a cópia antiga. Versão e livros são lidos
+# do mesmo banco (réplica ou primário), então o cache nunca guarda dados
+# mais velhos que a versão da chave.
+@leitura_na_replica
+@cache_control(no_cache=True)
+@condition(etag_func=etag_acervo, last_modified_func=ultima_alteracao_acervo)
+def acervo_view(request):
+    """Página pública do acervo; os resultados de cada busca vêm do cache enquanto a versão não muda."""
+    query = request.GET.get('q', '')
+    contexto = {'query': query}
+
+    def montar_resultados(livros):
+        return render_to_string('acervo/resultados.html', {'livros': livros, 'query': query})
+
+    try:
+        contexto['resultados'] = resultados_em_cache(
+            request, query, lambda: montar_resultados(_buscar_livros(request, query))
+        )
     except Exception as e:
         messages.error(request, f"Ocorreu um erro ao consultar o acervo: {e}")
-        contexto['livros'] = []
+        contexto['resultados'] = montar_resultados([])
 
-    return render(request, 'acervo/acervo.html', contexto)
\ No newline at end of file
+    return render(request, 'acervo/acervo.html', contexto)
@@ -1,7 +1,11 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.db import connection, IntegrityError
+from django.db import connection, IntegrityError, transaction
 from .forms import AutorForm 
+from gestao_biblioteca.paginacao import paginar
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
+from livros.busca import atualizar_indice_busca_autor
+from gestao_biblioteca.cache_escolhas import invalidar_tabelas
 
 # --- Helper Function ---
 def dictfetchall(cursor):
@@ -27,6 +31,7 @@ def cadastrar_autor_view(request):
                         """,
                         [dados['nome'], dados['nacionalidade'], dados['biografia']]
                     )
+                invalidar_tabelas('Autor')
                 messages.success(request, 'Autor cadastrado com sucesso!')
                 return redirect('autores:autor_list')
             except Exception as e:
@@ -37,10 +42,11 @@ def cadastrar_autor_view(request):
     return render(request, 'autor/cadastrar_autor.html', {'form': form})
 
 # READ (Consultar Autores)
+@leitura_na_replica
 def consultar_autores_view(request):
     query = request.GET.get('q', '')
     
-    with connection.cursor() as cursor:
+    with conexao_leitura().cursor() as cursor:
         # Seleciona apenas os campos necessários para a listagem
         sql = "SELECT id_autor AS pk, nome, nacionalidade FROM Autor"
         params = []
@@ -49,15 +55,12 @@ def consultar_autores_view(request):
             # Filtro ILIKE (Case-insensitive) para buscar autores pelo nome
             sql += " WHERE nome ILIKE %s"
             params.append(f'%{query}%')
-        else:
-            sql += " ORDER BY nome"
-        
-        cursor.execute(sql, params)
         
-        # Helper 'dictfetchall' transforma as tuplas do banco em dicionários
-        autores = dictfetchall(cursor)
+        # Paginação por chave (nome, pk), já retornando dicionários
+        pagina = paginar(request, cursor, sql, params, ['nome', 'pk'])
+        autores = pagina.itens
 
-    return render(request, 'autor/consultar_autor.html', {'autores': autores})
+    return render(request, 'autor/consultar_autor.html', {'autores': autores, 'pagina': pagina})
 
 # UPDATE (Atualizar Autor)
 def atualizar_autor_view(request, pk):
@@ -81,7 +84,7 @@ def atualizar_autor_view(request, pk):
         if form.is_valid():
             dados = form.cleaned_data
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     # Executa UPDATE em todos os campos mapeados
                     sql_query = """
                         UPDATE Autor
@@ -90,6 +93,10 @@ def atualizar_autor_view(request, pk):
                     """
                     params = [dados['nome'], dados['nacionalidade'], dados['biografia'], pk]
                     cursor.execute(sql_query, params)
+
+                    # O nome do autor faz parte da busca dos livros dele
+                    atualizar_indice_busca_autor(cursor, pk)
+                invalidar_tabelas('Autor')
                 messages.success(request, 'Autor atualizado com sucesso!')
                 return redirect('autores:autor_list')
             except Exception as e:
@@ -117,6 +124,7 @@ def excluir_autor_view(request, pk):
             with connection.cursor() as cursor:
                 # Tenta exclusão física
                 cursor.execute("DELETE FROM Autor WHERE id_autor = %s", [pk])
+            invalidar_tabelas('Autor')
             messages.success(request, f'Autor "{autor[0]}" excluído com sucesso.')
             return redirect('autores:autor_list')
         
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
 
 application = get_asgi_application()
+
+# Abre o pool de conexões (se estiver ligado) na primeira requisição de
+# cada processo, depois do fork dos workers (gunicorn --preload)
+from gestao_biblioteca.pool import abrir_pool_na_primeira_requisicao  # noqa: E402
+
+abrir_pool_na_primeira_requisicao()
@@ -13,6 +13,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from django.contrib.messages import constants as messages
 
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:  # psycopg 3 sem o extra [pool]: usa conexões persistentes
+    ConnectionPool = None
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,11 +59,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'gestao_biblioteca.instrumentacao.InstrumentacaoSQLMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'gestao_biblioteca.autenticacao.AutenticacaoFuncionarioMiddleware',
+    'gestao_biblioteca.replica.ReplicaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -96,6 +104,85 @@ DATABASES = {
         },    
 }
 
+# Pool de conexões (psycopg 3 + psycopg_pool, suportado nativamente pelo
+# Django). Cada processo WSGI/ASGI mantém entre min_size e max_size conexões
+# abertas e as empresta às requisições, em vez de abrir uma nova a cada vez.
+#   timeout      -> segundos que uma requisição espera por uma conexão livre
+#   max_idle     -> conexões ociosas além de min_size são fechadas após isso
+#   max_lifetime -> toda conexão é renovada depois desse tempo
+# CONN_HEALTH_CHECKS faz o pool testar a conexão antes de entregá-la.
+# As estatísticas ficam em /pool/ (gestao_biblioteca/pool.py).
+# O pool (threads e sockets) não sobrevive a um fork: ele só é aberto na
+# primeira requisição de cada processo, nunca no import do wsgi.py/asgi.py,
+# então `gunicorn --preload` é seguro. Não abra o pool em código que rode
+# na carga da aplicação.
+BANCO_USAR_POOL = ConnectionPool is not None
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+if BANCO_USAR_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': 2,
+            'max_size': 10,
+            'timeout': 10,
+            'max_idle': 5 * 60,
+            'max_lifetime': 30 * 60,
+        },
+    }
+else:
+    # Sem o pool: reaproveita a conexão da thread por até 60s, testando-a
+    # antes de cada requisição.
+    DATABASES['default']['CONN_MAX_AGE'] = 60
+
+# Réplica de leitura (gestao_biblioteca/replica.py). Com BANCO_REPLICA
+# definido (o que muda em relação ao 'default'), os relatórios, o acervo e
+# as listagens leem da réplica enquanto ela estiver em dia.
+BANCO_REPLICA = None  # ex.: {'HOST': 'localhost', 'PORT': '5433'}
+BANCO_REPLICA_ATRASO_MAXIMO = 30   # segundos; mais atrasada -> lê do primário
+BANCO_REPLICA_VERIFICAR = 5        # segundos entre as medidas do atraso
+BANCO_REPLICA_JANELA_ESCRITA = 30  # segundos lendo do primário após um POST
+DATABASE_ROUTERS = ['gestao_biblioteca.replica.RoteadorReplica']
+
+if BANCO_REPLICA:
+    DATABASES['replica'] = {**DATABASES['default'], **BANCO_REPLICA, 'TEST': {'MIRROR': 'default'}}
+    # Réplica fora do ar não pode segurar a requisição: desiste logo e a
+    # leitura cai no primário
+    opcoes_replica = {**DATABASES['replica'].get('OPTIONS', {}), 'connect_timeout': 2}
+    if 'pool' in opcoes_replica:
+        opcoes_replica['pool'] = {**opcoes_replica['pool'], 'timeout': 2}
+    DATABASES['replica']['OPTIONS'] = opcoes_replica
+
+
+# Cache compartilhado entre os processos (listas de opções dos formulários,
+# ver gestao_biblioteca/cache_escolhas.py). Crie a tabela uma vez com:
+#     python manage.py createcachetable
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_biblioteca',
+    },
+}
+
+# Sessões. Padrão: tabela django_session (uma consulta a mais por requisição).
+# Com SESSOES_REDIS_URL definido (requer o pacote `redis`), a sessão é lida
+# de um cache compartilhado entre os processos e gravada também no banco
+# (write-through, backend cached_db): um Redis reiniciado não desloga ninguém.
+SESSOES_REDIS_URL = None  # ex.: 'redis://127.0.0.1:6379/1'
+
+if SESSOES_REDIS_URL:
+    CACHES['sessoes'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SESSOES_REDIS_URL,
+    }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'sessoes'
+
+# Autenticação dos funcionários (gestao_biblioteca/autenticacao.py).
+# Todas as rotas exigem login, menos estas (nome da rota ou namespace).
+ROTAS_PUBLICAS = ['login', 'logout', 'acervo', 'admin']
+# Intervalo para reler nome/status do funcionário logado no banco
+FUNCIONARIO_REVALIDAR_SEGUNDOS = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +225,105 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Paginação por chave das listagens e relatórios (gestao_biblioteca/paginacao.py)
+# O usuário pode pedir outro tamanho com ?tamanho=, limitado ao máximo.
+PAGINACAO_TAMANHO_PAGINA = 25
+PAGINACAO_TAMANHO_MAXIMO = 200
+
+# Snapshots dos relatórios (relatorios/snapshots.py). Snapshots mais velhos
+# que isto (segundos) são ignorados e o relatório é calculado ao vivo.
+# Agendar `manage.py atualizar_relatorios` com folga dentro deste prazo.
+RELATORIOS_SNAPSHOT_VALIDADE = 60 * 60
+
+# Relatórios em segundo plano (relatorios/tarefas.py). Worker:
+#     python manage.py processar_relatorios [--processos 2]
+RELATORIOS_TAREFAS_DIR = BASE_DIR / 'relatorios_gerados'
+RELATORIOS_TAREFAS_PROCESSOS = 2
+RELATORIOS_TAREFAS_VALIDADE = 7 * 24 * 60 * 60  # arquivos prontos ficam 7 dias
+RELATORIOS_TAREFAS_ABANDONO = 10 * 60           # sem progresso -> volta para a fila
+
+# Snapshot do acervo mapeado em memória (acervo/snapshot.py): a página
+# pública lista e busca nele, sem consultar o banco. As requisições só
+# conferem a versão; a reconstrução roda numa thread em segundo plano ou no
+# cron (com ACERVO_SNAPSHOT_SEGUNDO_PLANO = False):
+#     python manage.py atualizar_snapshot_acervo [--completo]
+ACERVO_SNAPSHOT = True
+ACERVO_SNAPSHOT_DIR = BASE_DIR / 'snapshot_acervo'
+ACERVO_SNAPSHOT_VERIFICAR = 5            # segundos entre as conferências da versão
+ACERVO_SNAPSHOT_SEGUNDO_PLANO = True     # cada processo reconstrói numa thread própria
+ACERVO_SNAPSHOT_TOLERANCIA = 60          # segundos de disponibilidade atrasada aceitos
+ACERVO_SNAPSHOT_RETENCAO = 24 * 60 * 60  # alterações guardadas para a reconstrução incremental
+
+# Política de multas por atraso (emprestimos/multas.py). O extrato diário é
+# gerado por `manage.py calcular_multas` (agendar toda noite).
+MULTA_POLITICA = {
+    'valor_diario': '1.00',
+    'dias_carencia': 0,
+    'teto': None,
+    'descontar_feriados': False,  # dias da tabela `feriado` não contam
+}
+
+# Avisos aos leitores (emprestimos/notificacoes.py). Agendar depois do
+# calcular_multas:  python manage.py enviar_notificacoes [--simular]
+NOTIFICACOES = {
+    'dias_antecedencia': 2,    # aviso de vencimento N dias antes da data prevista
+    'repetir_atraso_dias': 7,  # novo aviso de atraso a cada N dias
+    'tamanho_lote': 50,        # mensagens por lote (uma conexão SMTP por lote)
+    'concorrencia': 4,         # lotes enviados ao mesmo tempo
+    'retentativas': 3,         # reenvios das falhas temporárias, com espera
+    'espera_inicial': 2.0,     # segundos; dobra a cada reenvio
+    'tentativas_maximas': 10,  # depois disso o aviso não é mais tentado
+}
+NOTIFICACOES_BACKENDS = {
+    'email': 'emprestimos.notificacoes.BackendEmail',
+    'sms': 'emprestimos.notificacoes.BackendSMSLog',
+}
+NOTIFICACOES_REMETENTE = 'biblioteca@localhost'
+# SMTP local para testes (ex.: python -m aiosmtpd -n -l localhost:1025)
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 1025
+
+# Instrumentação SQL por requisição (gestao_biblioteca/instrumentacao.py)
+# Orçamento = número máximo de consultas por view (nome da rota). Estourar o
+# orçamento gera um aviso no log; com SQL_ORCAMENTO_ESTRITO gera exceção (os
+# testes ligam com override_settings, ver gestao_biblioteca/tests.py).
+SQL_INSTRUMENTACAO = True
+SQL_ORCAMENTO_PADRAO = 30
+SQL_ORCAMENTOS = {
+    'home': 10,
+    'acervo:acervo_index': 10,
+    'livros:livro_list': 10,
+    'emprestimos:emprestimo_list': 10,
+}
+SQL_LIMITE_REPETICOES = 5
+SQL_CONSULTA_LENTA_MS = 100
+SQL_ORCAMENTO_ESTRITO = False
+
+# Regressão de planos de execução (gestao_biblioteca/planos.py):
+#     python manage.py verificar_planos [--gravar] [--livros 10000]
+# Custo = custo estimado do plano; buffers = páginas lidas (shared hit + read).
+PLANOS_BASELINE = BASE_DIR / 'planos_baseline.json'
+PLANOS_LIMITES = {
+    'custo_maximo': 100_000,
+    'buffers_maximos': 20_000,
+    'seqscan_linhas_minimas': 1_000,  # Seq Scan em tabelas menores é aceito
+    'fator_regressao': 3.0,           # em relação à linha de base
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'biblioteca': {
+            'handlers': ['console'],
+            'level': 'INFO' if DEBUG else 'WARNING',
+        },
+    },
+}
+
 MESSAGE_TAGS = {
     messages.DEBUG: 'secondary',
     messages.INFO: 'info',
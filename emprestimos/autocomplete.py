@@ -0,0 +1,117 @@
+"""
+Consultas de "busca enquanto digita" dos formulários de empréstimo e devolução.
+
+Em vez de renderizar todos os leitores/exemplares/empréstimos como <option>,
+o formulário pede ao servidor só as primeiras linhas que começam com o que
+foi digitado. Todas as buscas são por PREFIXO (LIKE 'termo%'), atendidas
+pelos índices text_pattern_ops criados em emprestimos/migrations, e sempre
+com LIMIT.
+
+Cada função devolve uma lista de dicts {'id': ..., 'texto': ...}, pronta
+para ser enviada como JSON.
+"""
+import re
+
+# Quantidade máxima de sugestões por requisição
+LIMITE_SUGESTOES = 20
+
+
+def _prefixo(termo):
+    """Escapa os curingas do LIKE e monta o padrão de prefixo."""
+    termo = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return termo.lower() + '%'
+
+
+def _somente_digitos(termo):
+    """'123.456.789-0' -> '1234567890' (ou '' se houver letras)."""
+    if re.search(r'[^\d.\-\s]', termo):
+        return ''
+    return re.sub(r'\D', '', termo)
+
+
+def buscar_leitores(cursor, termo, limite=LIMITE_SUGESTOES):
+    """Leitores pelo início do nome ou do CPF."""
+    digitos = _somente_digitos(termo)
+    if digitos:
+        cursor.execute(
+            """
+            SELECT id_leitor, nome, cpf FROM Leitor
+            WHERE cpf LIKE %s
+            ORDER BY cpf
+            LIMIT %s
+            """,
+            [digitos + '%', limite]
+        )
+    else:
+        cursor.execute(
+            """
+            SELECT id_leitor, nome, cpf FROM Leitor
+            WHERE lower(nome) LIKE %s
+            ORDER BY lower(nome), id_leitor
+            LIMIT %s
+            """,
+            [_prefixo(termo), limite]
+        )
+    return [{'id': row[0], 'texto': f"{row[1]} (CPF {row[2]})"} for row in cursor.fetchall()]
+
+
+def buscar_exemplares_disponiveis(cursor, termo, limite=LIMITE_SUGESTOES):
+    """
+    Exemplares sem empréstimo 'Em Andamento', pelo início do título ou do
+    número de patrimônio.
+    """
+    digitos = _somente_digitos(termo)
+    if digitos:
+        filtro = "e.numero_patrimonio::text LIKE %s"
+        ordem = "e.numero_patrimonio::text"
+        params = [digitos + '%']
+    else:
+        filtro = "lower(l.nome) LIKE %s"
+        ordem = "lower(l.nome), e.numero_patrimonio"
+        params = [_prefixo(termo)]
+
+    cursor.execute(
+        f"""
+        SELECT e.id_exemplar, l.nome, e.numero_patrimonio
+        FROM Exemplar e
+        JOIN Livro l ON e.id_livro = l.id_livro
+        WHERE {filtro}
+          AND NOT EXISTS (
+              SELECT 1 FROM Emprestimo emp
+              WHERE emp.id_exemplar = e.id_exemplar AND emp.status = 'Em Andamento'
+          )
+        ORDER BY {ordem}
+        LIMIT %s
+        """,
+        params + [limite]
+    )
+    return [{'id': row[0], 'texto': f"{row[1]} (Pat. {row[2]})"} for row in cursor.fetchall()]
+
+
+def buscar_emprestimos_ativos(cursor, termo, limite=LIMITE_SUGESTOES):
+    """
+    Empréstimos 'Em Andamento' pelo início do nome do leitor, do título
+    ou do número de patrimônio.
+    """
+    digitos = _somente_digitos(termo)
+    if digitos:
+        filtro = "e.numero_patrimonio::text LIKE %s"
+        params = [digitos + '%']
+    else:
+        filtro = "(lower(le.nome) LIKE %s OR lower(l.nome) LIKE %s)"
+        params = [_prefixo(termo), _prefixo(termo)]
+
+    cursor.execute(
+        f"""
+        SELECT emp.id_emprestimo, l.nome, le.nome, e.numero_patrimonio
+        FROM Emprestimo emp
+        JOIN Exemplar e ON emp.id_exemplar = e.id_exemplar
+        JOIN Livro l ON e.id_livro = l.id_livro
+        JOIN Leitor le ON emp.id_leitor = le.id_leitor
+        WHERE emp.status = 'Em Andamento' AND {filtro}
+        ORDER BY le.nome, l.nome, emp.id_emprestimo
+        LIMIT %s
+        """,
+        params + [limite]
+    )
+    return [{'id': row[0], 'texto': f"{row[2]} - {row[1]} (Pat. {row[3]})"} for row in cursor.fetchall()]
@@ -0,0 +1,224 @@
+"""
+Operações de balcão (circulação) com vários exemplares por transação.
+
+Empréstimo de uma pilha de livros para um leitor:
+
+    resultado = registrar_emprestimos(cursor, id_leitor, [12, 15, 40], id_funcionario)
+    resultado.criados  -> {id_exemplar: id_emprestimo}
+    resultado.falhas   -> {id_exemplar: motivo}
+
+Devolução em lote (caixa de devolução), pelos números de patrimônio lidos:
+
+    resultado = registrar_devolucoes(cursor, [1001, 1002, 1003])
+    resultado.devolvidos / resultado.revisar / resultado.falhas
+
+Concorrência entre balcões:
+- os exemplares são travados com SELECT ... FOR UPDATE SKIP LOCKED: se
+  outro balcão está emprestando o mesmo exemplar agora, ele é recusado na
+  hora (sem esperar a outra transação terminar);
+- a disponibilidade é conferida com a trava na mão e todos os empréstimos
+  entram num único INSERT;
+- o índice único parcial `emprestimo_ativo_exemplar_uidx` garante no banco
+  um só empréstimo 'Em Andamento' por exemplar, inclusive para caminhos
+  que não passem por aqui (ON CONFLICT DO NOTHING vira falha do exemplar).
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from gestao_biblioteca.estatisticas import ajustar_contador
+from livros.disponibilidade import ajustar_disponibilidade_lote
+
+from .multas import PoliticaMulta, expressao_multa_extrato
+
+PRAZO_DIAS = 14
+MAX_EXEMPLARES_POR_EMPRESTIMO = 10
+MAX_DEVOLUCOES_POR_LOTE = 1000
+
+NAO_ENCONTRADO = 'exemplar não encontrado'
+EM_USO = 'sendo emprestado em outro balcão neste momento'
+JA_EMPRESTADO = 'já está emprestado'
+PATRIMONIO_INEXISTENTE = 'patrimônio não encontrado'
+SEM_EMPRESTIMO_ATIVO = 'sem empréstimo em andamento'
+
+
+class ResultadoCirculacao:
+    def __init__(self):
+        self.criados = {}
+        self.falhas = {}
+
+
+def _travar_exemplares(cursor, ids_exemplares, resultado):
+    """Trava os exemplares livres de outras transações; devolve os travados."""
+    cursor.execute(
+        """
+        SELECT id_exemplar FROM Exemplar
+        WHERE id_exemplar = ANY(%s)
+        ORDER BY id_exemplar
+        FOR UPDATE SKIP LOCKED
+        """,
+        [ids_exemplares]
+    )
+    travados = {row[0] for row in cursor.fetchall()}
+
+    fora = [id_exemplar for id_exemplar in ids_exemplares if id_exemplar not in travados]
+    if fora:
+        # Pulado pelo SKIP LOCKED (existe, mas está travado) ou inexistente
+        cursor.execute("SELECT id_exemplar FROM Exemplar WHERE id_exemplar = ANY(%s)", [fora])
+        existentes = {row[0] for row in cursor.fetchall()}
+        for id_exemplar in fora:
+            resultado.falhas[id_exemplar] = EM_USO if id_exemplar in existentes else NAO_ENCONTRADO
+    return [id_exemplar for id_exemplar in ids_exemplares if id_exemplar in travados]
+
+
+def registrar_emprestimos(cursor, id_leitor, ids_exemplares, id_funcionario, hoje=None):
+    """
+    Empresta ao leitor todos os exemplares disponíveis da lista, numa
+    transação. Os indisponíveis voltam em `falhas`, sem impedir os demais.
+    """
+    resultado = ResultadoCirculacao()
+    ids_exemplares = list(dict.fromkeys(ids_exemplares))
+    hoje = hoje or date.today()
+    data_prevista = hoje + timedelta(days=PRAZO_DIAS)
+
+    with transaction.atomic():
+        livres = _travar_exemplares(cursor, ids_exemplares, resultado)
+
+        if livres:
+            cursor.execute(
+                """
+                SELECT id_exemplar FROM Emprestimo
+                WHERE id_exemplar = ANY(%s) AND status = 'Em Andamento'
+                """,
+                [livres]
+            )
+            emprestados = {row[0] for row in cursor.fetchall()}
+            for id_exemplar in emprestados:
+                resultado.falhas[id_exemplar] = JA_EMPRESTADO
+            livres = [id_exemplar for id_exemplar in livres if id_exemplar not in emprestados]
+
+        if livres:
+            cursor.execute(
+                """
+                INSERT INTO Emprestimo
+                (id_exemplar, id_leitor, id_funcionario, dt_emprestimo, dt_prevista_devolucao, status)
+                SELECT id_exemplar, %s, %s, %s, %s, 'Em Andamento'
+                FROM unnest(%s::INTEGER[]) AS id_exemplar
+                ON CONFLICT (id_exemplar) WHERE status = 'Em Andamento' DO NOTHING
+                RETURNING id_exemplar, id_emprestimo
+                """,
+                [id_leitor, id_funcionario, hoje, data_prevista, livres]
+            )
+            resultado.criados = dict(cursor.fetchall())
+            for id_exemplar in livres:
+                if id_exemplar not in resultado.criados:
+                    resultado.falhas[id_exemplar] = JA_EMPRESTADO
+
+        if resultado.criados:
+            ajustar_disponibilidade_lote(cursor, list(resultado.criados), emprestados=1)
+            ajustar_contador(cursor, 'emprestimos_ativos', len(resultado.criados))
+
+    return resultado
+
+
+class ResultadoDevolucao:
+    """
+    devolvidos: todos os empréstimos encerrados (dicts com multa e atraso);
+    revisar:    os devolvidos com atraso, cuja multa veio do extrato/política
+                (emprestimos/multas.py) e aguarda a decisão do funcionário
+                (confirmar_multas);
+    falhas:     {patrimônio: motivo} dos que não puderam ser devolvidos.
+    """
+
+    def __init__(self):
+        self.devolvidos = []
+        self.falhas = {}
+
+    @property
+    def revisar(self):
+        return [emp for emp in self.devolvidos if emp['dias_atraso'] > 0]
+
+    @property
+    def sem_pendencia(self):
+        return [emp for emp in self.devolvidos if emp['dias_atraso'] <= 0]
+
+
+def registrar_devolucoes(cursor, patrimonios, hoje=None):
+    """
+    Encerra, num único UPDATE, os empréstimos em andamento dos patrimônios
+    informados. A multa vem do extrato do dia (ou da política de multas) e
+    pode ser ajustada depois.
+    """
+    resultado = ResultadoDevolucao()
+    patrimonios = list(dict.fromkeys(patrimonios))
+    hoje = hoje or date.today()
+    if not patrimonios:
+        return resultado
+
+    with transaction.atomic():
+        # Localiza e encerra de uma vez; a condição de status é reavaliada
+        # com a linha travada, então dois balcões não devolvem o mesmo empréstimo
+        params = PoliticaMulta.configurada().parametros(hoje)
+        params['patrimonios'] = patrimonios
+        cursor.execute(
+            f"""
+            UPDATE Emprestimo emp
+            SET status = 'Devolvido',
+                dt_devolucao = %(hoje)s,
+                multa = {expressao_multa_extrato()},
+                ocorrencia = ''
+            FROM Exemplar ex
+            WHERE ex.id_exemplar = emp.id_exemplar
+              AND ex.numero_patrimonio = ANY(%(patrimonios)s)
+              AND emp.status = 'Em Andamento'
+            RETURNING emp.id_emprestimo, emp.id_exemplar, emp.id_leitor, ex.numero_patrimonio,
+                      emp.dt_prevista_devolucao, emp.multa
+            """,
+            params
+        )
+        colunas = [col[0] for col in cursor.description]
+        resultado.devolvidos = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+        for emp in resultado.devolvidos:
+            emp['dias_atraso'] = (hoje - emp['dt_prevista_devolucao']).days
+
+        devolvidos = {emp['numero_patrimonio'] for emp in resultado.devolvidos}
+        restantes = [patrimonio for patrimonio in patrimonios if patrimonio not in devolvidos]
+        if restantes:
+            cursor.execute(
+                "SELECT numero_patrimonio FROM Exemplar WHERE numero_patrimonio = ANY(%s)", [restantes]
+            )
+            existentes = {row[0] for row in cursor.fetchall()}
+            for patrimonio in restantes:
+                resultado.falhas[patrimonio] = (
+                    SEM_EMPRESTIMO_ATIVO if patrimonio in existentes else PATRIMONIO_INEXISTENTE
+                )
+
+        if resultado.devolvidos:
+            ajustar_disponibilidade_lote(
+                cursor, [emp['id_exemplar'] for emp in resultado.devolvidos], emprestados=-1
+            )
+            ajustar_contador(cursor, 'emprestimos_ativos', -len(resultado.devolvidos))
+
+    # Mesma ordem da leitura dos patrimônios
+    ordem = {patrimonio: posicao for posicao, patrimonio in enumerate(patrimonios)}
+    resultado.devolvidos.sort(key=lambda emp: ordem[emp['numero_patrimonio']])
+    return resultado
+
+
+def confirmar_multas(cursor, multas):
+    """
+    Grava a multa decidida para empréstimos já devolvidos ({id_emprestimo:
+    valor}), num único UPDATE. Retorna quantos foram alterados.
+    """
+    if not multas:
+        return 0
+    ids = list(multas)
+    cursor.execute(
+        """
+        UPDATE Emprestimo emp SET multa = m.multa
+        FROM unnest(%s::INTEGER[], %s::NUMERIC[]) AS m(id_emprestimo, multa)
+        WHERE emp.id_emprestimo = m.id_emprestimo AND emp.status = 'Devolvido'
+        """,
+        [ids, [multas[id_emprestimo] for id_emprestimo in ids]]
+    )
+    return cursor.rowcount
@@ -1,88 +1,89 @@
+import re
+
 from django import forms
 from django.db import connection
 
+from .circulacao import MAX_DEVOLUCOES_POR_LOTE, MAX_EXEMPLARES_POR_EMPRESTIMO
+
 # --- FUNÇÕES HELPER (Consultas ao Banco) ---
+# As listas completas de leitores/exemplares não são mais carregadas aqui:
+# o formulário busca sugestões em emprestimos/autocomplete.py (via JSON) e
+# só o id escolhido é conferido no banco, com uma única consulta.
 
-def get_leitor_choices():
-    """Busca todos os leitores para o cadastro de empréstimo."""
+def get_leitor(id_leitor):
+    """Retorna o nome do leitor ou None se não existir."""
     with connection.cursor() as cursor:
-        cursor.execute("SELECT id_leitor, nome FROM Leitor ORDER BY nome")
-        choices = [(row[0], row[1]) for row in cursor.fetchall()]
-        choices.insert(0, ('', '--- Selecione um Leitor ---'))
-        return choices
-
-def get_exemplar_choices():
-    """ 
-    Busca exemplares DISPONÍVEIS (que não estão em empréstimos 'Em Andamento').
-    """
+        cursor.execute("SELECT nome FROM Leitor WHERE id_leitor = %s", [id_leitor])
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+def get_rotulos_exemplares(ids_exemplares):
+    """{id_exemplar: 'Título (Pat. 123)'} dos exemplares existentes, numa consulta."""
     with connection.cursor() as cursor:
         cursor.execute(
             """
             SELECT e.id_exemplar, l.nome, e.numero_patrimonio
             FROM Exemplar e
             JOIN Livro l ON e.id_livro = l.id_livro
-            WHERE e.id_exemplar NOT IN (
-                SELECT id_exemplar 
-                FROM Emprestimo 
-                WHERE status = 'Em Andamento'
-            )
-            ORDER BY l.nome
-            """
+            WHERE e.id_exemplar = ANY(%s)
+            """,
+            [list(ids_exemplares)]
         )
-        choices = [(row[0], f"{row[1]} (Pat. {row[2]})") for row in cursor.fetchall()]
-        choices.insert(0, ('', '--- Selecione um Exemplar Disponível ---'))
-        return choices
-
-# emprestimos/forms.py
-
-def get_emprestimos_ativos_choices():
-    """
-    Busca todos os empréstimos 'Em Andamento' para o dropdown de DEVOLUÇÃO.
-    Formatado como: 'Nome Leitor - Livro (Patrimônio)'
-    """
-    with connection.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT 
-                emp.id_emprestimo,
-                l.nome AS livro_nome,
-                le.nome AS leitor_nome,
-                e.numero_patrimonio
-            FROM Emprestimo emp
-            JOIN Exemplar e ON emp.id_exemplar = e.id_exemplar
-            JOIN Livro l ON e.id_livro = l.id_livro
-            JOIN Leitor le ON emp.id_leitor = le.id_leitor
-            WHERE emp.status = 'Em Andamento'
-            ORDER BY le.nome, l.nome
-            """
-        )
-        choices = [
-            (row[0], f"{row[2]} - {row[1]} (Pat. {row[3]})") 
-            for row in cursor.fetchall()
-        ]
-        
-        return choices
+        return {row[0]: f"{row[1]} (Pat. {row[2]})" for row in cursor.fetchall()}
 
 # --- FORMS ---
 
 class EmprestimoForm(forms.Form):
-    """Formulário para CRIAR um novo empréstimo."""
-    leitor = forms.ChoiceField(
+    """
+    Formulário para CRIAR empréstimos: um leitor e um ou mais exemplares.
+    Os campos guardam só os ids; a escolha é feita pela busca (autocomplete)
+    do template, e os rótulos exibidos ficam em `rotulos` após a validação.
+    A disponibilidade é conferida na transação (emprestimos/circulacao.py),
+    com os exemplares travados, e não aqui.
+    """
+    leitor = forms.IntegerField(
         label='Leitor',
-        choices=[],
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=forms.HiddenInput(),
+        error_messages={'required': 'Selecione um leitor na busca.'}
     )
     
-    exemplar = forms.ChoiceField(
-        label='Exemplar (apenas disponíveis)',
-        choices=[], 
-        widget=forms.Select(attrs={'class': 'form-control'})
+    # Ids separados por vírgula (preenchido pela lista do template)
+    exemplares = forms.CharField(
+        label='Exemplares (apenas disponíveis)',
+        widget=forms.HiddenInput(),
+        error_messages={'required': 'Selecione ao menos um exemplar disponível na busca.'}
     )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['leitor'].choices = get_leitor_choices()
-        self.fields['exemplar'].choices = get_exemplar_choices()
+        self.rotulos = {}
+
+    def clean_leitor(self):
+        id_leitor = self.cleaned_data['leitor']
+        nome = get_leitor(id_leitor)
+        if nome is None:
+            raise forms.ValidationError('Leitor não encontrado.')
+        self.rotulos['leitor'] = nome
+        return id_leitor
+
+    def clean_exemplares(self):
+        try:
+            ids = [int(valor) for valor in self.cleaned_data['exemplares'].split(',') if valor.strip()]
+        except ValueError:
+            raise forms.ValidationError('Seleção de exemplares inválida.')
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise forms.ValidationError('Selecione ao menos um exemplar disponível na busca.')
+        if len(ids) > MAX_EXEMPLARES_POR_EMPRESTIMO:
+            raise forms.ValidationError(
+                f'No máximo {MAX_EXEMPLARES_POR_EMPRESTIMO} exemplares por empréstimo.'
+            )
+
+        rotulos = get_rotulos_exemplares(ids)
+        self.rotulos['exemplares'] = [(id_exemplar, rotulos[id_exemplar]) for id_exemplar in ids if id_exemplar in rotulos]
+        if len(rotulos) < len(ids):
+            raise forms.ValidationError('Exemplar não encontrado.')
+        return ids
 
 
 class DevolucaoForm(forms.Form):
@@ -125,4 +126,27 @@ class DevolucaoForm(forms.Form):
             # Mudamos o widget para HiddenInput para garantir que não apareça na tela
             self.fields['multa'].widget = forms.HiddenInput()
             self.fields['multa'].required = False
-            self.fields['multa'].initial = 0.00
\ No newline at end of file
+            self.fields['multa'].initial = 0.00
+
+class DevolucaoLoteForm(forms.Form):
+    """Números de patrimônio lidos (leitor de código de barras ou digitados)."""
+    patrimonios = forms.CharField(
+        label='Números de patrimônio',
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 8,
+            'autofocus': True,
+            'placeholder': 'Um por linha (ou separados por espaço/vírgula)',
+        }),
+        error_messages={'required': 'Informe ao menos um número de patrimônio.'}
+    )
+
+    def clean_patrimonios(self):
+        valores = [valor for valor in re.split(r'[\s,;]+', self.cleaned_data['patrimonios']) if valor]
+        invalidos = [valor for valor in valores if not valor.isdigit()]
+        if invalidos:
+            raise forms.ValidationError(f"Patrimônio(s) inválido(s): {', '.join(invalidos[:10])}")
+        patrimonios = list(dict.fromkeys(int(valor) for valor in valores))
+        if len(patrimonios) > MAX_DEVOLUCOES_POR_LOTE:
+            raise forms.ValidationError(f'No máximo {MAX_DEVOLUCOES_POR_LOTE} patrimônios por lote.')
+        return patrimonios
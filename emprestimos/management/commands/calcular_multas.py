@@ -0,0 +1,52 @@
+import csv
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from emprestimos.multas import PoliticaMulta, calcular_extrato
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula as multas projetadas de todos os empréstimos atrasados e grava o '
+        'extrato do dia (extrato_multa). Feito para rodar toda noite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help='Data de referência (aaaa-mm-dd). Padrão: hoje')
+        parser.add_argument('--csv', metavar='ARQUIVO', help='Também grava o extrato neste CSV')
+
+    def handle(self, *args, **options):
+        try:
+            hoje = date.fromisoformat(options['data']) if options['data'] else date.today()
+        except ValueError:
+            raise CommandError('Data inválida, use aaaa-mm-dd.')
+
+        politica = PoliticaMulta.configurada()
+        with connection.cursor() as cursor:
+            quantidade, total = calcular_extrato(cursor, hoje, politica)
+
+            if options['csv']:
+                cursor.execute(
+                    """
+                    SELECT x.id_emprestimo, l.nome, l.telefone, x.dt_prevista_devolucao,
+                           x.dias_atraso, x.dias_cobrados, x.valor
+                    FROM extrato_multa x
+                    LEFT JOIN Leitor l ON l.id_leitor = x.id_leitor
+                    WHERE x.dt_referencia = %s
+                    ORDER BY l.nome, x.id_emprestimo
+                    """,
+                    [hoje]
+                )
+                with open(options['csv'], 'w', newline='', encoding='utf-8') as saida:
+                    escritor = csv.writer(saida, delimiter=';')
+                    escritor.writerow(['emprestimo', 'leitor', 'telefone', 'devolucao_prevista',
+                                       'dias_atraso', 'dias_cobrados', 'multa'])
+                    escritor.writerows(cursor.fetchall())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Extrato de {hoje:%d/%m/%Y}: {quantidade} empréstimo(s) em atraso, '
+            f'R$ {total:.2f} em multas projetadas '
+            f'(R$ {politica.valor_diario}/dia, carência {politica.dias_carencia} dia(s)).'
+        ))
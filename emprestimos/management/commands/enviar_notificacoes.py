@@ -0,0 +1,53 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from emprestimos.notificacoes import CHAVE_TRAVA, enviar_notificacoes
+
+
+class Command(BaseCommand):
+    help = (
+        'Envia aos leitores os avisos de empréstimos atrasados e a vencer (uma mensagem por leitor, '
+        'por e-mail ou SMS). Feito para rodar uma vez por dia, depois do calcular_multas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help='Data de referência (aaaa-mm-dd). Padrão: hoje')
+        parser.add_argument('--simular', action='store_true',
+                            help='Só mostra as mensagens que seriam enviadas (não envia nem registra).')
+
+    def handle(self, *args, **options):
+        try:
+            hoje = date.fromisoformat(options['data']) if options['data'] else date.today()
+        except ValueError:
+            raise CommandError('Data inválida, use aaaa-mm-dd.')
+
+        with connection.cursor() as cursor:
+            # Duas execuções ao mesmo tempo mandariam os mesmos avisos
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [CHAVE_TRAVA])
+            if not cursor.fetchone()[0]:
+                raise CommandError('Outro envio de notificações está em andamento.')
+            try:
+                resumo = enviar_notificacoes(cursor, hoje, simular=options['simular'])
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [CHAVE_TRAVA])
+
+        if options['simular']:
+            for mensagem in resumo['mensagens']:
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"[{mensagem['canal']}] {mensagem['destino']} - {mensagem['assunto']}"
+                ))
+                self.stdout.write(mensagem['texto'] + '\n')
+
+        canais = ', '.join(f'{quantidade} por {canal}' for canal, quantidade in resumo['por_canal'].items())
+        self.stdout.write(
+            f"{resumo['leitores']} leitor(es) a avisar ({canais or 'nenhuma mensagem'}); "
+            f"{resumo['sem_contato']} sem e-mail nem telefone."
+        )
+        if not options['simular']:
+            estilo = self.style.WARNING if resumo['falhas'] else self.style.SUCCESS
+            self.stdout.write(estilo(
+                f"{resumo['enviadas']} aviso(s) enviado(s), {resumo['falhas']} com falha "
+                '(as temporárias voltam na próxima execução).'
+            ))
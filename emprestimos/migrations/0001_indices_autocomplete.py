@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0001_esquema_base'),
+    ]
+
+    operations = [
+        # Índices de prefixo (LIKE 'termo%') usados pelo autocomplete dos
+        # formulários de empréstimo e devolução (emprestimos/autocomplete.py).
+        # text_pattern_ops permite usar o índice com LIKE em qualquer collation.
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX IF NOT EXISTS leitor_nome_prefixo_idx
+                    ON Leitor (lower(nome) text_pattern_ops);
+                CREATE INDEX IF NOT EXISTS leitor_cpf_prefixo_idx
+                    ON Leitor (cpf text_pattern_ops);
+                CREATE INDEX IF NOT EXISTS livro_nome_prefixo_idx
+                    ON Livro (lower(nome) text_pattern_ops);
+                CREATE INDEX IF NOT EXISTS exemplar_patrimonio_prefixo_idx
+                    ON Exemplar ((numero_patrimonio::text) text_pattern_ops);
+
+                -- Empréstimos ativos por exemplar (filtro "disponível")
+                CREATE INDEX IF NOT EXISTS emprestimo_ativo_exemplar_idx
+                    ON Emprestimo (id_exemplar) WHERE status = 'Em Andamento';
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS leitor_nome_prefixo_idx;
+                DROP INDEX IF EXISTS leitor_cpf_prefixo_idx;
+                DROP INDEX IF EXISTS livro_nome_prefixo_idx;
+                DROP INDEX IF EXISTS exemplar_patrimonio_prefixo_idx;
+                DROP INDEX IF EXISTS emprestimo_ativo_exemplar_idx;
+            """,
+        ),
+    ]
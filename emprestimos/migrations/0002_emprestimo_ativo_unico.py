@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emprestimos', '0001_indices_autocomplete'),
+    ]
+
+    operations = [
+        # No máximo um empréstimo 'Em Andamento' por exemplar, garantido pelo
+        # banco (emprestimos/circulacao.py usa ON CONFLICT neste índice).
+        # Substitui o índice parcial comum criado na 0001.
+        # Se falhar por duplicidade, há exemplares com mais de um empréstimo
+        # ativo: regularize-os (devolução/exclusão) antes de migrar.
+        migrations.RunSQL(
+            sql="""
+                CREATE UNIQUE INDEX IF NOT EXISTS emprestimo_ativo_exemplar_uidx
+                    ON Emprestimo (id_exemplar) WHERE status = 'Em Andamento';
+                DROP INDEX IF EXISTS emprestimo_ativo_exemplar_idx;
+            """,
+            reverse_sql="""
+                CREATE INDEX IF NOT EXISTS emprestimo_ativo_exemplar_idx
+                    ON Emprestimo (id_exemplar) WHERE status = 'Em Andamento';
+                DROP INDEX IF EXISTS emprestimo_ativo_exemplar_uidx;
+            """,
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emprestimos', '0002_emprestimo_ativo_unico'),
+    ]
+
+    operations = [
+        # Motor de multas (emprestimos/multas.py): calendário de feriados
+        # (opcional, ver MULTA_POLITICA) e extrato das multas projetadas,
+        # gerado por `manage.py calcular_multas`.
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS feriado (
+                    data DATE PRIMARY KEY,
+                    descricao VARCHAR(100) NOT NULL DEFAULT ''
+                );
+
+                CREATE TABLE IF NOT EXISTS extrato_multa (
+                    dt_referencia DATE NOT NULL,
+                    id_emprestimo INTEGER NOT NULL,
+                    id_leitor INTEGER,
+                    dt_prevista_devolucao DATE NOT NULL,
+                    dias_atraso INTEGER NOT NULL,
+                    dias_cobrados INTEGER NOT NULL,
+                    valor NUMERIC(10, 2) NOT NULL,
+                    gerado_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (dt_referencia, id_emprestimo)
+                );
+                CREATE INDEX IF NOT EXISTS extrato_multa_emprestimo_idx
+                    ON extrato_multa (id_emprestimo, dt_referencia DESC);
+            """,
+            reverse_sql="""
+                DROP TABLE IF EXISTS extrato_multa;
+                DROP TABLE IF EXISTS feriado;
+            """,
+        ),
+    ]
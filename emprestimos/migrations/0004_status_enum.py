@@ -0,0 +1,143 @@
+from django.db import migrations
+
+# Objetos que dependem de Emprestimo.status. O PostgreSQL não troca o tipo
+# de uma coluna usada por views, e índices parciais seriam reconstruídos
+# com o predicado antigo (status::text = ...), que o planejador deixaria de
+# casar com `status = 'Em Andamento'`. Por isso são removidos antes e
+# recriados depois da troca (nos dois sentidos).
+REMOVER_DEPENDENTES = """
+    DROP MATERIALIZED VIEW IF EXISTS relatorio_atrasados_mv;
+    DROP MATERIALIZED VIEW IF EXISTS relatorio_emprestados_mv;
+    DROP MATERIALIZED VIEW IF EXISTS relatorio_historico_mv;
+    DROP INDEX IF EXISTS emprestimo_ativo_exemplar_uidx;
+    DROP INDEX IF EXISTS emprestimo_atraso_idx;
+"""
+
+# Mesma definição de relatorios/0001_snapshots
+RECRIAR_SNAPSHOTS = """
+    CREATE MATERIALIZED VIEW relatorio_atrasados_mv AS
+    SELECT
+        emp.id_emprestimo,
+        emp.id_leitor,
+        COALESCE(l.nome, 'Desconhecido') AS leitor_nome,
+        l.telefone AS leitor_telefone,
+        ex.numero_patrimonio,
+        COALESCE(lv.nome, 'Desconhecido') AS livro_nome,
+        emp.dt_prevista_devolucao
+    FROM Emprestimo emp
+    LEFT JOIN Leitor l ON l.id_leitor = emp.id_leitor
+    LEFT JOIN Exemplar ex ON ex.id_exemplar = emp.id_exemplar
+    LEFT JOIN Livro lv ON lv.id_livro = ex.id_livro
+    WHERE emp.status = 'Em Andamento'
+    WITH DATA;
+    CREATE UNIQUE INDEX relatorio_atrasados_mv_pk
+        ON relatorio_atrasados_mv (id_emprestimo);
+    CREATE INDEX relatorio_atrasados_mv_prevista_idx
+        ON relatorio_atrasados_mv (dt_prevista_devolucao, id_emprestimo);
+
+    CREATE MATERIALIZED VIEW relatorio_emprestados_mv AS
+    SELECT
+        emp.id_emprestimo,
+        COALESCE(l.nome, 'Desconhecido') AS leitor_nome,
+        ex.numero_patrimonio,
+        COALESCE(lv.nome, '-') AS livro_nome,
+        COALESCE(lv.nome, '') AS livro_ordem,
+        COALESCE((
+            SELECT array_agg(a.nome ORDER BY a.nome)
+            FROM autor_livro al JOIN Autor a ON a.id_autor = al.id_autor
+            WHERE al.id_livro = ex.id_livro
+        ), '{}') AS autores,
+        emp.dt_emprestimo,
+        emp.dt_prevista_devolucao
+    FROM Emprestimo emp
+    LEFT JOIN Leitor l ON l.id_leitor = emp.id_leitor
+    LEFT JOIN Exemplar ex ON ex.id_exemplar = emp.id_exemplar
+    LEFT JOIN Livro lv ON lv.id_livro = ex.id_livro
+    WHERE emp.status = 'Em Andamento'
+    WITH DATA;
+    CREATE UNIQUE INDEX relatorio_emprestados_mv_pk
+        ON relatorio_emprestados_mv (id_emprestimo);
+    CREATE INDEX relatorio_emprestados_mv_ordem_idx
+        ON relatorio_emprestados_mv (livro_ordem, id_emprestimo);
+
+    CREATE MATERIALIZED VIEW relatorio_historico_mv AS
+    SELECT
+        emp.id_emprestimo,
+        ex.id_livro,
+        ex.numero_patrimonio,
+        COALESCE(l.nome, 'Desconhecido') AS leitor_nome,
+        emp.dt_emprestimo,
+        emp.dt_devolucao,
+        emp.status
+    FROM Emprestimo emp
+    JOIN Exemplar ex ON ex.id_exemplar = emp.id_exemplar
+    LEFT JOIN Leitor l ON l.id_leitor = emp.id_leitor
+    WITH DATA;
+    CREATE UNIQUE INDEX relatorio_historico_mv_pk
+        ON relatorio_historico_mv (id_emprestimo);
+    CREATE INDEX relatorio_historico_mv_livro_idx
+        ON relatorio_historico_mv (id_livro, dt_emprestimo, id_emprestimo);
+
+    UPDATE relatorio_snapshot SET atualizado_em = now();
+"""
+
+RECRIAR_INDICES_ATIVOS = """
+    -- Um empréstimo ativo por exemplar (ON CONFLICT de emprestimos/circulacao.py)
+    CREATE UNIQUE INDEX emprestimo_ativo_exemplar_uidx
+        ON Emprestimo (id_exemplar) WHERE status = 'Em Andamento';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0001_esquema_base'),
+        ('emprestimos', '0003_extrato_multa'),
+        ('relatorios', '0001_snapshots'),
+    ]
+
+    operations = [
+        # Emprestimo.status passa de texto para um ENUM do PostgreSQL (4 bytes
+        # por linha em vez de 'Em Andamento' por extenso). As consultas não
+        # mudam: os literais 'Em Andamento' / 'Devolvido' são convertidos
+        # pelo banco, e o driver devolve o valor como str.
+        # Se a conversão falhar, há status fora desses dois valores:
+        # corrija-os antes de migrar.
+        #
+        # Junto da troca, o índice parcial dos atrasos: empréstimos ativos
+        # na ordem do relatório (data prevista, id), com leitor e exemplar no
+        # próprio índice para a página sair sem ler a tabela. Também serve
+        # ao motor de multas e às séries do painel.
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    CREATE TYPE status_emprestimo AS ENUM ('Em Andamento', 'Devolvido');
+                EXCEPTION WHEN duplicate_object THEN NULL;
+                END $$;
+            """
+            + REMOVER_DEPENDENTES
+            + """
+                ALTER TABLE Emprestimo ALTER COLUMN status DROP DEFAULT;
+                ALTER TABLE Emprestimo
+                    ALTER COLUMN status TYPE status_emprestimo USING status::text::status_emprestimo;
+                ALTER TABLE Emprestimo ALTER COLUMN status SET DEFAULT 'Em Andamento';
+
+                CREATE INDEX emprestimo_atraso_idx
+                    ON Emprestimo (dt_prevista_devolucao, id_emprestimo)
+                    INCLUDE (id_leitor, id_exemplar)
+                    WHERE status = 'Em Andamento';
+            """
+            + RECRIAR_INDICES_ATIVOS
+            + RECRIAR_SNAPSHOTS,
+            reverse_sql=REMOVER_DEPENDENTES
+            + """
+                ALTER TABLE Emprestimo ALTER COLUMN status DROP DEFAULT;
+                ALTER TABLE Emprestimo ALTER COLUMN status TYPE VARCHAR(20) USING status::text;
+                ALTER TABLE Emprestimo ALTER COLUMN status SET DEFAULT 'Em Andamento';
+                DROP TYPE IF EXISTS status_emprestimo;
+            """
+            + RECRIAR_INDICES_ATIVOS
+            + RECRIAR_SNAPSHOTS,
+        ),
+    ]
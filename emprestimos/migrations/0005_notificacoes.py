@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emprestimos', '0004_status_enum'),
+    ]
+
+    operations = [
+        # Registro dos avisos enviados aos leitores (emprestimos/notificacoes.py).
+        # Uma linha por empréstimo, tipo de aviso e referência (vencimento:
+        # a data prevista; atraso: o início de cada ciclo de repetição). A
+        # chave primária é o que impede o mesmo aviso de sair duas vezes.
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS notificacao_emprestimo (
+                    id_emprestimo INTEGER NOT NULL,
+                    tipo VARCHAR(20) NOT NULL CHECK (tipo IN ('vencimento', 'atraso')),
+                    referencia DATE NOT NULL,
+                    id_leitor INTEGER,
+                    canal VARCHAR(10) NOT NULL,
+                    destino VARCHAR(255) NOT NULL DEFAULT '',
+                    status VARCHAR(20) NOT NULL CHECK (status IN ('Enviada', 'Falhou')),
+                    tentativas SMALLINT NOT NULL DEFAULT 0,
+                    erro TEXT,
+                    enviada_em TIMESTAMPTZ,
+                    atualizada_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (id_emprestimo, tipo, referencia)
+                );
+                CREATE INDEX IF NOT EXISTS notificacao_leitor_idx
+                    ON notificacao_emprestimo (id_leitor, atualizada_em DESC);
+            """,
+            reverse_sql="DROP TABLE IF EXISTS notificacao_emprestimo;",
+        ),
+    ]
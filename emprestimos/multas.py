@@ -0,0 +1,167 @@
+"""
+Motor de multas por atraso e extrato (ledger) de multas projetadas.
+
+A política vem de settings.MULTA_POLITICA:
+
+    valor_diario       valor por dia cobrado (Decimal/str)
+    dias_carencia      dias de atraso tolerados; a cobrança começa depois deles
+    teto               valor máximo da multa por empréstimo (None = sem teto)
+    descontar_feriados dias da tabela `feriado` não contam como atraso
+
+O cálculo é uma expressão SQL (expressao_multa) aplicada de uma vez a todos
+os empréstimos atrasados, dentro do banco: nenhum empréstimo trafega até o
+Python. O comando noturno `calcular_multas` grava o resultado em
+`extrato_multa` (uma linha por empréstimo atrasado e data de referência),
+que é o extrato do financeiro e a fonte das telas:
+
+- devolução (individual e em lote): multa do extrato do dia;
+- relatório de atrasos: multa projetada mais recente de cada empréstimo.
+
+Sem linha do dia no extrato (comando ainda não rodou), as telas aplicam a
+mesma expressão ao empréstimo, então o valor é sempre o da política atual.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from gestao_biblioteca.banco_async import consultar
+
+
+class PoliticaMulta:
+    def __init__(self, valor_diario='1.00', dias_carencia=0, teto=None, descontar_feriados=False):
+        self.valor_diario = Decimal(str(valor_diario))
+        self.dias_carencia = int(dias_carencia)
+        self.teto = Decimal(str(teto)) if teto is not None else None
+        self.descontar_feriados = bool(descontar_feriados)
+
+    @classmethod
+    def configurada(cls):
+        return cls(**getattr(settings, 'MULTA_POLITICA', {}))
+
+    def parametros(self, hoje):
+        """Parâmetros nomeados usados por expressao_multa."""
+        return {
+            'hoje': hoje,
+            'valor_diario': self.valor_diario,
+            'dias_carencia': self.dias_carencia,
+            'teto': self.teto,
+            'descontar_feriados': self.descontar_feriados,
+        }
+
+
+def expressao_dias_cobrados(prevista='emp.dt_prevista_devolucao'):
+    """Dias de atraso cobráveis (sem feriados, menos a carência, nunca negativo)."""
+    return f"""
+        GREATEST(
+            (%(hoje)s::date - {prevista})
+            - CASE WHEN %(descontar_feriados)s THEN (
+                  SELECT COUNT(*) FROM feriado f
+                  WHERE f.data > {prevista} AND f.data <= %(hoje)s::date
+              ) ELSE 0 END
+            - %(dias_carencia)s,
+            0
+        )
+    """
+
+
+def expressao_multa(prevista='emp.dt_prevista_devolucao'):
+    """Valor da multa; LEAST ignora o teto quando ele é NULL."""
+    return f"LEAST(({expressao_dias_cobrados(prevista)}) * %(valor_diario)s::numeric, %(teto)s::numeric)"
+
+
+def expressao_multa_extrato(emprestimo='emp.id_emprestimo', prevista='emp.dt_prevista_devolucao'):
+    """Multa do extrato do dia; sem ela, o cálculo direto pela política."""
+    return f"""
+        COALESCE(
+            (SELECT x.valor FROM extrato_multa x
+             WHERE x.id_emprestimo = {emprestimo} AND x.dt_referencia = %(hoje)s::date),
+            {expressao_multa(prevista)}
+        )
+    """
+
+
+def calcular_extrato(cursor, hoje=None, politica=None):
+    """
+    (Re)calcula o extrato de `hoje` para todos os empréstimos atrasados.
+    Retorna (quantidade, total em multas).
+    """
+    hoje = hoje or date.today()
+    politica = politica or PoliticaMulta.configurada()
+    params = politica.parametros(hoje)
+
+    with transaction.atomic():
+        cursor.execute("DELETE FROM extrato_multa WHERE dt_referencia = %(hoje)s", params)
+        cursor.execute(
+            f"""
+            INSERT INTO extrato_multa
+                (dt_referencia, id_emprestimo, id_leitor, dt_prevista_devolucao,
+                 dias_atraso, dias_cobrados, valor)
+            SELECT
+                %(hoje)s, emp.id_emprestimo, emp.id_leitor, emp.dt_prevista_devolucao,
+                %(hoje)s::date - emp.dt_prevista_devolucao,
+                {expressao_dias_cobrados()},
+                {expressao_multa()}
+            FROM Emprestimo emp
+            WHERE emp.status = 'Em Andamento' AND emp.dt_prevista_devolucao < %(hoje)s
+            """,
+            params
+        )
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(valor), 0) FROM extrato_multa WHERE dt_referencia = %(hoje)s",
+            params
+        )
+        return cursor.fetchone()
+
+
+def multa_prevista(cursor, id_emprestimo, hoje=None):
+    """Multa de um empréstimo se devolvido `hoje` (extrato do dia ou política)."""
+    hoje = hoje or date.today()
+    params = PoliticaMulta.configurada().parametros(hoje)
+    params['id_emprestimo'] = id_emprestimo
+    cursor.execute(
+        f"""
+        SELECT {expressao_multa_extrato()}
+        FROM Emprestimo emp WHERE emp.id_emprestimo = %(id_emprestimo)s
+        """,
+        params
+    )
+    row = cursor.fetchone()
+    return row[0] if row else Decimal('0.00')
+
+
+SQL_MULTAS_PROJETADAS = """
+    SELECT DISTINCT ON (id_emprestimo) id_emprestimo, valor, dt_referencia
+    FROM extrato_multa
+    WHERE id_emprestimo = ANY(%s)
+    ORDER BY id_emprestimo, dt_referencia DESC
+"""
+
+
+def _preencher_multas(linhas, encontradas):
+    for linha in linhas:
+        multa = encontradas.get(linha['id_emprestimo'])
+        linha['multa_projetada'] = multa[0] if multa else None
+        linha['multa_referencia'] = multa[1] if multa else None
+
+
+def preencher_multas_projetadas(cursor, linhas):
+    """Multa mais recente do extrato para cada linha (chave id_emprestimo)."""
+    ids = [linha['id_emprestimo'] for linha in linhas]
+    encontradas = {}
+    if ids:
+        cursor.execute(SQL_MULTAS_PROJETADAS, [ids])
+        encontradas = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    _preencher_multas(linhas, encontradas)
+
+
+async def preencher_multas_projetadas_async(linhas):
+    ids = [linha['id_emprestimo'] for linha in linhas]
+    encontradas = {}
+    if ids:
+        encontradas = {
+            row['id_emprestimo']: (row['valor'], row['dt_referencia'])
+            for row in await consultar(SQL_MULTAS_PROJETADAS, [ids])
+        }
+    _preencher_multas(linhas, encontradas)
@@ -0,0 +1,348 @@
+"""
+Avisos aos leitores: empréstimos atrasados e a vencer.
+
+Em vez de a equipe ligar para cada leitor da lista de atrasos, o comando
+`enviar_notificacoes` (agendar uma vez por dia, depois do calcular_multas):
+
+1. coleta numa consulta só, já agrupada por leitor, os empréstimos em
+   andamento atrasados ou que vencem nos próximos `dias_antecedencia` dias,
+   com a multa do extrato, deixando de fora os avisos já enviados;
+2. monta uma mensagem por leitor com todos os empréstimos dele, por e-mail
+   (se houver) ou SMS (se houver telefone);
+3. envia em lotes de `tamanho_lote`, com até `concorrencia` lotes ao mesmo
+   tempo. Falhas temporárias são reenviadas até `retentativas` vezes, com
+   espera exponencial a partir de `espera_inicial` segundos;
+4. registra o resultado de cada empréstimo em `notificacao_emprestimo`.
+
+O aviso de atraso se repete a cada `repetir_atraso_dias` dias. Um aviso que
+falhou volta na execução seguinte, até `tentativas_maximas` tentativas no
+total. A configuração fica em settings.NOTIFICACOES.
+
+Os canais são classes com `enviar_lote(mensagens)`, configuradas em
+NOTIFICACOES_BACKENDS. O e-mail usa o SMTP do Django (EMAIL_HOST/PORT); o
+SMS padrão só registra no log, até existir um gateway contratado.
+"""
+import logging
+import random
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from .multas import PoliticaMulta, expressao_multa_extrato
+
+logger = logging.getLogger('biblioteca.notificacoes')
+
+CONFIGURACAO_PADRAO = {
+    'dias_antecedencia': 2,
+    'repetir_atraso_dias': 7,
+    'tamanho_lote': 50,
+    'concorrencia': 4,
+    'retentativas': 3,
+    'espera_inicial': 2.0,
+    'tentativas_maximas': 10,
+}
+
+BACKENDS_PADRAO = {
+    'email': 'emprestimos.notificacoes.BackendEmail',
+    'sms': 'emprestimos.notificacoes.BackendSMSLog',
+}
+
+STATUS_ENVIADA = 'Enviada'
+STATUS_FALHOU = 'Falhou'
+
+# Uma execução por vez (pg_try_advisory_lock)
+CHAVE_TRAVA = 'enviar_notificacoes'
+
+
+def configuracao():
+    return {**CONFIGURACAO_PADRAO, **getattr(settings, 'NOTIFICACOES', {})}
+
+
+# --- Coleta ---
+
+def sql_pendentes():
+    """Empréstimos a avisar, agrupados por leitor (parâmetros nomeados)."""
+    return f"""
+        WITH pendentes AS (
+            SELECT
+                emp.id_emprestimo,
+                emp.id_leitor,
+                emp.id_exemplar,
+                emp.dt_prevista_devolucao,
+                CASE WHEN emp.dt_prevista_devolucao < %(hoje)s::date
+                     THEN 'atraso' ELSE 'vencimento' END AS tipo,
+                -- Atraso: a referência é o início do ciclo de repetição
+                -- (1º dia de atraso, +repetir dias, ...); vencimento: a data prevista
+                CASE WHEN emp.dt_prevista_devolucao < %(hoje)s::date
+                     THEN emp.dt_prevista_devolucao + 1
+                          + (%(hoje)s::date - emp.dt_prevista_devolucao - 1)
+                            / %(repetir)s * %(repetir)s
+                     ELSE emp.dt_prevista_devolucao END AS referencia,
+                {expressao_multa_extrato()} AS multa
+            FROM Emprestimo emp
+            WHERE emp.status = 'Em Andamento'
+              AND emp.dt_prevista_devolucao <= %(hoje)s::date + %(antecedencia)s::int
+        )
+        SELECT
+            l.id_leitor, l.nome, l.email, l.telefone,
+            json_agg(json_build_object(
+                'id_emprestimo', p.id_emprestimo,
+                'tipo', p.tipo,
+                'referencia', p.referencia,
+                'dt_prevista_devolucao', p.dt_prevista_devolucao,
+                'multa', p.multa,
+                'livro_nome', COALESCE(lv.nome, 'Desconhecido'),
+                'numero_patrimonio', ex.numero_patrimonio
+            ) ORDER BY p.dt_prevista_devolucao, p.id_emprestimo) AS emprestimos
+        FROM pendentes p
+        JOIN Leitor l ON l.id_leitor = p.id_leitor
+        LEFT JOIN Exemplar ex ON ex.id_exemplar = p.id_exemplar
+        LEFT JOIN Livro lv ON lv.id_livro = ex.id_livro
+        WHERE NOT EXISTS (
+            SELECT 1 FROM notificacao_emprestimo n
+            WHERE n.id_emprestimo = p.id_emprestimo
+              AND n.tipo = p.tipo
+              AND n.referencia = p.referencia
+              AND (n.status = 'Enviada' OR n.tentativas >= %(tentativas_maximas)s)
+        )
+        GROUP BY l.id_leitor, l.nome, l.email, l.telefone
+        ORDER BY l.id_leitor
+    """
+
+
+def _emprestimo(item, hoje):
+    """Item do json_agg com os tipos do Python (datas e Decimal)."""
+    item['referencia'] = date.fromisoformat(item['referencia'])
+    item['dt_prevista_devolucao'] = date.fromisoformat(item['dt_prevista_devolucao'])
+    item['multa'] = Decimal(str(item['multa'])) if item['multa'] is not None else Decimal('0')
+    item['dias'] = abs((hoje - item['dt_prevista_devolucao']).days)
+    return item
+
+
+def coletar_pendentes(cursor, hoje=None, config=None):
+    """[{id_leitor, nome, email, telefone, emprestimos: [...]}] dos leitores a avisar."""
+    hoje = hoje or date.today()
+    config = config or configuracao()
+    params = {
+        **PoliticaMulta.configurada().parametros(hoje),
+        'antecedencia': config['dias_antecedencia'],
+        'repetir': max(1, config['repetir_atraso_dias']),
+        'tentativas_maximas': config['tentativas_maximas'],
+    }
+    cursor.execute(sql_pendentes(), params)
+    colunas = [col[0] for col in cursor.description]
+    leitores = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+    for leitor in leitores:
+        leitor['emprestimos'] = [_emprestimo(item, hoje) for item in leitor['emprestimos']]
+    return leitores
+
+
+# --- Mensagens ---
+
+def montar_mensagem(leitor, hoje):
+    """Mensagem única do leitor (dict) ou None se ele não tem e-mail nem telefone."""
+    if leitor['email']:
+        canal, destino = 'email', leitor['email']
+    elif leitor['telefone']:
+        canal, destino = 'sms', leitor['telefone']
+    else:
+        return None
+
+    atrasados = [emp for emp in leitor['emprestimos'] if emp['tipo'] == 'atraso']
+    a_vencer = [emp for emp in leitor['emprestimos'] if emp['tipo'] == 'vencimento']
+    contexto = {
+        'leitor': leitor,
+        'atrasados': atrasados,
+        'a_vencer': a_vencer,
+        'multa_total': sum((emp['multa'] for emp in atrasados), Decimal('0')),
+        'hoje': hoje,
+    }
+    return {
+        'canal': canal,
+        'destino': destino,
+        'leitor': leitor,
+        'assunto': 'Biblioteca: devolução em atraso' if atrasados else 'Biblioteca: devolução próxima',
+        'texto': render_to_string(f'notificacoes/aviso_{canal}.txt', contexto).strip(),
+    }
+
+
+# --- Canais ---
+
+class ErroEnvio(Exception):
+    """Falha ao enviar uma mensagem; temporaria=False não adianta reenviar."""
+
+    def __init__(self, mensagem, temporaria=True):
+        super().__init__(mensagem)
+        self.temporaria = temporaria
+
+
+class BackendEmail:
+    """E-mail pelo SMTP do Django: uma conexão por lote."""
+
+    def enviar_lote(self, mensagens):
+        """Envia as mensagens; retorna a lista de erros (None = enviada), na mesma ordem."""
+        remetente = getattr(settings, 'NOTIFICACOES_REMETENTE', settings.DEFAULT_FROM_EMAIL)
+        erros = []
+        with get_connection(fail_silently=False) as conexao:
+            for mensagem in mensagens:
+                email = EmailMessage(
+                    mensagem['assunto'], mensagem['texto'], remetente, [mensagem['destino']], connection=conexao
+                )
+                try:
+                    email.send()
+                    erros.append(None)
+                except smtplib.SMTPRecipientsRefused as erro:
+                    erros.append(ErroEnvio(f'Destinatário recusado: {erro}', temporaria=False))
+                except (smtplib.SMTPException, OSError) as erro:
+                    erros.append(ErroEnvio(str(erro)))
+        return erros
+
+
+class BackendSMSLog:
+    """SMS de mentira: só registra no log. Troque por um gateway com o mesmo enviar_lote."""
+
+    def enviar_lote(self, mensagens):
+        for mensagem in mensagens:
+            logger.info('SMS para %s: %s', mensagem['destino'], mensagem['texto'])
+        return [None] * len(mensagens)
+
+
+def carregar_backends():
+    caminhos = {**BACKENDS_PADRAO, **getattr(settings, 'NOTIFICACOES_BACKENDS', {})}
+    return {canal: import_string(caminho)() for canal, caminho in caminhos.items()}
+
+
+def enviar_com_retentativa(backend, mensagens, config=None):
+    """
+    Envia o lote; as falhas temporárias são reenviadas com espera
+    exponencial (com variação aleatória, para os lotes não voltarem juntos).
+    Retorna (erros, tentativas), uma posição por mensagem.
+    """
+    config = config or configuracao()
+    erros = [None] * len(mensagens)
+    tentativas = [0] * len(mensagens)
+    pendentes = list(range(len(mensagens)))
+
+    for rodada in range(max(1, config['retentativas'] + 1)):
+        if rodada:
+            time.sleep(config['espera_inicial'] * 2 ** (rodada - 1) * random.uniform(1, 1.5))
+        try:
+            resultado = backend.enviar_lote([mensagens[i] for i in pendentes])
+        except Exception as erro:
+            # Falha do lote inteiro (servidor fora do ar): todas tentam de novo
+            resultado = [ErroEnvio(str(erro))] * len(pendentes)
+
+        proximos = []
+        for i, erro in zip(pendentes, resultado):
+            tentativas[i] += 1
+            erros[i] = erro
+            if erro is not None and erro.temporaria:
+                proximos.append(i)
+        pendentes = proximos
+        if not pendentes:
+            break
+    return erros, tentativas
+
+
+# --- Registro ---
+
+SQL_REGISTRAR = """
+    INSERT INTO notificacao_emprestimo
+        (id_emprestimo, tipo, referencia, id_leitor, canal, destino, status, tentativas, erro, enviada_em)
+    SELECT x.id_emprestimo, x.tipo, x.referencia, x.id_leitor, %s, x.destino, x.status, x.tentativas, x.erro,
+           CASE WHEN x.status = 'Enviada' THEN now() END
+    FROM unnest(%s::int[], %s::text[], %s::date[], %s::int[], %s::text[], %s::text[], %s::int[], %s::text[])
+        AS x(id_emprestimo, tipo, referencia, id_leitor, destino, status, tentativas, erro)
+    ON CONFLICT (id_emprestimo, tipo, referencia) DO UPDATE SET
+        canal = EXCLUDED.canal,
+        destino = EXCLUDED.destino,
+        status = EXCLUDED.status,
+        tentativas = notificacao_emprestimo.tentativas + EXCLUDED.tentativas,
+        erro = EXCLUDED.erro,
+        enviada_em = EXCLUDED.enviada_em,
+        atualizada_em = now()
+"""
+
+
+def registrar_envios(cursor, canal, mensagens, erros, tentativas, config=None):
+    """Uma linha por empréstimo de cada mensagem do lote (um comando só)."""
+    config = config or configuracao()
+    colunas = [[] for _ in range(8)]
+    for mensagem, erro, quantidade in zip(mensagens, erros, tentativas):
+        if erro is not None and not erro.temporaria:
+            # Erro definitivo (endereço inválido): não volta nas próximas execuções
+            quantidade = config['tentativas_maximas']
+        for emp in mensagem['leitor']['emprestimos']:
+            valores = (
+                emp['id_emprestimo'], emp['tipo'], emp['referencia'], mensagem['leitor']['id_leitor'],
+                mensagem['destino'], STATUS_FALHOU if erro else STATUS_ENVIADA, quantidade,
+                str(erro) if erro else None,
+            )
+            for coluna, valor in zip(colunas, valores):
+                coluna.append(valor)
+    cursor.execute(SQL_REGISTRAR, [canal, *colunas])
+
+
+# --- Pipeline ---
+
+def _lotes(itens, tamanho):
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+
+def enviar_notificacoes(cursor, hoje=None, simular=False):
+    """
+    Coleta, monta e envia os avisos do dia. Retorna o resumo
+    {'leitores', 'enviadas', 'falhas', 'sem_contato', 'por_canal', 'mensagens'}
+    (`mensagens` só quando simular=True, que não envia nem registra nada).
+    """
+    hoje = hoje or date.today()
+    config = configuracao()
+    leitores = coletar_pendentes(cursor, hoje, config)
+
+    por_canal = {}
+    sem_contato = 0
+    for leitor in leitores:
+        mensagem = montar_mensagem(leitor, hoje)
+        if mensagem is None:
+            sem_contato += 1
+            continue
+        por_canal.setdefault(mensagem['canal'], []).append(mensagem)
+
+    resumo = {
+        'leitores': len(leitores),
+        'enviadas': 0,
+        'falhas': 0,
+        'sem_contato': sem_contato,
+        'por_canal': {canal: len(mensagens) for canal, mensagens in por_canal.items()},
+    }
+    if simular:
+        resumo['mensagens'] = [mensagem for mensagens in por_canal.values() for mensagem in mensagens]
+        return resumo
+
+    backends = carregar_backends()
+    # Os envios rodam em threads; o registro, na thread principal (cursor)
+    with ThreadPoolExecutor(max_workers=max(1, config['concorrencia'])) as executor:
+        futuros = {
+            executor.submit(enviar_com_retentativa, backends[canal], lote, config): (canal, lote)
+            for canal, mensagens in por_canal.items()
+            for lote in _lotes(mensagens, max(1, config['tamanho_lote']))
+        }
+        for futuro in as_completed(futuros):
+            canal, lote = futuros[futuro]
+            erros, tentativas = futuro.result()
+            registrar_envios(cursor, canal, lote, erros, tentativas, config)
+            falhas = sum(1 for erro in erros if erro is not None)
+            resumo['falhas'] += falhas
+            resumo['enviadas'] += len(lote) - falhas
+            for mensagem, erro in zip(lote, erros):
+                if erro is not None:
+                    logger.warning('Aviso para %s (%s) falhou: %s', mensagem['leitor']['nome'], mensagem['destino'], erro)
+    return resumo
@@ -1,3 +1,88 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from gestao_biblioteca.dados_sinteticos import gerar_biblioteca
+
+from .circulacao import PATRIMONIO_INEXISTENTE, SEM_EMPRESTIMO_ATIVO, registrar_emprestimos
+
+
+class DevolucaoLoteAPITests(TestCase):
+    """Contrato JSON da devolução em lote, com o fluxo de sessão + X-CSRFToken do terminal."""
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            gerar_biblioteca(cursor, livros=10, autores=5, leitores=5, anos=1)
+            cursor.execute("SELECT id_funcionario, email, senha FROM Funcionario ORDER BY id_funcionario LIMIT 1")
+            id_funcionario, cls.email, cls.senha = cursor.fetchone()
+            cursor.execute("SELECT MIN(id_leitor) FROM Leitor")
+            id_leitor = cursor.fetchone()[0]
+            cursor.execute(
+                """
+                SELECT ex.id_exemplar, ex.numero_patrimonio FROM Exemplar ex
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM Emprestimo emp
+                    WHERE emp.id_exemplar = ex.id_exemplar AND emp.status = 'Em Andamento'
+                )
+                ORDER BY ex.id_exemplar LIMIT 3
+                """
+            )
+            (no_prazo, cls.patrimonio_no_prazo), (atrasado, cls.patrimonio_atrasado), (_livre, cls.patrimonio_livre) = (
+                cursor.fetchall()
+            )
+            registrar_emprestimos(cursor, id_leitor, [no_prazo], id_funcionario)
+            registrar_emprestimos(cursor, id_leitor, [atrasado], id_funcionario, hoje=date.today() - timedelta(days=30))
+            cursor.execute("SELECT MAX(numero_patrimonio) + 1000 FROM Exemplar")
+            cls.patrimonio_inexistente = cursor.fetchone()[0]
+
+    def setUp(self):
+        self.terminal = Client(enforce_csrf_checks=True)
+        self.terminal.get(reverse('login'))
+        self.terminal.post(reverse('login'), {
+            'email': self.email, 'senha': self.senha,
+            'csrfmiddlewaretoken': self.terminal.cookies['csrftoken'].value,
+        })
+
+    def enviar(self, patrimonios, com_token=True):
+        cabecalhos = {'X-CSRFToken': self.terminal.cookies['csrftoken'].value} if com_token else {}
+        return self.terminal.post(
+            reverse('emprestimos:devolucao_lote_api'),
+            json.dumps({'patrimonios': patrimonios}),
+            content_type='application/json',
+            headers=cabecalhos,
+        )
+
+    def test_sem_token_csrf_recusa(self):
+        response = self.enviar([self.patrimonio_no_prazo], com_token=False)
+        self.assertEqual(response.status_code, 403)
+
+    def test_resumo(self):
+        response = self.enviar(
+            [self.patrimonio_no_prazo, str(self.patrimonio_atrasado), self.patrimonio_livre, self.patrimonio_inexistente]
+        )
+        self.assertEqual(response.status_code, 200)
+        resumo = response.json()
+
+        self.assertEqual([emp['numero_patrimonio'] for emp in resumo['sem_pendencia']], [self.patrimonio_no_prazo])
+        self.assertEqual(resumo['sem_pendencia'][0]['dias_atraso'], 0)
+
+        self.assertEqual([emp['numero_patrimonio'] for emp in resumo['revisar_multa']], [self.patrimonio_atrasado])
+        revisar = resumo['revisar_multa'][0]
+        self.assertEqual(revisar['dias_atraso'], 16)
+        self.assertEqual(
+            set(revisar), {'id_emprestimo', 'numero_patrimonio', 'leitor', 'livro', 'dias_atraso', 'multa_calculada'}
+        )
+
+        self.assertEqual(resumo['falhas'], [
+            {'numero_patrimonio': self.patrimonio_livre, 'motivo': SEM_EMPRESTIMO_ATIVO},
+            {'numero_patrimonio': self.patrimonio_inexistente, 'motivo': PATRIMONIO_INEXISTENTE},
+        ])
+
+    def test_patrimonio_invalido(self):
+        response = self.enviar([self.patrimonio_no_prazo, True])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('true', response.json()['erro'])
@@ -13,7 +13,17 @@ urlpatterns = [
     # (DEVOLUÇÃO)
     # /emprestimos/devolucao/ 
     path('devolucao/', views.registrar_devolucao_view, name='registrar_devolucao'),
+
+    # (DEVOLUÇÃO EM LOTE) /emprestimos/devolucao/lote/ (tela) e .../lote/api/ (JSON)
+    path('devolucao/lote/', views.devolucao_lote_view, name='devolucao_lote'),
+    path('devolucao/lote/multas/', views.confirmar_multas_lote_view, name='confirmar_multas_lote'),
+    path('devolucao/lote/api/', views.devolucao_lote_api_view, name='devolucao_lote_api'),
     
     # (DELETE) /emprestimos/excluir/5/
     path('excluir/<int:pk>/', views.excluir_emprestimo_view, name='excluir_emprestimo'),
+
+    # (AUTOCOMPLETE) /emprestimos/buscar/leitores/?q=...
+    path('buscar/leitores/', views.autocomplete_leitores_view, name='autocomplete_leitores'),
+    path('buscar/exemplares/', views.autocomplete_exemplares_view, name='autocomplete_exemplares'),
+    path('buscar/emprestimos/', views.autocomplete_emprestimos_view, name='autocomplete_emprestimos'),
 ]
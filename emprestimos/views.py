@@ -1,8 +1,20 @@
 from django.shortcuts import render, redirect
+from django.http import JsonResponse
 from django.contrib import messages
-from django.db import connection, IntegrityError
-from .forms import DevolucaoForm, EmprestimoForm, get_emprestimos_ativos_choices 
-from datetime import date, timedelta
+from django.db import connection, IntegrityError, transaction
+import json
+from decimal import Decimal, InvalidOperation
+from django.views.decorators.http import require_POST
+from .forms import DevolucaoForm, DevolucaoLoteForm, EmprestimoForm
+from .autocomplete import buscar_emprestimos_ativos, buscar_exemplares_disponiveis, buscar_leitores
+from .circulacao import MAX_EXEMPLARES_POR_EMPRESTIMO, confirmar_multas, registrar_devolucoes, registrar_emprestimos
+from .multas import multa_prevista
+from datetime import date
+from gestao_biblioteca.hidratacao import hidratar
+from gestao_biblioteca.paginacao import paginar
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
+from gestao_biblioteca.estatisticas import ajustar_contador
+from livros.disponibilidade import ajustar_disponibilidade
 
 # --- Helper Function ---
 def dictfetchall(cursor):
@@ -72,41 +84,40 @@ def cadastrar_emprestimo_view(request):
             dados = form.cleaned_data
             
             # Auditoria: Captura qual funcionário está realizando a operação
-            id_funcionario_logado = request.session.get('funcionario_logado_id')
-            if not id_funcionario_logado:
-                return redirect('login')
+            id_funcionario_logado = request.funcionario['id']
 
             try:
+                # Todos os exemplares numa transação, travados contra outros balcões
                 with connection.cursor() as cursor:
-                    # Regra de Negócio: Definição de prazos via Python
-                    data_hoje = date.today()
-                    data_prevista = data_hoje + timedelta(days=14) 
-                    
-                    # Persistência com Status Inicial
-                    cursor.execute(
-                        """
-                        INSERT INTO Emprestimo 
-                        (id_exemplar, id_leitor, id_funcionario, dt_emprestimo, dt_prevista_devolucao, status)
-                        VALUES (%s, %s, %s, %s, %s, 'Em Andamento')
-                        """,
-                        [dados['exemplar'], dados['leitor'], id_funcionario_logado, data_hoje, data_prevista]
+                    resultado = registrar_emprestimos(
+                        cursor, dados['leitor'], dados['exemplares'], id_funcionario_logado
                     )
-                messages.success(request, 'Empréstimo registrado com sucesso!')
-                return redirect('emprestimos:emprestimo_list')
+
+                rotulos = dict(form.rotulos['exemplares'])
+                for id_exemplar, motivo in resultado.falhas.items():
+                    messages.warning(request, f'{rotulos.get(id_exemplar, id_exemplar)}: {motivo}.')
+
+                if resultado.criados:
+                    messages.success(request, f'{len(resultado.criados)} empréstimo(s) registrado(s) com sucesso!')
+                    return redirect('emprestimos:emprestimo_list')
+                # Nenhum criado: o formulário volta como enviado, com os avisos acima
             except Exception as e:
                 messages.error(request, f'Erro: {e}')
     else:
         form = EmprestimoForm()
-    return render(request, 'emprestimo/cadastrar_emprestimo.html', {'form': form})
+    return render(request, 'emprestimo/cadastrar_emprestimo.html', {
+        'form': form, 'max_exemplares': MAX_EXEMPLARES_POR_EMPRESTIMO,
+    })
 
 # READ (Consultar Empréstimos - SEM JOIN)
+@leitura_na_replica
 def consultar_emprestimos_view(request):
     query = request.GET.get('q', '') 
     
     contexto = { 'query': query }
     
     try:
-        with connection.cursor() as cursor:
+        with conexao_leitura().cursor() as cursor:
             # 1. CORREÇÃO DA DATA: Adicionado 'dt_emprestimo' ao SELECT
             sql = """
                 SELECT 
@@ -115,7 +126,12 @@ def consultar_emprestimos_view(request):
                     dt_prevista_devolucao,
                     status,
                     id_exemplar,
-                    id_leitor
+                    id_leitor,
+                    COALESCE((
+                        SELECT nome FROM Livro WHERE id_livro = (
+                            SELECT id_livro FROM Exemplar WHERE id_exemplar = Emprestimo.id_exemplar
+                        )
+                    ), '') AS livro_ordem
                 FROM Emprestimo 
                 WHERE status = 'Em Andamento'
             """
@@ -138,37 +154,23 @@ def consultar_emprestimos_view(request):
                 """
                 params.extend([f'%{query}%', f'%{query}%', f'%{query}%'])
             
-            # 3. CORREÇÃO DA ORDENAÇÃO: Ordena pelo NOME do livro usando Sub-queries
-            sql += """
-                ORDER BY (
-                    SELECT nome FROM Livro WHERE id_livro = (
-                        SELECT id_livro FROM Exemplar WHERE id_exemplar = Emprestimo.id_exemplar
-                    )
-                ) ASC, dt_prevista_devolucao ASC
-            """
-            
-            cursor.execute(sql, params)
-            emprestimos = dictfetchall(cursor)
+            # 3. CORREÇÃO DA ORDENAÇÃO: Ordena pelo NOME do livro (Sub-query em 'livro_ordem')
+            # e pela data prevista, com paginação por chave
+            pagina = paginar(request, cursor, sql, params, ['livro_ordem', 'dt_prevista_devolucao', 'pk'], contar=True)
+            emprestimos = pagina.itens
+
+            # 4. Enriquecimento de dados (Hidratação em lote: 1 query por tabela)
+            hidratar(request, cursor, emprestimos, {'id_leitor', 'id_exemplar'})
+            hidratar(request, cursor, [emp['exemplar'] for emp in emprestimos if emp['exemplar']], {'id_livro'})
 
-            # 4. Enriquecimento de dados (Loop para buscar nomes)
             hoje = date.today()
             for emp in emprestimos:
-                # Busca Nome Leitor
-                cursor.execute("SELECT nome FROM Leitor WHERE id_leitor = %s", [emp['id_leitor']])
-                row = cursor.fetchone()
-                emp['leitor_nome'] = row[0] if row else "Desconhecido"
+                emp['leitor_nome'] = emp['leitor']['nome'] if emp['leitor'] else "Desconhecido"
 
-                # Busca Dados Exemplar e Livro
-                cursor.execute("SELECT numero_patrimonio, id_livro FROM Exemplar WHERE id_exemplar = %s", [emp['id_exemplar']])
-                row_ex = cursor.fetchone()
-                
-                if row_ex:
-                    emp['numero_patrimonio'] = row_ex[0]
-                    id_livro = row_ex[1]
-                    
-                    cursor.execute("SELECT nome FROM Livro WHERE id_livro = %s", [id_livro])
-                    row_livro = cursor.fetchone()
-                    emp['livro_nome'] = row_livro[0] if row_livro else "Desconhecido"
+                if emp['exemplar']:
+                    emp['numero_patrimonio'] = emp['exemplar']['numero_patrimonio']
+                    livro = emp['exemplar']['livro']
+                    emp['livro_nome'] = livro['nome'] if livro else "Desconhecido"
                 else:
                     emp['numero_patrimonio'] = "?"
                     emp['livro_nome'] = "?"
@@ -181,7 +183,8 @@ def consultar_emprestimos_view(request):
                     emp['is_atrasado'] = False
             
             contexto['emprestimos'] = emprestimos
-            contexto['total_ativos'] = len(emprestimos)
+            contexto['pagina'] = pagina
+            contexto['total_ativos'] = pagina.total
 
         return render(request, 'emprestimo/consultar_emprestimos.html', contexto)
     
@@ -192,7 +195,6 @@ def consultar_emprestimos_view(request):
 # UPDATE (Registrar Devolução)
 def registrar_devolucao_view(request):
     contexto = {}
-    contexto['lista_emprestimos_ativos'] = get_emprestimos_ativos_choices()
 
     emprestimo_id = request.GET.get('emprestimo_id') or request.POST.get('emprestimo_id')
 
@@ -210,17 +212,22 @@ def registrar_devolucao_view(request):
     contexto['emprestimo_id_selecionado'] = int(emprestimo_id)
 
     # Cálculo de Multa (Regra de Negócio)
-    # A lógica de "quanto cobrar" fica no código, não no banco.
+    # O valor vem do extrato do dia (ou da política de multas, em emprestimos/multas.py);
+    # dentro da carência há atraso, mas nada a cobrar.
     data_prevista = emprestimo['dt_prevista_devolucao']
     hoje = date.today()
     dias_atraso = (hoje - data_prevista).days
     is_late = dias_atraso > 0
-    
+    with connection.cursor() as cursor:
+        multa_calculada = multa_prevista(cursor, emprestimo_id, hoje) if is_late else Decimal('0.00')
+    cobra_multa = multa_calculada > 0
+
     contexto['is_late'] = is_late
+    contexto['cobra_multa'] = cobra_multa
     contexto['dias_atraso'] = dias_atraso if is_late else 0
 
     if request.method == 'POST':
-        form = DevolucaoForm(request.POST, is_late=is_late)
+        form = DevolucaoForm(request.POST, is_late=cobra_multa)
 
         if form.is_valid():
             dados = form.cleaned_data
@@ -230,7 +237,7 @@ def registrar_devolucao_view(request):
             try:
                 # Transação de Encerramento
                 # Atualiza Status, Data Real, Multa e Ocorrência em um único comando
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     cursor.execute(
                         """
                         UPDATE Emprestimo
@@ -238,10 +245,17 @@ def registrar_devolucao_view(request):
                             dt_devolucao = %s,
                             multa = %s,
                             ocorrencia = %s
-                        WHERE id_emprestimo = %s
+                        WHERE id_emprestimo = %s AND status = 'Em Andamento'
                         """,
                         [hoje, valor_multa, texto_ocorrencia, emprestimo_id]
                     )
+
+                    # Só devolve o exemplar aos contadores se o empréstimo estava ativo
+                    if cursor.rowcount == 0:
+                        messages.error(request, 'Empréstimo não encontrado ou já devolvido.')
+                        return redirect('emprestimos:registrar_devolucao')
+                    ajustar_disponibilidade(cursor, emprestimo['id_exemplar'], emprestados=-1)
+                    ajustar_contador(cursor, 'emprestimos_ativos', -1)
                 
                 messages.success(request, f"Devolução do livro '{emprestimo['livro_nome']}' registrada com sucesso!")
                 return redirect('emprestimos:emprestimo_list')
@@ -251,10 +265,9 @@ def registrar_devolucao_view(request):
             messages.warning(request, 'Verifique os erros no formulário abaixo.')
     else:
         initial_data = {}
-        if is_late:
-            multa_calculada = dias_atraso * 1.00
+        if cobra_multa:
             initial_data['multa'] = f"{multa_calculada:.2f}"
-        form = DevolucaoForm(initial=initial_data, is_late=is_late)
+        form = DevolucaoForm(initial=initial_data, is_late=cobra_multa)
 
     contexto['form'] = form
     return render(request, 'emprestimo/devolver_emprestimo.html', contexto)
@@ -270,8 +283,16 @@ def excluir_emprestimo_view(request, pk):
 
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
-                cursor.execute("DELETE FROM Emprestimo WHERE id_emprestimo = %s", [pk])
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM Emprestimo WHERE id_emprestimo = %s RETURNING id_exemplar, status",
+                    [pk]
+                )
+                row = cursor.fetchone()
+                # Excluir um empréstimo ativo libera o exemplar
+                if row and row[1] == 'Em Andamento':
+                    ajustar_disponibilidade(cursor, row[0], emprestados=-1)
+                    ajustar_contador(cursor, 'emprestimos_ativos', -1)
             
             messages.success(request, 'Registro de empréstimo excluído com sucesso.')
             return redirect('emprestimos:emprestimo_list')
@@ -282,4 +303,157 @@ def excluir_emprestimo_view(request, pk):
             messages.error(request, f'Ocorreu um erro ao excluir: {e}')
             return redirect('emprestimos:emprestimo_list')
 
-    return render(request, 'emprestimo/excluir_emprestimo.html', {'emprestimo': emprestimo_detalhes})
\ No newline at end of file
+    return render(request, 'emprestimo/excluir_emprestimo.html', {'emprestimo': emprestimo_detalhes})
+
+# --- DEVOLUÇÃO EM LOTE ---
+
+def _descrever_devolvidos(request, cursor, devolvidos):
+    """Leitor e obra de cada empréstimo devolvido (hidratação em lote)."""
+    hidratar(request, cursor, devolvidos, {'id_leitor', 'id_exemplar'})
+    hidratar(request, cursor, [emp['exemplar'] for emp in devolvidos if emp['exemplar']], {'id_livro'})
+    for emp in devolvidos:
+        emp['leitor_nome'] = emp['leitor']['nome'] if emp['leitor'] else "Desconhecido"
+        livro = emp['exemplar']['livro'] if emp['exemplar'] else None
+        emp['livro_nome'] = livro['nome'] if livro else "Desconhecido"
+
+def _devolver_lote(request, patrimonios):
+    with connection.cursor() as cursor:
+        resultado = registrar_devolucoes(cursor, patrimonios)
+        _descrever_devolvidos(request, cursor, resultado.devolvidos)
+    return resultado
+
+def devolucao_lote_view(request):
+    """
+    Devolução da caixa de coleta: lê vários patrimônios e encerra todos de uma vez.
+    O resumo separa os devolvidos sem pendência dos atrasados, cuja multa
+    (vinda do extrato de multas) o funcionário confirma ou ajusta em seguida.
+    """
+    resultado = None
+    if request.method == 'POST':
+        form = DevolucaoLoteForm(request.POST)
+        if form.is_valid():
+            try:
+                resultado = _devolver_lote(request, form.cleaned_data['patrimonios'])
+                if resultado.devolvidos:
+                    messages.success(request, f'{len(resultado.devolvidos)} devolução(ões) registrada(s).')
+                form = DevolucaoLoteForm()
+            except Exception as e:
+                messages.error(request, f'Erro no banco de dados: {e}')
+    else:
+        form = DevolucaoLoteForm()
+
+    return render(request, 'emprestimo/devolucao_lote.html', {'form': form, 'resultado': resultado})
+
+@require_POST
+def confirmar_multas_lote_view(request):
+    """Grava as multas decididas para os atrasados do resumo (campos multa_<id>)."""
+    multas = {}
+    for campo, valor in request.POST.items():
+        if not campo.startswith('multa_'):
+            continue
+        try:
+            id_emprestimo = int(campo[len('multa_'):])
+            multa = Decimal(valor.replace(',', '.') or '0')
+        except (ValueError, InvalidOperation):
+            messages.error(request, f'Valor de multa inválido: {valor}')
+            return redirect('emprestimos:devolucao_lote')
+        if multa < 0:
+            messages.error(request, 'A multa não pode ser negativa.')
+            return redirect('emprestimos:devolucao_lote')
+        multas[id_emprestimo] = multa
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            alterados = confirmar_multas(cursor, multas)
+        messages.success(request, f'Multa(s) de {alterados} devolução(ões) confirmada(s).')
+    except Exception as e:
+        messages.error(request, f'Erro no banco de dados: {e}')
+    return redirect('emprestimos:devolucao_lote')
+
+@require_POST
+def devolucao_lote_api_view(request):
+    """
+    POST JSON {"patrimonios": [1001, 1002, ...]} -> resumo em JSON
+    (para leitores de código de barras / terminais da caixa de devolução).
+    Cada patrimônio é um inteiro ou uma string só com dígitos.
+
+    O terminal usa a mesma sessão das telas, com a proteção CSRF do Django:
+    GET na página de login (recebe o cookie csrftoken), POST do login com
+    email, senha e csrfmiddlewaretoken e, daí em diante, cada lote com o
+    cookie de sessão e o cabeçalho X-CSRFToken igual ao cookie csrftoken.
+    Sem o cabeçalho a resposta é 403 (emprestimos/tests.py).
+
+    Resposta: {"sem_pendencia": [...], "revisar_multa": [...], "falhas":
+    [{"numero_patrimonio", "motivo"}]}; os dois primeiros trazem
+    id_emprestimo, numero_patrimonio, leitor, livro, dias_atraso e
+    multa_calculada.
+    """
+    try:
+        corpo = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'erro': 'JSON inválido.'}, status=400)
+
+    patrimonios = corpo.get('patrimonios') if isinstance(corpo, dict) else None
+    if not isinstance(patrimonios, list):
+        return JsonResponse({'erro': '"patrimonios" deve ser uma lista de números de patrimônio.'}, status=400)
+    invalidos = [
+        patrimonio for patrimonio in patrimonios
+        if isinstance(patrimonio, bool)
+        or not isinstance(patrimonio, (int, str))
+        or (isinstance(patrimonio, str) and not patrimonio.strip().isdigit())
+    ]
+    if invalidos:
+        return JsonResponse(
+            {'erro': f"Patrimônio(s) inválido(s): {', '.join(json.dumps(valor) for valor in invalidos[:10])}"},
+            status=400
+        )
+
+    form = DevolucaoLoteForm({'patrimonios': ' '.join(str(patrimonio).strip() for patrimonio in patrimonios)})
+    if not form.is_valid():
+        return JsonResponse({'erro': ' '.join(form.errors['patrimonios'])}, status=400)
+
+    try:
+        resultado = _devolver_lote(request, form.cleaned_data['patrimonios'])
+    except Exception as e:
+        return JsonResponse({'erro': f'Erro no banco de dados: {e}'}, status=500)
+
+    def item(emp):
+        return {
+            'id_emprestimo': emp['id_emprestimo'],
+            'numero_patrimonio': emp['numero_patrimonio'],
+            'leitor': emp['leitor_nome'],
+            'livro': emp['livro_nome'],
+            'dias_atraso': max(emp['dias_atraso'], 0),
+            'multa_calculada': str(emp['multa']),
+        }
+
+    return JsonResponse({
+        'sem_pendencia': [item(emp) for emp in resultado.sem_pendencia],
+        'revisar_multa': [item(emp) for emp in resultado.revisar],
+        'falhas': [
+            {'numero_patrimonio': patrimonio, 'motivo': motivo}
+            for patrimonio, motivo in resultado.falhas.items()
+        ],
+    })
+
+# --- AUTOCOMPLETE (JSON) ---
+# Usados pelos campos de busca dos formulários de empréstimo e devolução.
+# Só consultam o banco a partir de 2 caracteres e devolvem no máximo
+# LIMITE_SUGESTOES itens: {"resultados": [{"id": 1, "texto": "..."}]}
+
+def _autocomplete(request, buscar):
+    termo = request.GET.get('q', '').strip()
+    if len(termo) < 2:
+        return JsonResponse({'resultados': []})
+    with connection.cursor() as cursor:
+        resultados = buscar(cursor, termo)
+    return JsonResponse({'resultados': resultados})
+
+def autocomplete_leitores_view(request):
+    return _autocomplete(request, buscar_leitores)
+
+def autocomplete_exemplares_view(request):
+    return _autocomplete(request, buscar_exemplares_disponiveis)
+
+def autocomplete_emprestimos_view(request):
+    return _autocomplete(request, buscar_emprestimos_ativos)
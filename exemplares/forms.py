@@ -1,8 +1,12 @@
 from django import forms
 from django.db import connection
+from gestao_biblioteca.cache_escolhas import escolhas_em_cache
 
 def get_livros_choices():
-    """Busca todos os livros (obras) para usar como opções no formulário."""
+    """Busca todos os livros (obras) para usar como opções no formulário (com cache por versão)."""
+    return escolhas_em_cache('livros', ['Livro'], _buscar_livros_choices)
+
+def _buscar_livros_choices():
     with connection.cursor() as cursor:
         cursor.execute("SELECT id_livro, nome FROM Livro ORDER BY nome")
         choices = [(row[0], row[1]) for row in cursor.fetchall()]
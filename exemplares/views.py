@@ -1,7 +1,12 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.db import connection, IntegrityError
+from django.db import connection, IntegrityError, transaction
 from .forms import ExemplarForm
+from livros.disponibilidade import ajustar_disponibilidade, recalcular_disponibilidade
+from gestao_biblioteca.estatisticas import ajustar_contador
+from gestao_biblioteca.hidratacao import hidratar
+from gestao_biblioteca.paginacao import paginar
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
 
 # --- Helper Function ---
 def dictfetchall(cursor):
@@ -18,15 +23,19 @@ def cadastrar_exemplar_view(request):
         if form.is_valid():
             dados = form.cleaned_data
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     # INSERT Simples: Grava a FK (id_livro) diretamente na tabela Exemplar
                     cursor.execute(
                         """
                         INSERT INTO Exemplar (id_livro, numero_patrimonio, localizacao, dt_aquisicao, dt_publicacao, edicao)
                         VALUES (%s, %s, %s, %s, %s, %s)
+                        RETURNING id_exemplar
                         """,
                         [dados['livro'], dados['numero_patrimonio'], dados['localizacao'], dados['dt_aquisicao'], dados['dt_publicacao'], dados['edicao']]
                     )
+                    # Mais um exemplar físico para o livro (contadores de disponibilidade)
+                    ajustar_disponibilidade(cursor, cursor.fetchone()[0], total=1)
+                    ajustar_contador(cursor, 'exemplares', 1)
                 messages.success(request, 'Exemplar cadastrado com sucesso!')
                 return redirect('exemplares:exemplar_list')
             except Exception as e:
@@ -37,15 +46,18 @@ def cadastrar_exemplar_view(request):
     return render(request, 'exemplar/cadastrar_exemplar.html', {'form': form, 'editando': False})
 
 # READ (Consultar Exemplares)
+@leitura_na_replica
 def consultar_exemplares_view(request):
     query = request.GET.get('q', '')
     
     try:
-        with connection.cursor() as cursor:
+        with conexao_leitura().cursor() as cursor:
             # 1. Busca Inicial (Apenas dados do Exemplar)
             # Note que não trazemos o nome do livro aqui, apenas o ID.
             sql = """
-                SELECT e.id_exemplar AS pk, e.numero_patrimonio, e.localizacao, e.id_livro 
+                SELECT
+                    e.id_exemplar AS pk, e.numero_patrimonio, e.localizacao, e.id_livro,
+                    COALESCE((SELECT nome FROM Livro WHERE id_livro = e.id_livro), '') AS livro_ordem
                 FROM Exemplar e
             """
             params = []
@@ -59,21 +71,18 @@ def consultar_exemplares_view(request):
                 """
                 params.extend([f'%{query}%', f'%{query}%'])
             
-            # Ordenação via Subquery no ORDER BY
-            sql += " ORDER BY (SELECT nome FROM Livro WHERE id_livro = e.id_livro), e.numero_patrimonio"
-
-            cursor.execute(sql, params)
-            exemplares = dictfetchall(cursor)
-
-            # 3. "Hidratação" Manual dos Dados (Substitui o JOIN no SELECT)
-            # Para cada exemplar, fazemos uma query extra para buscar o nome do livro.
-            # Conhecido como padrão "N+1", usado aqui para fins didáticos de separação de responsabilidade.
+            # Ordenação (nome do livro via Subquery, patrimônio) com paginação por chave
+            pagina = paginar(request, cursor, sql, params, ['livro_ordem', 'numero_patrimonio', 'pk'])
+            exemplares = pagina.itens
+
+            # 3. "Hidratação" dos Dados (Substitui o JOIN no SELECT)
+            # Uma única query extra (WHERE id_livro = ANY) busca os nomes de todos os livros,
+            # evitando o padrão "N+1" (uma query por exemplar).
+            hidratar(request, cursor, exemplares, {'id_livro'})
             for exemplar in exemplares:
-                cursor.execute("SELECT nome FROM Livro WHERE id_livro = %s", [exemplar['id_livro']])
-                row = cursor.fetchone()
-                exemplar['livro_nome'] = row[0] if row else "Livro Desconhecido"
+                exemplar['livro_nome'] = exemplar['livro']['nome'] if exemplar['livro'] else "Livro Desconhecido"
 
-        return render(request, 'exemplar/consultar_exemplar.html', {'exemplares': exemplares})
+        return render(request, 'exemplar/consultar_exemplar.html', {'exemplares': exemplares, 'pagina': pagina})
     
     except Exception as e:
         messages.error(request, f"Ocorreu um erro ao consultar os exemplares: {e}")
@@ -124,7 +133,7 @@ def atualizar_exemplar_view(request, pk):
         if form.is_valid():
             dados = form.cleaned_data
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     # UPDATE padrão
                     cursor.execute(
                         """
@@ -134,6 +143,9 @@ def atualizar_exemplar_view(request, pk):
                         """,
                         [dados['livro'], dados['numero_patrimonio'], dados['localizacao'], dados['dt_aquisicao'], dados['dt_publicacao'], dados['edicao'], pk]
                     )
+                    # Se o exemplar mudou de obra, os dois livros têm os contadores refeitos
+                    if str(dados['livro']) != str(exemplar_data['livro']):
+                        recalcular_disponibilidade(cursor, [exemplar_data['livro'], int(dados['livro'])])
                 messages.success(request, 'Exemplar atualizado com sucesso!')
                 return redirect('exemplares:exemplar_list')
             except Exception as e:
@@ -164,9 +176,12 @@ def excluir_exemplar_view(request, pk):
 
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 # Tenta Exclusão Física
                 cursor.execute("DELETE FROM Exemplar WHERE id_exemplar = %s", [pk])
+                if cursor.rowcount:
+                    ajustar_contador(cursor, 'exemplares', -1)
+                recalcular_disponibilidade(cursor, [exemplar_row[1]])
             
             messages.success(request, f'Exemplar "{exemplar_data["numero_patrimonio"]}" excluído com sucesso.')
             return redirect('exemplares:exemplar_list')
@@ -4,6 +4,8 @@ from django.db import connection, IntegrityError
 # Importe o formulário do app local, e não do app antigo!
 # (Vamos criar este arquivo no Passo 2)
 from .forms import FuncionarioForm 
+from gestao_biblioteca.paginacao import paginar
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
 
 # --- CRUD DE FUNCIONÁRIOS ---
 def dictfetchall(cursor):
@@ -51,44 +53,31 @@ def cadastrar_funcionario_view(request):
     return render(request, 'funcionario/cadastrar_funcionario.html', {'form': form})
 
 # READ (Consultar / Listar)
+@leitura_na_replica
 def consultar_funcionarios_view(request):
     # Captura o termo de busca da URL (ex: ?q=maria)
     query = request.GET.get('q', '') 
     
-    with connection.cursor() as cursor:
+    with conexao_leitura().cursor() as cursor:
         # SQL Base: seleciona colunas específicas
-        sql = "SELECT id_funcionario, nome, email, telefone, status FROM Funcionario"
+        sql = "SELECT id_funcionario AS pk, nome, email, telefone, status FROM Funcionario"
         params = []
 
         # Construção Dinâmica da Query (Filtro)
         if query:
             # Concatena cláusula WHERE se houver busca.
             # ILIKE: Busca 'case-insensitive' (específico do PostgreSQL).
-            sql += " WHERE nome ILIKE %s OR email ILIKE %s ORDER BY nome"
+            sql += " WHERE nome ILIKE %s OR email ILIKE %s"
             
             # Adiciona os coringas (%) para a busca parcial
             params.extend([f'%{query}%', f'%{query}%'])
-        else:
-            # Sem filtro, apenas ordena por nome
-            sql += " ORDER BY nome"
 
-        # Executa o SQL (com ou sem filtro) passando os parâmetros seguros
-        cursor.execute(sql, params)
-        
-        # Mapeamento Manual (Tupla -> Dicionário)
-        funcionarios = []
-        for row in cursor.fetchall():
-            # O banco retorna tuplas (índices numéricos), convertemos
-            # para dicionário para facilitar o uso no Template HTML.
-            funcionarios.append({
-                'pk': row[0],
-                'nome': row[1],
-                'email': row[2],
-                'telefone': row[3],
-                'status': row[4] 
-            })
+        # Executa o SQL (com ou sem filtro) paginado por chave (nome, pk).
+        # A paginação já devolve cada linha como dicionário para o Template HTML.
+        pagina = paginar(request, cursor, sql, params, ['nome', 'pk'])
+        funcionarios = pagina.itens
 
-    return render(request, 'funcionario/consultar_funcionario.html', {'funcionarios': funcionarios})
+    return render(request, 'funcionario/consultar_funcionario.html', {'funcionarios': funcionarios, 'pagina': pagina})
 
 # UPDATE (Atualizar)
 def atualizar_funcionario_view(request, pk):
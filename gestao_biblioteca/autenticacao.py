@@ -0,0 +1,109 @@
+"""
+Autenticação dos funcionários, num lugar só.
+
+O login grava na sessão o id, o nome e o status do funcionário
+(registrar_login). A cada requisição o middleware:
+
+- monta `request.funcionario` ({'id', 'nome', 'status'} ou None) a partir
+  da sessão, sem consultar o banco. A cada FUNCIONARIO_REVALIDAR_SEGUNDOS
+  relê nome e status em Funcionario: funcionário inativado ou excluído tem
+  a sessão encerrada;
+- bloqueia as rotas do sistema para quem não está logado. Páginas
+  redirecionam para o login; chamadas JSON (autocomplete, APIs) recebem
+  403. As rotas abertas ficam em ROTAS_PUBLICAS (nome da rota ou namespace
+  inteiro, como 'acervo').
+
+As views não checam mais a sessão: basta ler `request.funcionario`.
+"""
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import connection
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+CHAVE_ID = 'funcionario_logado_id'
+CHAVE_NOME = 'funcionario_logado_nome'
+CHAVE_STATUS = 'funcionario_logado_status'
+CHAVE_VALIDADO_EM = 'funcionario_validado_em'
+
+STATUS_INATIVO = 'Inativo'
+
+
+def registrar_login(request, id_funcionario, nome, status):
+    """Grava o funcionário autenticado na sessão."""
+    # Chave de sessão nova a cada login (evita fixação de sessão)
+    request.session.cycle_key()
+    request.session[CHAVE_ID] = id_funcionario
+    request.session[CHAVE_NOME] = nome
+    request.session[CHAVE_STATUS] = status
+    request.session[CHAVE_VALIDADO_EM] = time.time()
+
+
+def _revalidar(sessao, id_funcionario):
+    """Relê nome e status do banco; False se o funcionário não existe mais."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nome, status FROM Funcionario WHERE id_funcionario = %s", [id_funcionario])
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    sessao[CHAVE_NOME], sessao[CHAVE_STATUS] = row
+    sessao[CHAVE_VALIDADO_EM] = time.time()
+    return True
+
+
+def funcionario_da_sessao(request):
+    """Funcionário logado ({'id', 'nome', 'status'}) ou None."""
+    sessao = request.session
+    id_funcionario = sessao.get(CHAVE_ID)
+    if id_funcionario is None:
+        return None
+
+    intervalo = getattr(settings, 'FUNCIONARIO_REVALIDAR_SEGUNDOS', 60)
+    # Sessões antigas (sem CHAVE_VALIDADO_EM) são revalidadas na hora
+    if time.time() - sessao.get(CHAVE_VALIDADO_EM, 0) > intervalo:
+        if not _revalidar(sessao, id_funcionario):
+            return None
+    return {'id': id_funcionario, 'nome': sessao.get(CHAVE_NOME), 'status': sessao.get(CHAVE_STATUS)}
+
+
+def _rota_publica(match):
+    publicas = getattr(settings, 'ROTAS_PUBLICAS', ())
+    return match.view_name in publicas or any(namespace in publicas for namespace in match.namespaces)
+
+
+def _quer_json(request):
+    return (
+        request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        or 'application/json' in request.headers.get('Accept', '')
+        or request.content_type == 'application/json'
+    )
+
+
+class AutenticacaoFuncionarioMiddleware:
+    """Resolve `request.funcionario` e exige login fora das ROTAS_PUBLICAS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.funcionario = None
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        funcionario = funcionario_da_sessao(request)
+        if funcionario is None and CHAVE_ID in request.session:
+            # Funcionário excluído depois do login
+            request.session.flush()
+        elif funcionario and funcionario['status'] == STATUS_INATIVO:
+            request.session.flush()
+            messages.error(request, 'Seu acesso está inativo. Procure um administrador.')
+            funcionario = None
+        request.funcionario = funcionario
+
+        if funcionario is not None or _rota_publica(request.resolver_match):
+            return None
+        if _quer_json(request):
+            return JsonResponse({'erro': 'Não autenticado.'}, status=403)
+        return redirect('login')
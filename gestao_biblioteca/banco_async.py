@@ -0,0 +1,128 @@
+"""
+Acesso assíncrono ao PostgreSQL para as views async (dashboard e relatórios).
+
+O ORM/cursor do Django é síncrono: dentro de uma view async cada consulta
+iria para uma thread e elas continuariam rodando uma depois da outra. Aqui
+usamos o driver async do psycopg 3 com um AsyncConnectionPool, então
+consultas independentes podem rodar ao mesmo tempo, cada uma na sua
+conexão:
+
+    total_a, total_b = await asyncio.gather(
+        consultar_valor("SELECT COUNT(*) FROM Livro"),
+        consultar_valor("SELECT COUNT(*) FROM Leitor"),
+    )
+
+O pool pertence ao event loop do servidor ASGI (biblioteca/asgi.py). No
+WSGI não existe um loop permanente, então o decorator `view_async` faz a
+requisição cair na versão síncrona da view.
+
+Há um pool por banco: as views com `replica.leitura_na_replica` consultam a
+réplica de leitura (ver gestao_biblioteca/replica.py).
+"""
+import asyncio
+import functools
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from .replica import alias_leitura
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # sem psycopg 3 / psycopg_pool: só as views síncronas
+    AsyncConnectionPool = None
+
+# Pools por event loop (na prática, um processo ASGI) e por banco
+_pools = weakref.WeakKeyDictionary()
+
+
+def disponivel(request):
+    """A requisição veio pelo ASGI e o driver async está instalado?"""
+    return AsyncConnectionPool is not None and isinstance(request, ASGIRequest)
+
+
+def view_async(view_sincrona):
+    """
+    Decorator da versão async de uma view. Atende pela corrotina quando
+    `disponivel(request)`; caso contrário chama `view_sincrona` numa thread.
+    """
+    def decorador(corrotina):
+        @functools.wraps(corrotina)
+        async def view(request, *args, **kwargs):
+            if disponivel(request):
+                return await corrotina(request, *args, **kwargs)
+            return await sync_to_async(view_sincrona)(request, *args, **kwargs)
+        return view
+    return decorador
+
+
+def _parametros_conexao(alias):
+    banco = settings.DATABASES[alias]
+    return {
+        'dbname': banco['NAME'],
+        'user': banco['USER'],
+        'password': banco['PASSWORD'],
+        'host': banco['HOST'],
+        'port': banco['PORT'],
+    }
+
+
+async def get_pool(alias=None):
+    """
+    Pool async do loop atual para `alias` (padrão: o banco de leitura da
+    requisição), criado e aberto na primeira chamada.
+    """
+    alias = alias or alias_leitura()
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(alias)
+    if pool is None:
+        # Mesmos limites do pool síncrono (settings.DATABASES OPTIONS['pool'])
+        opcoes = settings.DATABASES[alias].get('OPTIONS', {}).get('pool') or {}
+        pool = AsyncConnectionPool(
+            kwargs=_parametros_conexao(alias),
+            open=False,
+            check=AsyncConnectionPool.check_connection,
+            **opcoes,
+        )
+        pool = pools.setdefault(alias, pool)
+    # open() não faz nada se o pool já estiver aberto
+    await pool.open()
+    return pool
+
+
+async def consultar(sql, params=None):
+    """Executa o SELECT e retorna as linhas como dicts (como o dictfetchall)."""
+    pool = await get_pool()
+    async with pool.connection() as conexao:
+        async with conexao.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(sql, params or [])
+            return await cursor.fetchall()
+
+
+async def consultar_valor(sql, params=None):
+    """Primeira coluna da primeira linha (ex: COUNT(*)), ou None."""
+    linhas = await consultar(sql, params)
+    if not linhas:
+        return None
+    return next(iter(linhas[0].values()))
+
+
+async def iterar_lotes_async(sql, params, tamanho, alias=None):
+    """
+    Lotes de linhas (dicts) lidos por um cursor de servidor (named cursor),
+    para exportações grandes sem carregar tudo na memória.
+    """
+    pool = await get_pool(alias)
+    async with pool.connection() as conexao:
+        # Cursores de servidor só existem dentro de uma transação
+        async with conexao.transaction():
+            async with conexao.cursor(name='exportacao', row_factory=dict_row) as cursor:
+                await cursor.execute(sql, params or [])
+                while True:
+                    linhas = await cursor.fetchmany(tamanho)
+                    if not linhas:
+                        break
+                    yield linhas
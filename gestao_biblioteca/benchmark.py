@@ -0,0 +1,178 @@
+"""
+Benchmark ponta a ponta das telas do sistema.
+
+Cada cenário é uma requisição real (django.test.Client, com sessão de
+funcionário logado) passando por URLs, middlewares, views e templates.
+Para cada um são medidos, em N repetições:
+
+- latência (p50, p90, p99 e máximo, em ms);
+- quantidade de consultas SQL e tempo gasto no banco.
+
+Cenários que gravam (novo empréstimo, devolução) rodam dentro de uma
+transação desfeita ao final, então o banco não muda entre as repetições.
+O resultado é um dict serializável em JSON (ver comando benchmark_views).
+"""
+import math
+import time
+
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from .autenticacao import CHAVE_ID, CHAVE_NOME, CHAVE_STATUS, CHAVE_VALIDADO_EM
+from .instrumentacao import MonitorSQL
+from .replica import COOKIE_ESCRITA
+
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo (valores já ordenados)."""
+    if not valores:
+        return None
+    posicao = max(1, math.ceil(p / 100 * len(valores)))
+    return valores[posicao - 1]
+
+
+def contar_dados(cursor):
+    """Tamanho atual de cada tabela (registrado junto com os resultados)."""
+    dados = {}
+    for tabela in ['Livro', 'Autor', 'Exemplar', 'Leitor', 'Emprestimo']:
+        cursor.execute(f"SELECT COUNT(*) FROM {tabela}")
+        dados[tabela.lower()] = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM Emprestimo WHERE status = 'Em Andamento'")
+    dados['emprestimos_ativos'] = cursor.fetchone()[0]
+    return dados
+
+
+def _primeiro(cursor, sql):
+    cursor.execute(sql)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def montar_cenarios(cursor):
+    """
+    Lista de cenários (nome, método, url, dados do POST) com ids reais do
+    banco. Cenários que dependem de um registro inexistente são omitidos.
+    """
+    livro = _primeiro(cursor, "SELECT id_livro FROM Livro ORDER BY id_livro LIMIT 1")
+    leitor = _primeiro(cursor, "SELECT id_leitor FROM Leitor ORDER BY id_leitor LIMIT 1")
+    exemplar_livre = _primeiro(
+        cursor,
+        """
+        SELECT e.id_exemplar FROM Exemplar e
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Emprestimo emp
+            WHERE emp.id_exemplar = e.id_exemplar AND emp.status = 'Em Andamento'
+        )
+        ORDER BY e.id_exemplar LIMIT 1
+        """
+    )
+    emprestimo_ativo = _primeiro(
+        cursor, "SELECT id_emprestimo FROM Emprestimo WHERE status = 'Em Andamento' ORDER BY id_emprestimo LIMIT 1"
+    )
+
+    cenarios = [
+        ('home', 'GET', reverse('home'), None),
+        ('acervo', 'GET', reverse('acervo:acervo_index'), None),
+        ('acervo_busca', 'GET', reverse('acervo:acervo_index') + '?q=memorias', None),
+        ('funcionarios', 'GET', reverse('funcionarios:funcionario_list'), None),
+        ('leitores', 'GET', reverse('leitores:leitor_list'), None),
+        ('autores', 'GET', reverse('autores:autor_list'), None),
+        ('livros', 'GET', reverse('livros:livro_list'), None),
+        ('livros_busca', 'GET', reverse('livros:livro_list') + '?q=sertao', None),
+        ('exemplares', 'GET', reverse('exemplares:exemplar_list'), None),
+        ('emprestimos', 'GET', reverse('emprestimos:emprestimo_list'), None),
+        ('relatorio_atrasados', 'GET', reverse('relatorios:relatorio_leitores_atrasados'), None),
+        ('relatorio_emprestados', 'GET', reverse('relatorios:relatorio_livros_emprestados'), None),
+    ]
+    if livro:
+        cenarios.append((
+            'relatorio_historico', 'GET',
+            reverse('relatorios:relatorio_historico_livro') + f'?livro_id={livro}', None,
+        ))
+    if leitor and exemplar_livre:
+        cenarios.append((
+            'emprestimo_novo', 'POST', reverse('emprestimos:cadastrar_emprestimo'),
+            {'leitor': leitor, 'exemplares': str(exemplar_livre)},
+        ))
+    if emprestimo_ativo:
+        cenarios.append((
+            'devolucao', 'POST', reverse('emprestimos:registrar_devolucao'),
+            {'emprestimo_id': emprestimo_ativo, 'multa': '5.00', 'ocorrencia': ''},
+        ))
+    return cenarios
+
+
+def cliente_logado(cursor):
+    """Client com a mesma sessão que o login_view cria."""
+    cursor.execute("SELECT id_funcionario, nome, status FROM Funcionario ORDER BY id_funcionario LIMIT 1")
+    funcionario = cursor.fetchone()
+    cliente = Client(HTTP_HOST='localhost')
+    # Leituras sempre no primário: as medidas e o coletor de planos olham só
+    # a conexão 'default' (e a transação desfeita no fim é a dela)
+    cliente.cookies[COOKIE_ESCRITA] = '1'
+    if funcionario:
+        sessao = cliente.session
+        sessao[CHAVE_ID], sessao[CHAVE_NOME], sessao[CHAVE_STATUS] = funcionario
+        sessao[CHAVE_VALIDADO_EM] = time.time()
+        sessao.save()
+    return cliente
+
+
+def _requisitar(cliente, metodo, url, dados):
+    """Executa uma requisição medindo tempo e consultas; desfaz gravações."""
+    monitor = MonitorSQL()
+    with transaction.atomic(), connection.execute_wrapper(monitor):
+        inicio = time.perf_counter()
+        if metodo == 'POST':
+            response = cliente.post(url, dados)
+        else:
+            response = cliente.get(url)
+        duracao = (time.perf_counter() - inicio) * 1000
+        transaction.set_rollback(True)
+    return response.status_code, duracao, monitor
+
+
+def medir_cenario(cliente, nome, metodo, url, dados, repeticoes):
+    _requisitar(cliente, metodo, url, dados)  # aquecimento (templates, pool, cache)
+
+    latencias = []
+    consultas = []
+    tempo_sql = []
+    status = set()
+    for _ in range(repeticoes):
+        codigo, duracao, monitor = _requisitar(cliente, metodo, url, dados)
+        status.add(codigo)
+        latencias.append(duracao)
+        consultas.append(monitor.quantidade)
+        tempo_sql.append(monitor.tempo_total_ms)
+
+    latencias.sort()
+    return {
+        'cenario': nome,
+        'metodo': metodo,
+        'url': url,
+        'status': sorted(status),
+        'repeticoes': repeticoes,
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p90_ms': round(percentil(latencias, 90), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+        'max_ms': round(latencias[-1], 2),
+        'consultas': max(consultas),
+        'sql_medio_ms': round(sum(tempo_sql) / len(tempo_sql), 2),
+    }
+
+
+def executar_benchmark(repeticoes=20, filtro=None):
+    """Roda todos os cenários (ou os de nome em `filtro`) no banco atual."""
+    with connection.cursor() as cursor:
+        dados = contar_dados(cursor)
+        cenarios = montar_cenarios(cursor)
+        cliente = cliente_logado(cursor)
+
+    resultados = [
+        medir_cenario(cliente, nome, metodo, url, corpo, repeticoes)
+        for nome, metodo, url, corpo in cenarios
+        if not filtro or nome in filtro
+    ]
+    return {'dados': dados, 'resultados': resultados}
@@ -0,0 +1,62 @@
+"""
+Cache das listas de opções (choices) dos formulários.
+
+Cada tabela tem um número de versão guardado no cache do Django
+(compartilhado entre os processos). A lista em cache é gravada sob uma
+chave que inclui as versões das tabelas de que depende, por exemplo:
+
+    escolhas:livros:livro=12
+
+Hoje só Livro e Autor têm listas em cache (formulários de exemplar e de
+livro). Toda escrita nelas (INSERT/UPDATE/DELETE) chama `invalidar_tabelas`,
+que incrementa a versão após o COMMIT. A próxima montagem do formulário
+não encontra a chave antiga e relê o banco; enquanto nada muda, os
+formulários são montados sem varrer a tabela.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+# Tempo máximo de vida de uma lista (segurança extra; a versão já invalida)
+TEMPO_CACHE = 60 * 60
+
+
+def _chave_versao(tabela):
+    return f'escolhas:versao:{tabela.lower()}'
+
+
+def versao_tabela(tabela):
+    """Versão atual da tabela (começa em 1)."""
+    return cache.get_or_set(_chave_versao(tabela), 1, timeout=None)
+
+
+def _incrementar_versao(tabela):
+    chave = _chave_versao(tabela)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        # Chave ainda não existe (ou expirou no backend): recomeça
+        cache.set(chave, 2, timeout=None)
+
+
+def invalidar_tabelas(*tabelas):
+    """
+    Marca as tabelas como alteradas. A versão só muda depois do COMMIT,
+    para que nenhum leitor grave no cache dados de uma transação desfeita.
+    """
+    for tabela in tabelas:
+        transaction.on_commit(lambda tabela=tabela: _incrementar_versao(tabela))
+
+
+def escolhas_em_cache(nome, tabelas, carregar):
+    """
+    Retorna a lista `nome` do cache ou chama `carregar()` (que consulta o
+    banco) quando alguma das `tabelas` mudou desde a última leitura.
+    """
+    versoes = ':'.join(f'{tabela.lower()}={versao_tabela(tabela)}' for tabela in sorted(tabelas))
+    chave = f'escolhas:{nome}:{versoes}'
+
+    escolhas = cache.get(chave)
+    if escolhas is None:
+        escolhas = carregar()
+        cache.set(chave, escolhas, TEMPO_CACHE)
+    return escolhas
@@ -0,0 +1,226 @@
+"""
+Gerador de uma biblioteca sintética para medir as telas em tamanho real.
+
+Preenche Autor, Livro, autor_livro, Exemplar, Leitor e Emprestimo com dados
+plausíveis e reprodutíveis (mesma semente -> mesmos dados). O histórico de
+empréstimos é gerado por exemplar, em sequência, de modo que cada exemplar
+tem no máximo um empréstimo 'Em Andamento':
+
+- empréstimos antigos estão 'Devolvido' (parte com atraso e multa);
+- os mais recentes podem continuar 'Em Andamento', alguns já atrasados.
+
+Usado pelo comando `gerar_dados_sinteticos` e pelo `benchmark_views`.
+"""
+import random
+from datetime import date, timedelta
+
+from livros.busca import atualizar_indice_busca
+from livros.disponibilidade import recalcular_disponibilidade
+
+from .estatisticas import recalcular_contadores
+
+PRAZO_DIAS = 14
+MULTA_POR_DIA = 1.00
+
+NOMES = [
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique',
+    'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael',
+    'Sofia', 'Thiago', 'Vitória', 'Wagner', 'Beatriz', 'Caio', 'Débora', 'Lucas',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+    'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Araújo',
+    'Melo', 'Barbosa', 'Cardoso', 'Rocha', 'Dias', 'Teixeira', 'Mendes', 'Conceição',
+]
+PALAVRAS_TITULO = [
+    'Memórias', 'Sertão', 'Cidade', 'Noite', 'Rio', 'Mar', 'Estrelas', 'Caminho',
+    'Silêncio', 'Coração', 'Tempo', 'Sombra', 'Viagem', 'Jardim', 'Segredo', 'Vento',
+    'Casa', 'Destino', 'Fogo', 'Lua', 'Horizonte', 'Saudade', 'Terra', 'Pedra',
+]
+GENEROS = [
+    'Romance', 'Ficção Científica', 'Fantasia', 'Poesia', 'Biografia', 'História',
+    'Infantojuvenil', 'Suspense', 'Filosofia', 'Didático',
+]
+NACIONALIDADES = ['Brasileira', 'Portuguesa', 'Angolana', 'Argentina', 'Francesa', 'Inglesa']
+
+
+def _inserir(cursor, tabela, colunas, linhas, lote=1000):
+    """INSERT de várias linhas por comando (muito mais rápido que uma a uma)."""
+    marcadores = '(' + ', '.join(['%s'] * len(colunas)) + ')'
+    for inicio in range(0, len(linhas), lote):
+        parte = linhas[inicio:inicio + lote]
+        params = [valor for linha in parte for valor in linha]
+        cursor.execute(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES "
+            + ', '.join([marcadores] * len(parte)),
+            params
+        )
+
+
+def _ids_novos(cursor, tabela, coluna, maior_anterior):
+    cursor.execute(
+        f"SELECT {coluna} FROM {tabela} WHERE {coluna} > %s ORDER BY {coluna}", [maior_anterior]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _maior_id(cursor, tabela, coluna):
+    cursor.execute(f"SELECT COALESCE(MAX({coluna}), 0) FROM {tabela}")
+    return cursor.fetchone()[0]
+
+
+def _nome_pessoa(rnd):
+    return f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+
+
+def limpar_dados(cursor):
+    """Apaga o acervo, os leitores e o histórico (mantém os funcionários)."""
+    cursor.execute(
+        """
+        TRUNCATE Emprestimo, extrato_multa, notificacao_emprestimo, Exemplar, autor_livro,
+                 Livro, Autor, Leitor, livro_disponibilidade, livro_busca
+        RESTART IDENTITY
+        """
+    )
+
+
+def _funcionario(cursor):
+    """Funcionário responsável pelos registros gerados (cria se não houver)."""
+    cursor.execute("SELECT id_funcionario FROM Funcionario ORDER BY id_funcionario LIMIT 1")
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute(
+        """
+        INSERT INTO Funcionario (nome, email, senha, telefone, cpf, dt_nascimento, endereco, status)
+        VALUES ('Funcionário Sintético', 'sintetico@biblioteca.local', 'sintetico',
+                '(00) 0000-0000', '00000000000', '1990-01-01', 'Biblioteca', 'Ativo')
+        RETURNING id_funcionario
+        """
+    )
+    return cursor.fetchone()[0]
+
+
+def gerar_biblioteca(cursor, livros=1000, autores=300, exemplares_por_livro=3, leitores=2000,
+                     anos=3, ocupacao=0.35, atraso=0.15, semente=42, hoje=None):
+    """
+    Gera a biblioteca e retorna a quantidade de linhas criadas por tabela.
+
+    exemplares_por_livro: média (1 a 2x a média, sorteado por livro);
+    ocupacao: fração do tempo que um exemplar passa emprestado;
+    atraso:   fração dos empréstimos devolvidos (ou em aberto) com atraso.
+    """
+    rnd = random.Random(semente)
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=365 * anos)
+    id_funcionario = _funcionario(cursor)
+
+    # --- Autores ---
+    maior = _maior_id(cursor, 'Autor', 'id_autor')
+    _inserir(cursor, 'Autor', ['nome', 'nacionalidade', 'biografia'], [
+        (_nome_pessoa(rnd), rnd.choice(NACIONALIDADES), 'Autor gerado para testes de carga.')
+        for _ in range(autores)
+    ])
+    ids_autores = _ids_novos(cursor, 'Autor', 'id_autor', maior)
+
+    # --- Livros e autoria (1 a 3 autores por livro) ---
+    maior = _maior_id(cursor, 'Livro', 'id_livro')
+    qtd_exemplares = [rnd.randint(1, max(1, 2 * exemplares_por_livro - 1)) for _ in range(livros)]
+    _inserir(cursor, 'Livro', ['nome', 'genero', 'isbn', 'qtde_exemplares', 'status'], [
+        (
+            f"{rnd.choice(PALAVRAS_TITULO)} {rnd.choice(['de', 'do', 'da', 'sem', 'e'])} "
+            f"{rnd.choice(PALAVRAS_TITULO)} {i + 1}",
+            rnd.choice(GENEROS),
+            f"978{rnd.randrange(10 ** 10):010d}",
+            qtd,
+            'Disponível',
+        )
+        for i, qtd in enumerate(qtd_exemplares)
+    ])
+    ids_livros = _ids_novos(cursor, 'Livro', 'id_livro', maior)
+    _inserir(cursor, 'autor_livro', ['id_livro', 'id_autor'], [
+        (id_livro, id_autor)
+        for id_livro in ids_livros
+        for id_autor in rnd.sample(ids_autores, min(len(ids_autores), rnd.randint(1, 3)))
+    ])
+
+    # --- Exemplares ---
+    maior = _maior_id(cursor, 'Exemplar', 'id_exemplar')
+    patrimonio = _maior_id(cursor, 'Exemplar', 'numero_patrimonio')
+    linhas = []
+    for id_livro, qtd in zip(ids_livros, qtd_exemplares):
+        for _ in range(qtd):
+            patrimonio += 1
+            aquisicao = inicio - timedelta(days=rnd.randint(0, 3650))
+            linhas.append((
+                id_livro, patrimonio,
+                f"Corredor {rnd.choice('ABCDEFGH')}, Prateleira {rnd.randint(1, 12)}",
+                aquisicao, aquisicao - timedelta(days=rnd.randint(30, 3650)),
+                f"{rnd.randint(1, 9)}ª Edição",
+            ))
+    _inserir(cursor, 'Exemplar',
+             ['id_livro', 'numero_patrimonio', 'localizacao', 'dt_aquisicao', 'dt_publicacao', 'edicao'],
+             linhas)
+    ids_exemplares = _ids_novos(cursor, 'Exemplar', 'id_exemplar', maior)
+
+    # --- Leitores ---
+    maior = _maior_id(cursor, 'Leitor', 'id_leitor')
+    cursor.execute("SELECT COALESCE(MAX(cpf), '0') FROM Leitor")
+    base_cpf = int(cursor.fetchone()[0] or 0)
+    _inserir(cursor, 'Leitor',
+             ['nome', 'email', 'telefone', 'cpf', 'dt_nascimento', 'endereco', 'id_funcionario'], [
+        (
+            _nome_pessoa(rnd), f"leitor{base_cpf + i + 1}@exemplo.com",
+            f"(11) 9{rnd.randrange(10 ** 8):08d}", f"{base_cpf + i + 1:011d}",
+            date(1950, 1, 1) + timedelta(days=rnd.randint(0, 365 * 60)),
+            f"Rua {rnd.choice(SOBRENOMES)}, {rnd.randint(1, 2000)}", id_funcionario,
+        )
+        for i in range(leitores)
+    ])
+    ids_leitores = _ids_novos(cursor, 'Leitor', 'id_leitor', maior)
+
+    # --- Histórico de empréstimos, exemplar por exemplar ---
+    # Intervalo médio entre empréstimos calibrado para atingir a ocupação
+    duracao_media = PRAZO_DIAS * (1 + atraso)
+    intervalo_medio = duracao_media * (1 - ocupacao) / max(ocupacao, 0.01)
+    linhas = []
+    for id_exemplar in ids_exemplares:
+        dia = inicio + timedelta(days=rnd.randint(0, int(intervalo_medio) + 1))
+        while dia <= hoje:
+            prevista = dia + timedelta(days=PRAZO_DIAS)
+            if rnd.random() < atraso:
+                duracao = PRAZO_DIAS + rnd.randint(1, 30)
+            else:
+                duracao = rnd.randint(1, PRAZO_DIAS)
+            devolucao = dia + timedelta(days=duracao)
+            leitor = rnd.choice(ids_leitores)
+
+            if devolucao > hoje:
+                # Ainda com o leitor (atrasado se a data prevista já passou)
+                linhas.append((id_exemplar, leitor, id_funcionario, dia, prevista,
+                               None, None, None, 'Em Andamento'))
+                break
+
+            dias_atraso = (devolucao - prevista).days
+            multa = dias_atraso * MULTA_POR_DIA if dias_atraso > 0 else 0
+            linhas.append((id_exemplar, leitor, id_funcionario, dia, prevista,
+                           devolucao, multa, '', 'Devolvido'))
+            dia = devolucao + timedelta(days=max(1, int(rnd.expovariate(1 / max(intervalo_medio, 1)))))
+    _inserir(cursor, 'Emprestimo',
+             ['id_exemplar', 'id_leitor', 'id_funcionario', 'dt_emprestimo', 'dt_prevista_devolucao',
+              'dt_devolucao', 'multa', 'ocorrencia', 'status'],
+             linhas)
+
+    # --- Tabelas auxiliares ---
+    recalcular_disponibilidade(cursor, ids_livros)
+    atualizar_indice_busca(cursor, ids_livros)
+    recalcular_contadores(cursor)
+
+    return {
+        'autores': len(ids_autores),
+        'livros': len(ids_livros),
+        'exemplares': len(ids_exemplares),
+        'leitores': len(ids_leitores),
+        'emprestimos': len(linhas),
+        'emprestimos_ativos': sum(1 for linha in linhas if linha[-1] == 'Em Andamento'),
+    }
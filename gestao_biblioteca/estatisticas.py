@@ -0,0 +1,162 @@
+"""
+Indicadores do painel (home) sem COUNT(*) a cada acesso.
+
+Os totais ficam na tabela `estatistica_contador` e são ajustados pelas
+próprias escritas, na mesma transação:
+
+    ajustar_contador(cursor, 'emprestimos_ativos', +1)
+
+Cada contador é dividido em FATIAS_CONTADOR linhas (nome, fatia), somadas
+na leitura. Cada conexão ajusta a sua fatia (pelo pid do backend), então
+empréstimos simultâneos não disputam a trava de uma mesma linha até o
+COMMIT.
+
+Na frente da tabela há um cache com TTL (o cache do Django), limpo após o
+COMMIT de cada ajuste. Assim o painel custa uma leitura de cache (ou uma
+consulta de poucas linhas), qualquer que seja o tamanho das tabelas.
+
+As séries de tendência (empréstimos por dia, atrasos por semana) são
+agregadas no banco por faixa de data, em índices, e guardadas no cache por
+mais tempo.
+"""
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# Nome do contador -> consulta que o recalcula do zero
+CONTADORES = {
+    'emprestimos_ativos': "SELECT COUNT(*) FROM Emprestimo WHERE status = 'Em Andamento'",
+    'livros': "SELECT COUNT(*) FROM Livro",
+    'exemplares': "SELECT COUNT(*) FROM Exemplar",
+    'leitores': "SELECT COUNT(*) FROM Leitor",
+}
+
+CHAVE_INDICADORES = 'estatisticas:indicadores'
+CHAVE_TENDENCIAS = 'estatisticas:tendencias'
+TEMPO_INDICADORES = 5 * 60
+TEMPO_TENDENCIAS = 30 * 60
+
+DIAS_EMPRESTIMOS = 30
+SEMANAS_ATRASOS = 12
+
+# Linhas por contador: conexões simultâneas raramente caem na mesma
+FATIAS_CONTADOR = 16
+
+
+def _limpar_cache_indicadores():
+    cache.delete(CHAVE_INDICADORES)
+
+
+def ajustar_contador(cursor, nome, delta):
+    """Soma `delta` à fatia do contador desta conexão. O cache é limpo só depois do COMMIT."""
+    cursor.execute(
+        """
+        INSERT INTO estatistica_contador (nome, fatia, valor) VALUES (%s, pg_backend_pid() %% %s, %s)
+        ON CONFLICT (nome, fatia) DO UPDATE SET valor = estatistica_contador.valor + EXCLUDED.valor
+        """,
+        [nome, FATIAS_CONTADOR, delta]
+    )
+    transaction.on_commit(_limpar_cache_indicadores)
+
+
+def recalcular_contadores(cursor):
+    """Reconstrói todos os contadores a partir das tabelas."""
+    for nome, sql in CONTADORES.items():
+        cursor.execute(sql)
+        valor = cursor.fetchone()[0]
+        # O total inteiro na fatia 0; as outras voltam a zero
+        cursor.execute("DELETE FROM estatistica_contador WHERE nome = %s", [nome])
+        cursor.execute(
+            "INSERT INTO estatistica_contador (nome, fatia, valor) VALUES (%s, 0, %s)",
+            [nome, valor]
+        )
+    transaction.on_commit(_limpar_cache_indicadores)
+    return len(CONTADORES)
+
+
+def _buscar_indicadores():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nome, SUM(valor) FROM estatistica_contador GROUP BY nome")
+        valores = dict(cursor.fetchall())
+    return {nome: valores.get(nome, 0) for nome in CONTADORES}
+
+
+def get_indicadores():
+    """{'emprestimos_ativos': ..., 'livros': ..., 'exemplares': ..., 'leitores': ...}"""
+    return cache.get_or_set(CHAVE_INDICADORES, _buscar_indicadores, TEMPO_INDICADORES)
+
+
+def _emprestimos_por_dia(cursor, hoje):
+    """[(dia, quantidade)] dos últimos DIAS_EMPRESTIMOS dias, com zeros."""
+    inicio = hoje - timedelta(days=DIAS_EMPRESTIMOS - 1)
+    cursor.execute(
+        """
+        SELECT dt_emprestimo, COUNT(*) FROM Emprestimo
+        WHERE dt_emprestimo >= %s
+        GROUP BY dt_emprestimo
+        """,
+        [inicio]
+    )
+    por_dia = dict(cursor.fetchall())
+    return [
+        (inicio + timedelta(days=i), por_dia.get(inicio + timedelta(days=i), 0))
+        for i in range(DIAS_EMPRESTIMOS)
+    ]
+
+
+def _atrasos_por_semana(cursor, hoje):
+    """
+    [(início da semana, empréstimos em atraso no fim dela)] das últimas
+    SEMANAS_ATRASOS semanas, contados no banco (uma linha por semana). Só
+    entram os empréstimos ainda em aberto já vencidos (emprestimo_atraso_idx)
+    ou devolvidos dentro da janela (índice em dt_devolucao).
+    """
+    semana_atual = hoje - timedelta(days=hoje.weekday())
+    inicio = semana_atual - timedelta(weeks=SEMANAS_ATRASOS - 1)
+    cursor.execute(
+        """
+        WITH semanas AS (
+            SELECT semana::date AS semana, LEAST(semana::date + 6, %(hoje)s) AS fim
+            FROM generate_series(%(inicio)s::date, %(semana_atual)s::date, interval '1 week') AS semana
+        ),
+        candidatos AS (
+            SELECT dt_emprestimo, dt_prevista_devolucao, dt_devolucao FROM Emprestimo
+            WHERE status = 'Em Andamento' AND dt_prevista_devolucao < %(hoje)s
+            UNION ALL
+            SELECT dt_emprestimo, dt_prevista_devolucao, dt_devolucao FROM Emprestimo
+            WHERE dt_devolucao > %(inicio)s AND status <> 'Em Andamento'
+        )
+        SELECT semanas.semana, COUNT(candidatos.dt_emprestimo)
+        FROM semanas
+        LEFT JOIN candidatos
+            ON candidatos.dt_emprestimo <= semanas.fim
+           AND candidatos.dt_prevista_devolucao < semanas.fim
+           AND (candidatos.dt_devolucao IS NULL OR candidatos.dt_devolucao > semanas.fim)
+        GROUP BY semanas.semana
+        ORDER BY semanas.semana
+        """,
+        {'hoje': hoje, 'inicio': inicio, 'semana_atual': semana_atual}
+    )
+    return cursor.fetchall()
+
+
+def _buscar_tendencias():
+    hoje = date.today()
+    with connection.cursor() as cursor:
+        return {
+            'emprestimos_por_dia': _emprestimos_por_dia(cursor, hoje),
+            'atrasos_por_semana': _atrasos_por_semana(cursor, hoje),
+        }
+
+
+def get_tendencias():
+    """Séries do painel (cache de TEMPO_TENDENCIAS segundos)."""
+    return cache.get_or_set(CHAVE_TENDENCIAS, _buscar_tendencias, TEMPO_TENDENCIAS)
+
+
+def get_painel():
+    """Tudo o que a home precisa: indicadores + tendências."""
+    painel = dict(get_indicadores())
+    painel.update(get_tendencias())
+    return painel
@@ -0,0 +1,263 @@
+"""
+Exportação de relatórios em CSV e XLSX, por streaming.
+
+As linhas saem do banco por um cursor de servidor (named cursor), em lotes
+de tamanho fixo, e cada lote é convertido e enviado ao navegador antes do
+próximo ser lido. Nada acumula em memória: exportar mil ou milhões de
+empréstimos usa o mesmo espaço.
+
+- WSGI: `connection.chunked_cursor()` do Django (cursor de servidor);
+- ASGI: cursor de servidor do driver async (banco_async.iterar_lotes_async).
+
+Para relatórios que não cabem no tempo de uma requisição, o worker
+(relatorios/tarefas.py) grava o mesmo conteúdo num arquivo com
+`gravar_exportacao`.
+
+O conteúdo da resposta é gerado depois que a view retorna, então o banco de leitura
+(réplica ou primário, ver replica.py) é fixado ao montar a resposta.
+
+O XLSX é escrito à mão (zip + XML de uma planilha com células inline), pois
+as bibliotecas comuns só gravam o arquivo inteiro no final.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import StreamingHttpResponse
+
+from .banco_async import disponivel, iterar_lotes_async
+from .replica import alias_leitura, lendo_de
+
+TAMANHO_LOTE = 2000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def iterar_lotes(sql, params, tamanho=TAMANHO_LOTE, alias=DEFAULT_DB_ALIAS):
+    """Lotes de linhas (dicts) lidos por um cursor de servidor."""
+    cursor = connections[alias].chunked_cursor()
+    try:
+        cursor.execute(sql, params)
+        colunas = [col[0] for col in cursor.description]
+        while True:
+            linhas = cursor.fetchmany(tamanho)
+            if not linhas:
+                break
+            yield [dict(zip(colunas, row)) for row in linhas]
+    finally:
+        cursor.close()
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    if isinstance(valor, (date, datetime)):
+        return valor.strftime('%d/%m/%Y')
+    return str(valor)
+
+
+# --- Escritores (recebem lotes de linhas e devolvem bytes) ---
+
+class _Buffer(io.RawIOBase):
+    """Destino sem seek para o zipfile: guarda os bytes até serem retirados."""
+
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+class EscritorCSV:
+    """CSV separado por ';' com BOM, como o Excel em português espera."""
+
+    def __init__(self, colunas):
+        self.colunas = colunas
+        self.saida = io.StringIO()
+        self.escritor = csv.writer(self.saida, delimiter=';')
+
+    def _retirar(self):
+        texto = self.saida.getvalue()
+        self.saida.seek(0)
+        self.saida.truncate()
+        return texto.encode('utf-8')
+
+    def cabecalho(self):
+        self.escritor.writerow([titulo for titulo, _chave in self.colunas])
+        return '\ufeff'.encode('utf-8') + self._retirar()
+
+    def escrever(self, linhas):
+        for linha in linhas:
+            self.escritor.writerow([_texto(linha.get(chave)) for _titulo, chave in self.colunas])
+        return self._retirar()
+
+    def finalizar(self):
+        return b''
+
+
+class EscritorXLSX:
+    """Planilha XLSX mínima (uma aba), gravada linha a linha dentro do zip."""
+
+    _CONTROLE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+    ARQUIVOS_FIXOS = {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Relatorio" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+            '</Relationships>'
+        ),
+    }
+
+    def __init__(self, colunas):
+        self.colunas = colunas
+        self.buffer = _Buffer()
+        self.zip = zipfile.ZipFile(self.buffer, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.planilha = None
+
+    def _celula(self, valor):
+        if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+            return f'<c><v>{valor}</v></c>'
+        texto = escape(self._CONTROLE.sub('', _texto(valor)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+    def _linha(self, valores):
+        return '<row>' + ''.join(self._celula(valor) for valor in valores) + '</row>'
+
+    def cabecalho(self):
+        for nome, conteudo in self.ARQUIVOS_FIXOS.items():
+            self.zip.writestr(nome, conteudo)
+        # force_zip64: o tamanho final da aba não é conhecido de antemão
+        self.planilha = self.zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self.planilha.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            + self._linha([titulo for titulo, _chave in self.colunas])
+        ).encode('utf-8'))
+        return self.buffer.retirar()
+
+    def escrever(self, linhas):
+        xml = ''.join(self._linha([linha.get(chave) for _titulo, chave in self.colunas]) for linha in linhas)
+        self.planilha.write(xml.encode('utf-8'))
+        return self.buffer.retirar()
+
+    def finalizar(self):
+        self.planilha.write(b'</sheetData></worksheet>')
+        self.planilha.close()
+        self.zip.close()
+        return self.buffer.retirar()
+
+
+ESCRITORES = {'csv': EscritorCSV, 'xlsx': EscritorXLSX}
+
+
+# --- Resposta HTTP ---
+
+def _gerar(escritor, sql, params, completar, alias):
+    yield escritor.cabecalho()
+    for lote in iterar_lotes(sql, params, alias=alias):
+        if completar:
+            with connections[alias].cursor() as cursor:
+                completar(cursor, lote)
+        yield escritor.escrever(lote)
+    yield escritor.finalizar()
+
+
+async def _gerar_async(escritor, sql, params, completar_async, alias):
+    yield escritor.cabecalho()
+    async for lote in iterar_lotes_async(sql, params, TAMANHO_LOTE, alias):
+        if completar_async:
+            with lendo_de(alias):
+                await completar_async(lote)
+        yield escritor.escrever(lote)
+    yield escritor.finalizar()
+
+
+def resposta_exportacao(request, nome_arquivo, formato, colunas, sql, params,
+                        completar=None, completar_async=None):
+    """
+    StreamingHttpResponse com o resultado de `sql` no `formato` pedido.
+
+    colunas: [(título, chave da linha)];
+    completar(cursor, lote) / completar_async(lote): preenchem cada lote
+    (hidratação) antes de ele ser escrito.
+    """
+    escritor = ESCRITORES[formato](colunas)
+    alias = alias_leitura()
+    if disponivel(request):
+        conteudo = _gerar_async(escritor, sql, params, completar_async, alias)
+    else:
+        conteudo = _gerar(escritor, sql, params, completar, alias)
+
+    response = StreamingHttpResponse(conteudo, content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    return response
+
+
+# --- Arquivo (relatórios em segundo plano) ---
+
+def gravar_exportacao(destino, formato, colunas, sql, params, completar=None,
+                      alias=DEFAULT_DB_ALIAS, progresso=None):
+    """
+    Grava o resultado de `sql` em `destino` (arquivo binário aberto), lote a
+    lote como na resposta por streaming. `progresso(linhas)` é chamado após
+    cada lote com o total de linhas gravadas até ali. Retorna esse total.
+    """
+    escritor = ESCRITORES[formato](colunas)
+    gravadas = 0
+    destino.write(escritor.cabecalho())
+    for lote in iterar_lotes(sql, params, alias=alias):
+        if completar:
+            with connections[alias].cursor() as cursor:
+                completar(cursor, lote)
+        destino.write(escritor.escrever(lote))
+        gravadas += len(lote)
+        if progresso:
+            progresso(gravadas)
+    destino.write(escritor.finalizar())
+    return gravadas
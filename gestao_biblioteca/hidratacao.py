@@ -0,0 +1,186 @@
+"""
+Hidratação em lote dos dados relacionais (substitui o padrão "N+1").
+
+As views buscam a tabela principal com `dictfetchall` e precisam completar
+cada linha com dados de outras tabelas (nome do leitor, patrimônio do
+exemplar, nome do livro...). Em vez de uma query por linha, aqui fazemos
+UMA query por tabela relacionada usando `WHERE id = ANY(%s)`, continuando
+SEM JOIN.
+
+Os registros carregados ficam num mapa de identidade guardado na própria
+requisição: se duas linhas (ou duas chamadas) apontam para o mesmo leitor,
+ele é buscado uma única vez.
+
+As versões `*_async` (views async) buscam as tabelas ao mesmo tempo.
+"""
+import asyncio
+
+from .banco_async import consultar
+
+# Tabelas conhecidas: nome -> (coluna da chave primária, colunas carregadas)
+TABELAS = {
+    'Leitor': ('id_leitor', ['nome', 'telefone']),
+    'Exemplar': ('id_exemplar', ['numero_patrimonio', 'id_livro']),
+    'Livro': ('id_livro', ['nome']),
+    'Autor': ('id_autor', ['nome']),
+    # Contadores de disponibilidade mantidos pelas escritas (ver livros/disponibilidade.py)
+    'livro_disponibilidade': ('id_livro', ['total_exemplares', 'qtd_emprestados', 'exemplares_disponiveis']),
+}
+
+# Atalho: nome da chave estrangeira -> tabela (id_leitor -> Leitor)
+TABELA_POR_CHAVE = {
+    'id_leitor': 'Leitor',
+    'id_exemplar': 'Exemplar',
+    'id_livro': 'Livro',
+    'id_autor': 'Autor',
+}
+
+
+class MapaIdentidade:
+    """Guarda os registros já carregados: {tabela: {id: dict}}."""
+
+    def __init__(self):
+        self._registros = {}
+
+    def carregar(self, cursor, tabela, ids):
+        """
+        Retorna {id: registro} para os ids pedidos.
+        Só vai ao banco (uma única query) para os ids ainda não carregados.
+        """
+        pk, colunas = TABELAS[tabela]
+        cache = self._registros.setdefault(tabela, {})
+
+        faltantes = {i for i in ids if i is not None and i not in cache}
+        if faltantes:
+            cursor.execute(
+                f"SELECT {pk}, {', '.join(colunas)} FROM {tabela} WHERE {pk} = ANY(%s)",
+                [list(faltantes)]
+            )
+            for row in cursor.fetchall():
+                cache[row[0]] = dict(zip(colunas, row[1:]))
+
+        return {i: cache.get(i) for i in ids if i is not None}
+
+    async def carregar_async(self, tabela, ids):
+        """Versão async de `carregar` (gestao_biblioteca/banco_async.py)."""
+        pk, colunas = TABELAS[tabela]
+        cache = self._registros.setdefault(tabela, {})
+
+        faltantes = {i for i in ids if i is not None and i not in cache}
+        if faltantes:
+            linhas = await consultar(
+                f"SELECT {pk}, {', '.join(colunas)} FROM {tabela} WHERE {pk} = ANY(%s)",
+                [list(faltantes)]
+            )
+            for linha in linhas:
+                cache[linha.pop(pk)] = linha
+
+        return {i: cache.get(i) for i in ids if i is not None}
+
+
+def get_mapa_identidade(request):
+    """Mapa de identidade da requisição (criado na primeira chamada)."""
+    if request is None:
+        return MapaIdentidade()
+
+    mapa = getattr(request, '_mapa_identidade', None)
+    if mapa is None:
+        mapa = MapaIdentidade()
+        request._mapa_identidade = mapa
+    return mapa
+
+
+def hidratar(request, cursor, linhas, campos):
+    """
+    Preenche as linhas com os registros relacionados.
+
+    `campos` é um conjunto de chaves estrangeiras ({'id_leitor', 'id_exemplar'})
+    ou um dict {chave: tabela} quando o nome da coluna não bate com a tabela
+    (ex: {'pk': 'Livro'}). Cada linha recebe o registro em `linha['leitor']`,
+    `linha['exemplar']`... (None quando não encontrado).
+    """
+    if not isinstance(campos, dict):
+        campos = {campo: TABELA_POR_CHAVE[campo] for campo in campos}
+
+    mapa = get_mapa_identidade(request)
+
+    for campo, tabela in campos.items():
+        registros = mapa.carregar(cursor, tabela, {linha[campo] for linha in linhas})
+        destino = tabela.lower()
+        for linha in linhas:
+            linha[destino] = registros.get(linha[campo])
+
+    return linhas
+
+
+async def hidratar_async(request, linhas, campos):
+    """Versão async de `hidratar`: uma consulta por tabela, todas ao mesmo tempo."""
+    if not isinstance(campos, dict):
+        campos = {campo: TABELA_POR_CHAVE[campo] for campo in campos}
+
+    mapa = get_mapa_identidade(request)
+
+    campos = list(campos.items())
+    resultados = await asyncio.gather(*[
+        mapa.carregar_async(tabela, {linha[campo] for linha in linhas})
+        for campo, tabela in campos
+    ])
+    for (campo, tabela), registros in zip(campos, resultados):
+        destino = tabela.lower()
+        for linha in linhas:
+            linha[destino] = registros.get(linha[campo])
+
+    return linhas
+
+
+def hidratar_autores(request, cursor, linhas, campo='id_livro', destino='autores_list'):
+    """
+    Preenche a lista de autores (ordenada por nome) de cada linha.
+    Duas queries no total: a tabela de ligação e a tabela Autor.
+    """
+    ids_livros = list({linha[campo] for linha in linhas if linha.get(campo) is not None})
+
+    autores_por_livro = {}
+    if ids_livros:
+        cursor.execute(
+            "SELECT id_livro, id_autor FROM autor_livro WHERE id_livro = ANY(%s)",
+            [ids_livros]
+        )
+        vinculos = cursor.fetchall()
+
+        autores = get_mapa_identidade(request).carregar(
+            cursor, 'Autor', {id_autor for _id_livro, id_autor in vinculos}
+        )
+        for id_livro, id_autor in vinculos:
+            if autores.get(id_autor):
+                autores_por_livro.setdefault(id_livro, []).append(autores[id_autor])
+
+    for linha in linhas:
+        lista = autores_por_livro.get(linha.get(campo), [])
+        linha[destino] = sorted(lista, key=lambda autor: autor['nome'])
+
+    return linhas
+
+
+async def hidratar_autores_async(request, linhas, campo='id_livro', destino='autores_list'):
+    """Versão async de `hidratar_autores` (as duas consultas são dependentes)."""
+    ids_livros = list({linha[campo] for linha in linhas if linha.get(campo) is not None})
+
+    autores_por_livro = {}
+    if ids_livros:
+        vinculos = await consultar(
+            "SELECT id_livro, id_autor FROM autor_livro WHERE id_livro = ANY(%s)",
+            [ids_livros]
+        )
+        autores = await get_mapa_identidade(request).carregar_async(
+            'Autor', {vinculo['id_autor'] for vinculo in vinculos}
+        )
+        for vinculo in vinculos:
+            if autores.get(vinculo['id_autor']):
+                autores_por_livro.setdefault(vinculo['id_livro'], []).append(autores[vinculo['id_autor']])
+
+    for linha in linhas:
+        lista = autores_por_livro.get(linha.get(campo), [])
+        linha[destino] = sorted(lista, key=lambda autor: autor['nome'])
+
+    return linhas
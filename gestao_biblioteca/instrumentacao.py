@@ -0,0 +1,132 @@
+"""
+Instrumentação das consultas SQL de cada requisição.
+
+Como todo acesso ao banco é feito com connection.cursor() nas views, o
+middleware instala um `execute_wrapper` em cada conexão e anota, para cada
+comando executado: o SQL, o tempo gasto e a "impressão digital" (o SQL
+normalizado, sem espaços extras e sem literais).
+
+Ao fim da requisição registra no logger 'biblioteca.sql':
+- quantidade de consultas e tempo total;
+- as consultas mais lentas (aviso a partir de SQL_CONSULTA_LENTA_MS);
+- comandos repetidos muitas vezes (padrão N+1, ex: um
+  `SELECT nome FROM Leitor WHERE id_leitor = %s` por linha da listagem);
+- se a view passou do seu orçamento de consultas (SQL_ORCAMENTOS).
+
+Em produção o orçamento estourado vira um aviso no log; com
+SQL_ORCAMENTO_ESTRITO (ligado pelos testes com override_settings) vira
+exceção.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('biblioteca.sql')
+
+
+class OrcamentoSQLExcedido(Exception):
+    """A view executou mais consultas do que o orçamento permite."""
+
+
+def impressao_digital(sql):
+    """
+    Normaliza o SQL para agrupar comandos iguais: minúsculas, espaços
+    colapsados e literais (números e strings) trocados por '?'.
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    return re.sub(r'\s+', ' ', sql).strip().lower()
+
+
+class MonitorSQL:
+    """execute_wrapper que guarda (sql, duração em ms) de cada comando."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, (time.perf_counter() - inicio) * 1000))
+
+    @property
+    def quantidade(self):
+        return len(self.consultas)
+
+    @property
+    def tempo_total_ms(self):
+        return sum(duracao for _, duracao in self.consultas)
+
+    def mais_lentas(self, quantidade=3):
+        return sorted(self.consultas, key=lambda consulta: consulta[1], reverse=True)[:quantidade]
+
+    def repetidas(self, minimo):
+        """{impressão digital: vezes} dos comandos executados `minimo` vezes ou mais."""
+        contagem = Counter(impressao_digital(sql) for sql, _ in self.consultas)
+        return {sql: vezes for sql, vezes in contagem.most_common() if vezes >= minimo}
+
+
+def orcamento_da_view(nome_view):
+    """Limite de consultas da view (SQL_ORCAMENTOS) ou o padrão."""
+    orcamentos = getattr(settings, 'SQL_ORCAMENTOS', {})
+    return orcamentos.get(nome_view, getattr(settings, 'SQL_ORCAMENTO_PADRAO', None))
+
+
+class InstrumentacaoSQLMiddleware:
+    """Mede as consultas de cada requisição e aplica os orçamentos por view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'SQL_INSTRUMENTACAO', True):
+            return self.get_response(request)
+
+        monitor = MonitorSQL()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(monitor))
+            response = self.get_response(request)
+
+        request.monitor_sql = monitor
+        self.registrar(request, response, monitor)
+        return response
+
+    def registrar(self, request, response, monitor):
+        match = getattr(request, 'resolver_match', None)
+        nome_view = match.view_name if match else request.path
+        total_ms = monitor.tempo_total_ms
+
+        logger.info(
+            '%s: %d consulta(s) em %.1f ms', nome_view, monitor.quantidade, total_ms,
+        )
+        limite_lenta = getattr(settings, 'SQL_CONSULTA_LENTA_MS', 100)
+        for sql, duracao in monitor.mais_lentas():
+            nivel = logging.WARNING if duracao >= limite_lenta else logging.DEBUG
+            logger.log(nivel, '%s: %.1f ms - %s', nome_view, duracao, impressao_digital(sql))
+
+        limite_repeticoes = getattr(settings, 'SQL_LIMITE_REPETICOES', 5)
+        for sql, vezes in monitor.repetidas(limite_repeticoes).items():
+            logger.warning('%s: possível N+1, %d execuções de: %s', nome_view, vezes, sql)
+
+        if settings.DEBUG:
+            response['Server-Timing'] = (
+                f'sql;dur={total_ms:.1f};desc="{monitor.quantidade} consulta(s)"'
+            )
+
+        orcamento = orcamento_da_view(nome_view)
+        if orcamento is not None and monitor.quantidade > orcamento:
+            mensagem = (
+                f'{nome_view} executou {monitor.quantidade} consultas '
+                f'(orçamento: {orcamento})'
+            )
+            if getattr(settings, 'SQL_ORCAMENTO_ESTRITO', False):
+                raise OrcamentoSQLExcedido(mensagem)
+            logger.warning(mensagem)
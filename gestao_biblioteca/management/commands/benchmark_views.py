@@ -0,0 +1,90 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from gestao_biblioteca.benchmark import executar_benchmark
+from gestao_biblioteca.dados_sinteticos import gerar_biblioteca, limpar_dados
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência (p50/p90/p99) e consultas SQL de todas as telas e grava o resultado em JSON. '
+        'Com --escalas, APAGA e regera a biblioteca sintética para cada tamanho.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20)
+        parser.add_argument('--escalas', default='',
+                            help='Quantidades de livros separadas por vírgula (ex: 1000,10000,50000).')
+        parser.add_argument('--cenarios', default='', help='Só estes cenários (separados por vírgula).')
+        parser.add_argument('--saida', default='', help='Arquivo JSON (padrão: benchmark-<data>.json).')
+        parser.add_argument('--comparar', default='', help='JSON de uma execução anterior para comparar o p50.')
+
+    def handle(self, *args, **options):
+        filtro = {nome for nome in options['cenarios'].split(',') if nome}
+        try:
+            escalas = [int(valor) for valor in options['escalas'].split(',') if valor]
+        except ValueError:
+            raise CommandError('--escalas deve ser uma lista de inteiros, ex: 1000,10000')
+
+        execucoes = []
+        for escala in escalas or [None]:
+            if escala is not None:
+                self.stdout.write(f'Gerando biblioteca com {escala} livro(s)...')
+                with transaction.atomic(), connection.cursor() as cursor:
+                    limpar_dados(cursor)
+                    gerar_biblioteca(cursor, livros=escala, autores=max(1, escala * 3 // 10),
+                                     leitores=escala * 2)
+
+            resultado = executar_benchmark(options['repeticoes'], filtro)
+            resultado['escala'] = escala
+            execucoes.append(resultado)
+            self._imprimir(resultado)
+
+        relatorio = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'repeticoes': options['repeticoes'],
+            'execucoes': execucoes,
+        }
+        saida = options['saida'] or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+        if options['comparar']:
+            self._comparar(options['comparar'], relatorio)
+
+        self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {saida}.'))
+
+    def _imprimir(self, resultado):
+        dados = ', '.join(f'{quantidade} {tabela}' for tabela, quantidade in resultado['dados'].items())
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Dados: {dados}'))
+        self.stdout.write(f"{'cenário':<24}{'p50':>9}{'p90':>9}{'p99':>9}{'consultas':>11}")
+        for linha in resultado['resultados']:
+            self.stdout.write(
+                f"{linha['cenario']:<24}{linha['p50_ms']:>9.1f}{linha['p90_ms']:>9.1f}"
+                f"{linha['p99_ms']:>9.1f}{linha['consultas']:>11}"
+            )
+
+    def _comparar(self, caminho, relatorio):
+        """Variação do p50 por (escala, cenário) em relação a outro arquivo."""
+        with open(caminho, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+
+        p50_anterior = {
+            (execucao['escala'], linha['cenario']): linha['p50_ms']
+            for execucao in anterior.get('execucoes', [])
+            for linha in execucao['resultados']
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Comparação com {caminho} (p50):'))
+        for execucao in relatorio['execucoes']:
+            for linha in execucao['resultados']:
+                antes = p50_anterior.get((execucao['escala'], linha['cenario']))
+                if not antes:
+                    continue
+                variacao = (linha['p50_ms'] - antes) / antes * 100
+                self.stdout.write(
+                    f"{str(execucao['escala'] or 'atual'):>8} {linha['cenario']:<24}"
+                    f"{antes:>9.1f} -> {linha['p50_ms']:>9.1f} ({variacao:+.0f}%)"
+                )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from gestao_biblioteca.dados_sinteticos import gerar_biblioteca, limpar_dados
+from relatorios.snapshots import atualizar_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Preenche o banco local com uma biblioteca sintética (acervo, leitores e histórico).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--livros', type=int, default=1000)
+        parser.add_argument('--autores', type=int, default=300)
+        parser.add_argument('--exemplares-por-livro', type=int, default=3, help='Média por livro.')
+        parser.add_argument('--leitores', type=int, default=2000)
+        parser.add_argument('--anos', type=int, default=3, help='Anos de histórico de empréstimos.')
+        parser.add_argument('--ocupacao', type=float, default=0.35,
+                            help='Fração do tempo em que um exemplar fica emprestado.')
+        parser.add_argument('--atraso', type=float, default=0.15,
+                            help='Fração dos empréstimos com atraso.')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--limpar', action='store_true',
+                            help='Apaga acervo, leitores e empréstimos antes de gerar (mantém funcionários).')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if options['limpar']:
+                    limpar_dados(cursor)
+                criados = gerar_biblioteca(
+                    cursor,
+                    livros=options['livros'],
+                    autores=options['autores'],
+                    exemplares_por_livro=options['exemplares_por_livro'],
+                    leitores=options['leitores'],
+                    anos=options['anos'],
+                    ocupacao=options['ocupacao'],
+                    atraso=options['atraso'],
+                    semente=options['semente'],
+                )
+
+        # Os snapshots dos relatórios passam a refletir os dados gerados
+        with connection.cursor() as cursor:
+            atualizar_snapshots(cursor)
+
+        resumo = ', '.join(f'{quantidade} {tabela}' for tabela, quantidade in criados.items())
+        self.stdout.write(self.style.SUCCESS(f'Biblioteca sintética gerada: {resumo}.'))
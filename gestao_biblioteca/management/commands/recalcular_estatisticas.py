@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from gestao_biblioteca.estatisticas import recalcular_contadores
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero os contadores do painel (estatistica_contador).'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                total = recalcular_contadores(cursor)
+
+        self.stdout.write(self.style.SUCCESS(f'{total} contador(es) do painel recalculado(s).'))
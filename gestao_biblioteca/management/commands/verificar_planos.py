@@ -0,0 +1,78 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from gestao_biblioteca.dados_sinteticos import gerar_biblioteca, limpar_dados
+from gestao_biblioteca.planos import verificar_planos
+
+
+class Command(BaseCommand):
+    help = (
+        'Roda EXPLAIN (ANALYZE, BUFFERS) em todas as consultas das telas e compara com a linha de base. '
+        'Falha se alguma consulta passar a usar Seq Scan ou ultrapassar os limites de PLANOS_LIMITES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default='', help='Arquivo JSON da linha de base (padrão: PLANOS_BASELINE).')
+        parser.add_argument('--gravar', action='store_true',
+                            help='Grava os planos atuais como nova linha de base em vez de comparar.')
+        parser.add_argument('--cenarios', default='', help='Só estes cenários (separados por vírgula).')
+        parser.add_argument('--livros', type=int, default=0,
+                            help='APAGA e regera a biblioteca sintética com esta quantidade de livros antes.')
+
+    def handle(self, *args, **options):
+        caminho = options['baseline'] or str(settings.PLANOS_BASELINE)
+        filtro = {nome for nome in options['cenarios'].split(',') if nome}
+
+        if options['livros']:
+            livros = options['livros']
+            self.stdout.write(f'Gerando biblioteca com {livros} livro(s)...')
+            with transaction.atomic(), connection.cursor() as cursor:
+                limpar_dados(cursor)
+                gerar_biblioteca(cursor, livros=livros, autores=max(1, livros * 3 // 10), leitores=livros * 2)
+                cursor.execute('ANALYZE')
+
+        linha_de_base = {}
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                linha_de_base = json.load(arquivo)
+        elif not options['gravar']:
+            self.stdout.write(self.style.WARNING(
+                f'Sem linha de base em {caminho}: só os limites absolutos serão verificados.'
+            ))
+
+        resultado = verificar_planos(linha_de_base, filtro)
+        analises = resultado['analises']
+
+        if options['gravar']:
+            # Com --cenarios, mantém o restante da linha de base
+            novo = {**linha_de_base, **analises} if filtro else analises
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump(novo, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'{len(analises)} plano(s) gravados em {caminho}.'))
+            return
+
+        for impressao in resultado['mudancas']:
+            anterior = linha_de_base[impressao]['formato']
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Plano mudou ({analises[impressao]['cenario']}): {impressao}"))
+            self.stdout.write('  antes:\n' + '\n'.join(f'    {linha}' for linha in anterior))
+            self.stdout.write('  agora:\n' + '\n'.join(f"    {linha}" for linha in analises[impressao]['formato']))
+        for impressao in resultado['ausentes']:
+            self.stdout.write(f'Consulta não executada nesta rodada: {impressao}')
+
+        for impressao, problemas in resultado['regressoes'].items():
+            self.stdout.write(self.style.ERROR(f"{analises[impressao]['cenario']}: {impressao}"))
+            for problema in problemas:
+                self.stdout.write(f'  - {problema}')
+
+        self.stdout.write(
+            f"{len(analises)} consulta(s), {len(resultado['novos'])} nova(s), "
+            f"{len(resultado['mudancas'])} com plano diferente, {len(resultado['regressoes'])} regressão(ões)."
+        )
+        if resultado['regressoes']:
+            raise CommandError('Regressão de plano de execução (veja acima). '
+                               'Se a mudança for esperada, rode com --gravar.')
+        self.stdout.write(self.style.SUCCESS('Planos de execução sem regressão.'))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from gestao_biblioteca.replica import ALIAS_REPLICA, medir_atraso, replica_configurada
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o atraso da réplica de leitura (BANCO_REPLICA) e mostra se as views só de leitura '
+        'estão lendo dela ou do primário.'
+    )
+
+    def handle(self, *args, **options):
+        if not replica_configurada():
+            raise CommandError('Réplica não configurada: defina BANCO_REPLICA em settings.')
+
+        banco = settings.DATABASES[ALIAS_REPLICA]
+        self.stdout.write(f"Réplica: {banco['HOST']}:{banco['PORT']}/{banco['NAME']}")
+        try:
+            atraso = medir_atraso()
+        except DatabaseError as erro:
+            raise CommandError(f'Réplica indisponível (leituras no primário): {erro}')
+
+        maximo = getattr(settings, 'BANCO_REPLICA_ATRASO_MAXIMO', 30)
+        self.stdout.write(f'Atraso: {atraso:.1f}s (máximo {maximo}s)')
+        if atraso > maximo:
+            self.stdout.write(self.style.WARNING('Réplica atrasada: as leituras vão para o primário.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Réplica em dia: as leituras das listagens e relatórios vão para ela.'))
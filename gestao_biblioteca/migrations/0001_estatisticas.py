@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0001_esquema_base'),
+    ]
+
+    operations = [
+        # Contadores do painel (gestao_biblioteca/estatisticas.py), já
+        # preenchidos com os totais atuais. Para reconstruir depois:
+        #     python manage.py recalcular_estatisticas
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS estatistica_contador (
+                    nome VARCHAR(50) PRIMARY KEY,
+                    valor BIGINT NOT NULL DEFAULT 0
+                );
+
+                INSERT INTO estatistica_contador (nome, valor) VALUES
+                    ('emprestimos_ativos', (SELECT COUNT(*) FROM Emprestimo WHERE status = 'Em Andamento')),
+                    ('livros', (SELECT COUNT(*) FROM Livro)),
+                    ('exemplares', (SELECT COUNT(*) FROM Exemplar)),
+                    ('leitores', (SELECT COUNT(*) FROM Leitor))
+                ON CONFLICT (nome) DO UPDATE SET valor = EXCLUDED.valor;
+
+                -- Séries de tendência: faixas de data de empréstimo e devolução
+                CREATE INDEX IF NOT EXISTS emprestimo_dt_emprestimo_idx
+                    ON Emprestimo (dt_emprestimo);
+                CREATE INDEX IF NOT EXISTS emprestimo_dt_devolucao_idx
+                    ON Emprestimo (dt_devolucao);
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS emprestimo_dt_devolucao_idx;
+                DROP INDEX IF EXISTS emprestimo_dt_emprestimo_idx;
+                DROP TABLE IF EXISTS estatistica_contador;
+            """,
+        ),
+    ]
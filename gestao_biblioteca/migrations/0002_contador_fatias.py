@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_biblioteca', '0001_estatisticas'),
+    ]
+
+    operations = [
+        # Cada contador passa a ter várias linhas (fatias), somadas na leitura
+        # (gestao_biblioteca/estatisticas.py). Com uma linha só, toda
+        # transação de empréstimo e devolução esperava a anterior soltar a
+        # mesma linha de emprestimos_ativos até o COMMIT.
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE estatistica_contador ADD COLUMN IF NOT EXISTS fatia SMALLINT NOT NULL DEFAULT 0;
+                ALTER TABLE estatistica_contador DROP CONSTRAINT IF EXISTS estatistica_contador_pkey;
+                ALTER TABLE estatistica_contador ADD PRIMARY KEY (nome, fatia);
+            """,
+            reverse_sql="""
+                CREATE TEMP TABLE contador_somado AS
+                    SELECT nome, SUM(valor) AS valor FROM estatistica_contador GROUP BY nome;
+                DELETE FROM estatistica_contador;
+                ALTER TABLE estatistica_contador DROP CONSTRAINT IF EXISTS estatistica_contador_pkey;
+                ALTER TABLE estatistica_contador DROP COLUMN IF EXISTS fatia;
+                INSERT INTO estatistica_contador (nome, valor) SELECT nome, valor FROM contador_somado;
+                ALTER TABLE estatistica_contador ADD PRIMARY KEY (nome);
+                DROP TABLE contador_somado;
+            """,
+        ),
+    ]
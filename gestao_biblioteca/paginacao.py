@@ -0,0 +1,167 @@
+"""
+Paginação por chave (keyset / cursor) para as listagens e relatórios.
+
+Em vez de OFFSET (que obriga o banco a percorrer todas as linhas
+anteriores), cada página começa logo depois da última linha exibida:
+
+    WHERE (nome, pk) > ('Machado', 42) ORDER BY nome, pk LIMIT 26
+
+As fichas "próxima"/"anterior" guardam os valores da chave de ordenação
+da primeira/última linha, então continuam estáveis mesmo com inserções
+e exclusões entre um clique e outro.
+"""
+import asyncio
+import base64
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+
+from .banco_async import consultar, consultar_valor
+
+
+def dictfetchall(cursor):
+    """Retorna todas as linhas de um cursor como um dict."""
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _codificar(valores):
+    """Valores da chave -> ficha (token) segura para a URL."""
+    valores = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in valores]
+    texto = json.dumps(valores, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar(ficha, quantidade):
+    """Ficha -> lista de valores. Fichas inválidas são ignoradas (primeira página)."""
+    if not ficha:
+        return None
+    try:
+        texto = base64.urlsafe_b64decode(ficha + '=' * (-len(ficha) % 4)).decode()
+        valores = json.loads(texto)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != quantidade:
+        return None
+    return valores
+
+
+def _tamanho_pagina(request):
+    """Tamanho vindo de ?tamanho=, limitado pelas configurações."""
+    padrao = getattr(settings, 'PAGINACAO_TAMANHO_PAGINA', 25)
+    maximo = getattr(settings, 'PAGINACAO_TAMANHO_MAXIMO', 200)
+    try:
+        tamanho = int(request.GET.get('tamanho', padrao))
+    except (TypeError, ValueError):
+        tamanho = padrao
+    return max(1, min(tamanho, maximo))
+
+
+class Pagina:
+    """Resultado de uma página: itens + links para as páginas vizinhas."""
+
+    def __init__(self, itens, tamanho, url_anterior=None, url_proxima=None, total=None):
+        self.itens = itens
+        self.tamanho = tamanho
+        self.url_anterior = url_anterior
+        self.url_proxima = url_proxima
+        self.total = total
+
+    @property
+    def tem_outras_paginas(self):
+        return bool(self.url_anterior or self.url_proxima)
+
+
+def _url(request, parametro, ficha):
+    """Monta a query string mantendo a busca atual (q, filtros...)."""
+    params = request.GET.copy()
+    params.pop('apos', None)
+    params.pop('antes', None)
+    params[parametro] = ficha
+    return f'?{params.urlencode()}'
+
+
+def _consulta_pagina(request, sql, params, chaves, decrescente):
+    """Monta o SELECT da página pedida: (sql, params, tamanho, voltando, referencia)."""
+    tamanho = _tamanho_pagina(request)
+    apos = _decodificar(request.GET.get('apos'), len(chaves))
+    antes = _decodificar(request.GET.get('antes'), len(chaves))
+
+    # Voltando uma página: percorre a ordem ao contrário e inverte no final
+    voltando = apos is None and antes is not None
+    crescente = decrescente == voltando
+    referencia = antes if voltando else apos
+
+    colunas = ', '.join(f'sub.{chave}' for chave in chaves)
+    direcao = 'ASC' if crescente else 'DESC'
+
+    sql_pagina = f"SELECT * FROM ({sql}) AS sub"
+    params_pagina = list(params)
+    if referencia is not None:
+        operador = '>' if crescente else '<'
+        marcadores = ', '.join(['%s'] * len(chaves))
+        sql_pagina += f" WHERE ({colunas}) {operador} ({marcadores})"
+        params_pagina.extend(referencia)
+    sql_pagina += " ORDER BY " + ', '.join(f'sub.{chave} {direcao}' for chave in chaves)
+    sql_pagina += " LIMIT %s"
+    params_pagina.append(tamanho + 1)
+    return sql_pagina, params_pagina, tamanho, voltando, referencia
+
+
+def _montar_pagina(request, itens, chaves, tamanho, voltando, referencia, total):
+    """Corta a linha extra, desfaz a inversão e gera os links vizinhos."""
+    tem_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    if voltando:
+        itens.reverse()
+
+    url_anterior = url_proxima = None
+    if itens:
+        primeira = _codificar([itens[0][chave] for chave in chaves])
+        ultima = _codificar([itens[-1][chave] for chave in chaves])
+        if (voltando and tem_mais) or (not voltando and referencia is not None):
+            url_anterior = _url(request, 'antes', primeira)
+        if (not voltando and tem_mais) or voltando:
+            url_proxima = _url(request, 'apos', ultima)
+
+    return Pagina(itens, tamanho, url_anterior, url_proxima, total)
+
+
+def paginar(request, cursor, sql, params, chaves, decrescente=False, contar=False):
+    """
+    Executa `sql` (SEM ORDER BY) paginado pelas colunas `chaves`.
+
+    A última chave deve ser única (normalmente a pk) para desempatar, e
+    nenhuma delas pode ser NULL. Com `contar=True` também calcula o total
+    de linhas do filtro (uma consulta COUNT a mais).
+    """
+    sql_pagina, params_pagina, tamanho, voltando, referencia = _consulta_pagina(
+        request, sql, params, chaves, decrescente
+    )
+    cursor.execute(sql_pagina, params_pagina)
+    itens = dictfetchall(cursor)
+
+    total = None
+    if contar:
+        cursor.execute(f"SELECT COUNT(*) FROM ({sql}) AS sub", params)
+        total = cursor.fetchone()[0]
+
+    return _montar_pagina(request, itens, chaves, tamanho, voltando, referencia, total)
+
+
+async def paginar_async(request, sql, params, chaves, decrescente=False, contar=False):
+    """
+    Versão async de `paginar` (ver gestao_biblioteca/banco_async.py): a
+    página e o COUNT rodam ao mesmo tempo, em conexões diferentes.
+    """
+    sql_pagina, params_pagina, tamanho, voltando, referencia = _consulta_pagina(
+        request, sql, params, chaves, decrescente
+    )
+    consultas = [consultar(sql_pagina, params_pagina)]
+    if contar:
+        consultas.append(consultar_valor(f"SELECT COUNT(*) FROM ({sql}) AS sub", params))
+    itens, *total = await asyncio.gather(*consultas)
+
+    total = total[0] if total else None
+    return _montar_pagina(request, itens, chaves, tamanho, voltando, referencia, total)
@@ -0,0 +1,207 @@
+"""
+Regressão de planos de execução das consultas das views.
+
+As views montam o SQL por concatenação (filtros ILIKE e subconsultas
+opcionais), então uma mudança pequena pode trocar um Index Scan por um
+Seq Scan sem ninguém perceber. Aqui:
+
+1. os cenários do benchmark (benchmark.montar_cenarios), mais as telas com
+   filtro, são requisitados com um `execute_wrapper` que guarda cada
+   comando SQL distinto (pela impressão digital) com os parâmetros reais;
+2. cada comando roda com EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON);
+3. do plano ficam o formato (árvore de nós, tabelas e índices, sem
+   custos), o custo estimado, os buffers lidos e as tabelas varridas por
+   Seq Scan;
+4. o resultado é comparado com a linha de base (PLANOS_BASELINE, gravada
+   por `verificar_planos --gravar`).
+
+É regressão:
+- Seq Scan numa tabela que a linha de base lia por índice; em comando
+  ainda sem linha de base, Seq Scan numa tabela com pelo menos
+  `seqscan_linhas_minimas` linhas;
+- custo ou buffers acima dos limites de PLANOS_LIMITES, ou mais que
+  `fator_regressao` vezes o valor da linha de base.
+
+Outras mudanças de formato só são listadas. EXPLAIN ANALYZE executa o
+comando, então tudo roda em transações desfeitas ao final (como no
+benchmark).
+"""
+import json
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.urls import reverse
+
+from .benchmark import cliente_logado, montar_cenarios
+from .instrumentacao import impressao_digital
+
+LIMITES_PADRAO = {
+    'custo_maximo': 100_000,
+    'buffers_maximos': 20_000,
+    'seqscan_linhas_minimas': 1_000,
+    'fator_regressao': 3.0,
+}
+
+# Só comandos que têm plano; SAVEPOINT, SET, COPY etc. ficam de fora
+COMANDOS_COM_PLANO = {'select', 'with', 'insert', 'update', 'delete'}
+
+# Telas com filtro: o SQL muda com o parâmetro (cenário, rota, query string)
+CENARIOS_FILTRADOS = [
+    ('leitores_busca', 'leitores:leitor_list', '?q=silva'),
+    ('autores_busca', 'autores:autor_list', '?q=silva'),
+    ('funcionarios_busca', 'funcionarios:funcionario_list', '?q=ana'),
+    ('exemplares_busca', 'exemplares:exemplar_list', '?q=memorias'),
+    ('emprestimos_busca', 'emprestimos:emprestimo_list', '?q=silva'),
+    ('autocomplete_leitores', 'emprestimos:autocomplete_leitores', '?q=ana'),
+    ('autocomplete_exemplares', 'emprestimos:autocomplete_exemplares', '?q=mem'),
+    ('autocomplete_emprestimos', 'emprestimos:autocomplete_emprestimos', '?q=ana'),
+]
+
+
+def limites_configurados():
+    return {**LIMITES_PADRAO, **getattr(settings, 'PLANOS_LIMITES', {})}
+
+
+def _interno(sql):
+    """Consultas do próprio Django (sessão, cache em banco), fora da análise."""
+    tabela_cache = settings.CACHES['default'].get('LOCATION', '')
+    return 'django_' in sql or (tabela_cache and f'"{tabela_cache}"' in sql)
+
+
+class ColetorSQL:
+    """execute_wrapper que guarda o primeiro (cenário, sql, params) de cada comando."""
+
+    def __init__(self):
+        self.cenario = None
+        self.comandos = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        palavra = re.match(r'\s*\(?\s*(\w+)', sql)
+        if not many and palavra and palavra.group(1).lower() in COMANDOS_COM_PLANO and not _interno(sql):
+            if not isinstance(params, (dict, type(None))):
+                params = list(params)
+            self.comandos.setdefault(impressao_digital(sql), (self.cenario, sql, params))
+        return execute(sql, params, many, context)
+
+
+def coletar_comandos(filtro=None):
+    """{impressão digital: (cenário, sql, params)} de todas as telas."""
+    with connection.cursor() as cursor:
+        cenarios = montar_cenarios(cursor)
+        cliente = cliente_logado(cursor)
+    cenarios += [(nome, 'GET', reverse(rota) + query, None) for nome, rota, query in CENARIOS_FILTRADOS]
+
+    coletor = ColetorSQL()
+    for nome, metodo, url, dados in cenarios:
+        if filtro and nome not in filtro:
+            continue
+        coletor.cenario = nome
+        with transaction.atomic(), connection.execute_wrapper(coletor):
+            if metodo == 'POST':
+                cliente.post(url, dados)
+            else:
+                cliente.get(url)
+            transaction.set_rollback(True)
+    return coletor.comandos
+
+
+def _percorrer(no, profundidade=0):
+    yield profundidade, no
+    for filho in no.get('Plans', []):
+        yield from _percorrer(filho, profundidade + 1)
+
+
+def _descrever(no):
+    descricao = no['Node Type']
+    if no.get('Index Name'):
+        descricao += f" using {no['Index Name']}"
+    if no.get('Relation Name'):
+        descricao += f" on {no['Relation Name']}"
+    return descricao
+
+
+def analisar(cursor, sql, params):
+    """EXPLAIN (ANALYZE, BUFFERS) do comando, resumido (ou {'erro': ...})."""
+    try:
+        with transaction.atomic():
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+            plano = cursor.fetchone()[0]
+            transaction.set_rollback(True)
+    except DatabaseError as erro:
+        return {'erro': str(erro).strip()}
+
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    raiz = plano[0]['Plan']
+    nos = list(_percorrer(raiz))
+    return {
+        'formato': ['  ' * profundidade + _descrever(no) for profundidade, no in nos],
+        'custo': raiz['Total Cost'],
+        # Os contadores da raiz já somam os de todos os nós filhos
+        'buffers': raiz.get('Shared Hit Blocks', 0) + raiz.get('Shared Read Blocks', 0),
+        'tempo_ms': plano[0].get('Execution Time'),
+        'seq_scans': sorted({no['Relation Name'] for _, no in nos if no['Node Type'] == 'Seq Scan'}),
+    }
+
+
+def _linhas_por_tabela(cursor, tabelas):
+    if not tabelas:
+        return {}
+    cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)", [sorted(tabelas)])
+    return {nome: int(linhas) for nome, linhas in cursor.fetchall()}
+
+
+def comparar(atual, base, limites, linhas_tabela):
+    """Regressões do comando em relação à linha de base (`base` None = comando novo)."""
+    if 'erro' in atual:
+        return [f"EXPLAIN falhou: {atual['erro']}"]
+
+    problemas = []
+    for tabela in atual['seq_scans']:
+        if base is not None:
+            if tabela not in base.get('seq_scans', []):
+                problemas.append(f'Seq Scan em {tabela} (a linha de base usava índice)')
+        elif linhas_tabela.get(tabela, 0) >= limites['seqscan_linhas_minimas']:
+            problemas.append(f'Seq Scan em {tabela} ({linhas_tabela[tabela]} linhas)')
+
+    for medida, limite in (('custo', 'custo_maximo'), ('buffers', 'buffers_maximos')):
+        if atual[medida] > limites[limite]:
+            problemas.append(f'{medida} {atual[medida]:.0f} acima do limite ({limites[limite]})')
+        elif base and base.get(medida) and atual[medida] > base[medida] * limites['fator_regressao']:
+            problemas.append(f'{medida} {atual[medida]:.0f} (linha de base: {base[medida]:.0f})')
+    return problemas
+
+
+def verificar_planos(linha_de_base, filtro=None, limites=None):
+    """
+    Analisa os planos atuais e compara com `linha_de_base` ({impressão: análise}).
+    Retorna {'analises', 'regressoes', 'mudancas', 'novos', 'ausentes'}.
+    """
+    limites = limites or limites_configurados()
+    comandos = coletar_comandos(filtro)
+
+    analises = {}
+    with connection.cursor() as cursor:
+        for impressao, (cenario, sql, params) in comandos.items():
+            analises[impressao] = {'cenario': cenario, **analisar(cursor, sql, params)}
+        linhas_tabela = _linhas_por_tabela(
+            cursor, {tabela for analise in analises.values() for tabela in analise.get('seq_scans', [])}
+        )
+
+    resultado = {'analises': analises, 'regressoes': {}, 'mudancas': [], 'novos': [], 'ausentes': []}
+    for impressao, analise in analises.items():
+        base = linha_de_base.get(impressao)
+        problemas = comparar(analise, base, limites, linhas_tabela)
+        if problemas:
+            resultado['regressoes'][impressao] = problemas
+        if base is None:
+            resultado['novos'].append(impressao)
+        elif base.get('formato') != analise.get('formato'):
+            resultado['mudancas'].append(impressao)
+
+    resultado['ausentes'] = [
+        impressao for impressao, base in linha_de_base.items()
+        if impressao not in analises and (not filtro or base.get('cenario') in filtro)
+    ]
+    return resultado
@@ -0,0 +1,80 @@
+"""
+Pool de conexões com o PostgreSQL (ver DATABASES em biblioteca/settings.py).
+
+O pool é criado pelo próprio Django (OPTIONS['pool']) e compartilhado por
+todas as threads do processo, tanto no WSGI quanto no ASGI. Aqui ficam só
+os utilitários: abrir o pool no início do processo e ler as estatísticas
+para dimensionar min_size/max_size.
+"""
+from django.core.signals import request_started
+from django.db import connections
+
+
+def get_pool(alias='default'):
+    """Retorna o ConnectionPool do banco ou None se o pool estiver desligado."""
+    return connections[alias].pool
+
+
+def abrir_pool(alias='default'):
+    """
+    Abre o pool em segundo plano, para que as requisições seguintes não
+    paguem a abertura das conexões mínimas.
+    """
+    pool = get_pool(alias)
+    if pool is not None:
+        pool.open(wait=False)
+
+
+def abrir_pool_na_primeira_requisicao(alias='default'):
+    """
+    Agenda abrir_pool para a primeira requisição de cada processo (chamado
+    por wsgi.py/asgi.py). Com `gunicorn --preload` o import acontece no
+    master, antes do fork: um pool aberto ali teria threads mortas e
+    conexões compartilhadas nos workers. O receptor ligado no master é
+    herdado por cada worker e dispara lá, uma vez.
+    """
+    uid = f'abrir_pool:{alias}'
+
+    def abrir(**kwargs):
+        request_started.disconnect(dispatch_uid=uid)
+        abrir_pool(alias)
+
+    request_started.connect(abrir, weak=False, dispatch_uid=uid)
+
+
+def estatisticas_pool(alias='default'):
+    """
+    Estatísticas do pool deste processo:
+    - em_uso / disponiveis: conexões emprestadas e livres agora;
+    - aguardando: requisições na fila esperando uma conexão;
+    - espera_total_ms / espera_media_ms: tempo gasto na fila (acumulado);
+    - timeouts: requisições que desistiram após `timeout` segundos.
+    """
+    pool = get_pool(alias)
+    if pool is None:
+        return {'ativo': False}
+
+    # Os contadores do psycopg_pool só aparecem depois do primeiro evento
+    stats = pool.get_stats()
+    tamanho = stats.get('pool_size', 0)
+    disponiveis = stats.get('pool_available', 0)
+    na_fila = stats.get('requests_queued', 0)
+    espera_ms = stats.get('requests_wait_ms', 0)
+
+    return {
+        'ativo': True,
+        'min': stats.get('pool_min', 0),
+        'max': stats.get('pool_max', 0),
+        'tamanho': tamanho,
+        'em_uso': tamanho - disponiveis,
+        'disponiveis': disponiveis,
+        'aguardando': stats.get('requests_waiting', 0),
+        'emprestimos': stats.get('requests_num', 0),
+        'emprestimos_com_espera': na_fila,
+        'espera_total_ms': espera_ms,
+        'espera_media_ms': round(espera_ms / na_fila, 1) if na_fila else 0,
+        'timeouts': stats.get('requests_errors', 0),
+        'conexoes_abertas': stats.get('connections_num', 0),
+        'conexoes_perdidas': stats.get('connections_lost', 0),
+        'devolvidas_com_erro': stats.get('returns_bad', 0),
+    }
@@ -0,0 +1,210 @@
+"""
+Réplica de leitura para os relatórios e as consultas do catálogo.
+
+Com BANCO_REPLICA definido em settings, existe o banco 'replica' (réplica
+de streaming do PostgreSQL, só leitura). As views só de leitura recebem o
+decorator `leitura_na_replica` e abrem o cursor com `conexao_leitura()` em
+vez de `connection`:
+
+    @leitura_na_replica
+    def consultar_livros_view(request):
+        with conexao_leitura().cursor() as cursor:
+            ...
+
+Todo o resto (cadastros, empréstimos, login, cache e sessão) continua no
+primário. A leitura só vai para a réplica quando:
+
+- a requisição é GET/HEAD;
+- o navegador não escreveu nada nos últimos BANCO_REPLICA_JANELA_ESCRITA
+  segundos (cookie gravado pelo ReplicaMiddleware a cada POST). Assim
+  quem acabou de cadastrar vê o próprio cadastro, mesmo com a réplica
+  atrasada;
+- a réplica responde e está no máximo BANCO_REPLICA_ATRASO_MAXIMO segundos
+  atrás do primário. A medida fica guardada por BANCO_REPLICA_VERIFICAR
+  segundos; réplica fora do ar ou atrasada faz tudo cair no primário.
+
+As views async usam o mesmo decorator: o pool async (banco_async.py) lê o
+alias escolhido para a requisição.
+
+Para testar localmente com duas instâncias do PostgreSQL:
+
+    initdb -D primario && pg_ctl -D primario -o "-p 5432" start
+    pg_basebackup -D replica -R -h localhost -p 5432 -U admin
+    pg_ctl -D replica -o "-p 5433" start
+
+e BANCO_REPLICA = {'PORT': '5433'}. `manage.py verificar_replica` mostra o
+atraso medido e para onde as leituras estão indo.
+"""
+import contextlib
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('biblioteca.replica')
+
+ALIAS_REPLICA = 'replica'
+COOKIE_ESCRITA = 'escrita_recente'
+METODOS_LEITURA = {'GET', 'HEAD'}
+
+# Tabelas do próprio Django (sessão, cache em banco, admin) ficam sempre no
+# primário: são gravadas a toda hora e lidas logo em seguida
+APPS_PRIMARIO = {'sessions', 'django_cache', 'admin', 'auth', 'contenttypes'}
+
+# Atraso em segundos. Em dia (tudo que chegou já foi aplicado) = 0; fora de
+# recuperação (não é réplica física) não há como medir: também 0
+SQL_ATRASO = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+# Banco de onde a requisição atual lê (thread no WSGI, task no ASGI)
+_alias_leitura = ContextVar('alias_leitura', default=DEFAULT_DB_ALIAS)
+
+# Última medida do atraso, compartilhada pelas threads do processo
+_estado = {'verificado_em': None, 'em_dia': False, 'atraso': None}
+_trava = threading.Lock()
+
+
+def replica_configurada():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def alias_leitura():
+    """Alias do banco para as leituras da requisição atual."""
+    return _alias_leitura.get()
+
+
+def conexao_leitura():
+    """Conexão para as leituras da requisição atual (réplica ou primário)."""
+    return connections[alias_leitura()]
+
+
+@contextlib.contextmanager
+def lendo_de(alias):
+    """Leituras dentro do bloco vão para `alias`."""
+    token = _alias_leitura.set(alias)
+    try:
+        yield
+    finally:
+        _alias_leitura.reset(token)
+
+
+def medir_atraso():
+    """Atraso da réplica em segundos (float), consultado agora. Levanta DatabaseError."""
+    with connections[ALIAS_REPLICA].cursor() as cursor:
+        cursor.execute(SQL_ATRASO)
+        return float(cursor.fetchone()[0])
+
+
+def estado_replica():
+    """{'verificado_em', 'em_dia', 'atraso'} da última verificação deste processo."""
+    return dict(_estado)
+
+
+def replica_em_dia():
+    """
+    A réplica responde e está dentro de BANCO_REPLICA_ATRASO_MAXIMO? A
+    medida é refeita a cada BANCO_REPLICA_VERIFICAR segundos por uma thread
+    só; as outras usam a anterior.
+    """
+    if not replica_configurada():
+        return False
+
+    intervalo = getattr(settings, 'BANCO_REPLICA_VERIFICAR', 5)
+    verificado_em = _estado['verificado_em']
+    if verificado_em is not None and time.monotonic() - verificado_em < intervalo:
+        return _estado['em_dia']
+    if not _trava.acquire(blocking=False):
+        return _estado['em_dia']
+
+    try:
+        try:
+            atraso = medir_atraso()
+        except DatabaseError as erro:
+            logger.warning('Réplica indisponível, lendo do primário: %s', erro)
+            atraso = None
+        maximo = getattr(settings, 'BANCO_REPLICA_ATRASO_MAXIMO', 30)
+        em_dia = atraso is not None and atraso <= maximo
+        if atraso is not None and not em_dia:
+            logger.warning('Réplica %.1fs atrasada (máximo %ss), lendo do primário.', atraso, maximo)
+        _estado.update(verificado_em=time.monotonic(), em_dia=em_dia, atraso=atraso)
+        return em_dia
+    finally:
+        _trava.release()
+
+
+def escolher_alias(request):
+    """Alias de leitura para `request` (ver as condições no início do módulo)."""
+    if (
+        request.method in METODOS_LEITURA
+        and COOKIE_ESCRITA not in request.COOKIES
+        and replica_em_dia()
+    ):
+        return ALIAS_REPLICA
+    return DEFAULT_DB_ALIAS
+
+
+def leitura_na_replica(view):
+    """Decorator das views só de leitura (síncronas ou async)."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def view_replica(request, *args, **kwargs):
+            # A medida do atraso usa o cursor síncrono
+            alias = await sync_to_async(escolher_alias)(request)
+            with lendo_de(alias):
+                return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def view_replica(request, *args, **kwargs):
+            with lendo_de(escolher_alias(request)):
+                return view(request, *args, **kwargs)
+    return view_replica
+
+
+class ReplicaMiddleware:
+    """Marca o navegador que acabou de escrever: ele lê do primário por um tempo."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in METODOS_LEITURA and replica_configurada():
+            response.set_cookie(
+                COOKIE_ESCRITA, '1',
+                max_age=getattr(settings, 'BANCO_REPLICA_JANELA_ESCRITA', 30),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class RoteadorReplica:
+    """
+    Roteador do ORM com a mesma regra das views de SQL bruto: leitura no
+    alias escolhido para a requisição, escrita e migrations no primário.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in APPS_PRIMARIO:
+            return DEFAULT_DB_ALIAS
+        return alias_leitura()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Os dois bancos têm os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # A réplica recebe o esquema pela replicação
+        return db == DEFAULT_DB_ALIAS
@@ -1,3 +1,72 @@
-from django.test import TestCase
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
 
-# Create your tests here.
+from .benchmark import cliente_logado
+from .dados_sinteticos import gerar_biblioteca
+from .instrumentacao import OrcamentoSQLExcedido, orcamento_da_view
+
+
+def livros_n_mais_um_view(request):
+    """N+1 de propósito: uma consulta por livro da listagem."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id_livro FROM Livro ORDER BY id_livro LIMIT 20")
+        for (id_livro,) in cursor.fetchall():
+            cursor.execute("SELECT nome FROM Livro WHERE id_livro = %s", [id_livro])
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('teste/n-mais-um/', livros_n_mais_um_view, name='teste_n_mais_um'),
+    path('', include('biblioteca.urls')),
+]
+
+
+# Orçamento estourado vira exceção (gestao_biblioteca/instrumentacao.py).
+# Com dados suficientes para uma listagem cheia, um N+1 numa das views com
+# orçamento passa do limite e derruba o teste.
+@override_settings(SQL_ORCAMENTO_ESTRITO=True, ACERVO_SNAPSHOT=False)
+class OrcamentoSQLTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            gerar_biblioteca(cursor, livros=60, autores=20, leitores=40, anos=1)
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            self.cliente = cliente_logado(cursor)
+
+    def assertDentroDoOrcamento(self, nome_view, url):
+        response = self.cliente.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(response.wsgi_request.monitor_sql.quantidade, orcamento_da_view(nome_view))
+
+    def test_home(self):
+        self.assertDentroDoOrcamento('home', reverse('home'))
+
+    def test_acervo(self):
+        self.assertDentroDoOrcamento('acervo:acervo_index', reverse('acervo:acervo_index'))
+
+    def test_acervo_busca(self):
+        self.assertDentroDoOrcamento('acervo:acervo_index', reverse('acervo:acervo_index') + '?q=a')
+
+    def test_livros(self):
+        self.assertDentroDoOrcamento('livros:livro_list', reverse('livros:livro_list'))
+
+    def test_emprestimos(self):
+        self.assertDentroDoOrcamento('emprestimos:emprestimo_list', reverse('emprestimos:emprestimo_list'))
+
+    @override_settings(ROOT_URLCONF='gestao_biblioteca.tests', SQL_ORCAMENTOS={'teste_n_mais_um': 10})
+    def test_n_mais_um_estoura_orcamento(self):
+        with self.assertRaises(OrcamentoSQLExcedido):
+            self.cliente.get(reverse('teste_n_mais_um'))
+
+    @override_settings(ROOT_URLCONF='gestao_biblioteca.tests', SQL_ORCAMENTO_ESTRITO=False,
+                       SQL_ORCAMENTOS={'teste_n_mais_um': 10})
+    def test_n_mais_um_sem_modo_estrito_so_avisa(self):
+        with self.assertLogs('biblioteca.sql', level='WARNING') as logs:
+            response = self.cliente.get(reverse('teste_n_mais_um'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('orçamento: 10' in linha for linha in logs.output))
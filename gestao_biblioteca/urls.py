@@ -4,7 +4,7 @@ from . import views
 
 urlpatterns = [
     path('', views.login_view, name='login'),
-    path('home/', views.home_view, name='home'),
+    path('home/', views.home_async_view, name='home'),
     path('logout/', views.logout_view, name='logout'), 
 
     # --- Apps Modulares ---
@@ -22,4 +22,7 @@ urlpatterns = [
     # --- Páginas Restantes ---
     # As rotas de emprestimo foram removidas daqui
     path('relatorios/', views.relatorio_index_view, name='relatorio_index'),
+
+    # --- Monitoramento ---
+    path('pool/', views.estatisticas_pool_view, name='estatisticas_pool'),
 ]
\ No newline at end of file
@@ -1,6 +1,12 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.db import connection # Para executar SQL bruto
+from django.http import JsonResponse
+from .autenticacao import registrar_login
+from .banco_async import view_async
+from .estatisticas import get_painel
+from .pool import estatisticas_pool
 # from django.contrib.auth.hashers import make_password
 
 def login_view(request):
@@ -14,7 +20,7 @@ def login_view(request):
         with connection.cursor() as cursor:
             # Executa a query com parâmetros (previne SQL Injection)
             cursor.execute(
-                "SELECT id_funcionario, nome FROM Funcionario WHERE email = %s AND senha = %s", 
+                "SELECT id_funcionario, nome, status FROM Funcionario WHERE email = %s AND senha = %s", 
                 [email, senha]
             )
             # Retorna o registro encontrado (ou None)
@@ -22,9 +28,9 @@ def login_view(request):
 
         # Verifica se a credencial é válida
         if funcionario:
-            # Salva dados na sessão (mantém o login ativo)
-            request.session['funcionario_logado_id'] = funcionario[0]
-            request.session['funcionario_logado_nome'] = funcionario[1]
+            # Salva dados na sessão (mantém o login ativo); funcionário inativo
+            # é barrado pelo middleware já na próxima requisição
+            registrar_login(request, *funcionario)
             return redirect('home')
         else:
             # Login falhou: define mensagem de erro e recarrega
@@ -35,43 +41,45 @@ def login_view(request):
     return render(request, 'login.html')
 
 
+def _contexto_home(nome_funcionario, painel):
+    """Contexto do dashboard a partir do serviço de estatísticas."""
+    return {
+        'nome': nome_funcionario,
+        'total_emprestimos': painel['emprestimos_ativos'],
+        'total_obras': painel['livros'],
+        'total_exemplares': painel['exemplares'],
+        'total_leitores': painel['leitores'],
+        'emprestimos_por_dia': painel['emprestimos_por_dia'],
+        'maximo_por_dia': max([qtd for _dia, qtd in painel['emprestimos_por_dia']] + [1]),
+        'atrasos_por_semana': painel['atrasos_por_semana'],
+        'maximo_por_semana': max([qtd for _semana, qtd in painel['atrasos_por_semana']] + [1]),
+    }
+
+
 # View simples para a página de dashboard
 def home_view(request):
-    # Verifica se o usuário está logado
-    if 'funcionario_logado_id' not in request.session:
-        return redirect('login')
-        
-    nome_funcionario = request.session.get('funcionario_logado_nome')
+    # Login exigido pelo middleware (gestao_biblioteca/autenticacao.py)
+    nome_funcionario = request.funcionario['nome']
     
-    # Conexão para buscar os indicadores
-    with connection.cursor() as cursor:
-        # 1. Total de Empréstimos Ativos
-        cursor.execute("SELECT COUNT(*) FROM Emprestimo WHERE status = 'Em Andamento'")
-        total_emprestimos = cursor.fetchone()[0]
-
-        # 2. Total de Obras (Títulos únicos)
-        cursor.execute("SELECT COUNT(*) FROM Livro")
-        total_obras = cursor.fetchone()[0]
-
-        # 3. Total de Exemplares (Livros físicos)
-        cursor.execute("SELECT COUNT(*) FROM Exemplar")
-        total_exemplares = cursor.fetchone()[0]
-
-        # 4. Leitores Cadastrados
-        cursor.execute("SELECT COUNT(*) FROM Leitor")
-        total_leitores = cursor.fetchone()[0]
-
-    context = {
-        'nome': nome_funcionario,
-        'total_emprestimos': total_emprestimos,
-        'total_obras': total_obras,
-        'total_exemplares': total_exemplares,
-        'total_leitores': total_leitores,
-    }
+    # Indicadores vêm da tabela de contadores (com cache), não de COUNT(*)
+    # Ver gestao_biblioteca/estatisticas.py
+    context = _contexto_home(nome_funcionario, get_painel())
 
     # Renderiza a página inicial de dashboard
     return render(request, 'home.html', context)
 
+# Versão async do dashboard (ASGI). O painel vem do cache/contadores, então
+# basta não bloquear o event loop enquanto ele é lido.
+# No WSGI o decorator delega para a home_view acima.
+@view_async(home_view)
+async def home_async_view(request):
+    # O middleware já resolveu o funcionário a partir da sessão
+    nome_funcionario = request.funcionario['nome']
+    painel = await sync_to_async(get_painel)()
+
+    context = _contexto_home(nome_funcionario, painel)
+    return await sync_to_async(render)(request, 'home.html', context)
+
 def logout_view(request):
     # Limpa a sessão para fazer o logout
     request.session.flush()
@@ -129,4 +137,12 @@ def relatorio_index_view(request):
     Esta view renderiza a página principal de relatórios.
     """
     # Certifique-se que o nome do template está correto.
-    return render(request, 'relatorio/relatorio.html')
\ No newline at end of file
+    return render(request, 'relatorio/relatorio.html')
+
+def estatisticas_pool_view(request):
+    """
+    Estatísticas do pool de conexões deste processo (JSON), para ajustar
+    min_size/max_size em settings.py. Restrito a funcionários logados
+    (middleware de autenticação).
+    """
+    return JsonResponse(estatisticas_pool())
\ No newline at end of file
@@ -2,10 +2,13 @@
 
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.db import connection, IntegrityError
+from django.db import connection, IntegrityError, transaction
 
 # O import do LeitorForm
 from .forms import LeitorForm 
+from gestao_biblioteca.paginacao import paginar
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
+from gestao_biblioteca.estatisticas import ajustar_contador
 
 # --- Helper Function ---
 def dictfetchall(cursor):
@@ -30,11 +33,8 @@ def cadastrar_leitor_view(request):
             
             # 1. Rastreabilidade (Foreign Key)
             # Recupera quem está logado para salvar no banco quem realizou o cadastro (id_funcionario).
-            id_funcionario_logado = request.session.get('funcionario_logado_id')
-
-            if not id_funcionario_logado:
-                messages.error(request, 'Sua sessão expirou. Por favor, faça login novamente.')
-                return redirect('login')
+            # O login já foi exigido pelo middleware (gestao_biblioteca/autenticacao.py).
+            id_funcionario_logado = request.funcionario['id']
 
             # 2. Validação Manual de Unicidade (Regra de Negócio)
             # Faz um SELECT antes do INSERT para verificar se o CPF já existe.
@@ -47,7 +47,7 @@ def cadastrar_leitor_view(request):
             
             # 3. Persistência com Chave Estrangeira
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     cursor.execute(
                         """
                         INSERT INTO Leitor (nome, email, telefone, cpf, dt_nascimento, endereco, id_funcionario)
@@ -59,6 +59,7 @@ def cadastrar_leitor_view(request):
                             dados['data_nascimento'], dados['endereco'], id_funcionario_logado
                         ]
                     )
+                    ajustar_contador(cursor, 'leitores', 1)
                 messages.success(request, 'Leitor cadastrado com sucesso!')
                 return redirect('leitores:leitor_list')
             except Exception as e:
@@ -69,10 +70,11 @@ def cadastrar_leitor_view(request):
     return render(request, 'leitor/cadastrar_leitor.html', {'form': form})
 
 # READ (Consultar Leitores)
+@leitura_na_replica
 def consultar_leitores_view(request):
     query = request.GET.get('q', '')
     
-    with connection.cursor() as cursor:
+    with conexao_leitura().cursor() as cursor:
         # SQL com Alias: 'id_leitor AS pk' padroniza o ID para o template
         sql = "SELECT id_leitor AS pk, nome, email, telefone, cpf FROM Leitor"
         params = []
@@ -81,17 +83,13 @@ def consultar_leitores_view(request):
             # Busca Abrangente: Procura o termo em Nome, Email OU CPF ao mesmo tempo
             sql += " WHERE nome ILIKE %s OR email ILIKE %s OR cpf ILIKE %s"
             params.extend([f'%{query}%', f'%{query}%', f'%{query}%'])
-        else:
-            sql += " ORDER BY nome"
             
-        cursor.execute(sql, params)
-        
-        # OTIMIZAÇÃO: Uso de função auxiliar 'dictfetchall'.
-        # Ao invés de fazer o loop manual (como no Funcionario), essa função
-        # converte as tuplas do banco em dicionários automaticamente.
-        leitores = dictfetchall(cursor)
+        # Paginação por chave (nome, pk): cada página traz apenas 'tamanho' linhas,
+        # já convertidas em dicionários.
+        pagina = paginar(request, cursor, sql, params, ['nome', 'pk'])
+        leitores = pagina.itens
 
-    return render(request, 'leitor/consultar_leitor.html', {'leitores': leitores})
+    return render(request, 'leitor/consultar_leitor.html', {'leitores': leitores, 'pagina': pagina})
 
 # UPDATE (Atualizar Leitor)
 def atualizar_leitor_view(request, pk):
@@ -177,10 +175,12 @@ def excluir_leitor_view(request, pk):
 
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 # 2. Tentativa de Exclusão Física (Hard Delete)
                 # Tenta apagar o registro definitivamente.
                 cursor.execute("DELETE FROM Leitor WHERE id_leitor = %s", [pk])
+                if cursor.rowcount:
+                    ajustar_contador(cursor, 'leitores', -1)
             
             messages.success(request, f'Leitor "{leitor[0]}" excluído com sucesso.')
             return redirect('leitores:leitor_list')
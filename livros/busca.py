@@ -0,0 +1,100 @@
+"""
+Busca textual do catálogo (acervo e listagem de livros).
+
+Cada livro tem um "documento de busca" na tabela `livro_busca`, com título,
+gênero, ISBN e nomes dos autores já sem acentos e em minúsculas, mais o
+tsvector correspondente. A busca combina:
+
+- full-text em português (índice GIN no tsvector), que entende radicais;
+- trigramas (índice GIN pg_trgm no documento), que cobrem trechos de
+  palavras ("Mach" -> "Machado") sem varrer a tabela inteira.
+
+Como tudo é gravado via `unaccent`, "Sao Paulo" encontra "São Paulo".
+O documento é atualizado pelas escritas em Livro, Autor e autor_livro.
+"""
+
+
+def _padrao_like(termo):
+    """Escapa os curingas do LIKE digitados pelo usuário."""
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def condicao_busca(termo):
+    """
+    (sql, params) de uma subconsulta com os id_livro que casam com o termo.
+    Uso: WHERE id_livro IN (<sql>)
+    """
+    sql = """
+        SELECT id_livro FROM livro_busca
+        WHERE vetor @@ plainto_tsquery('portuguese', unaccent(%s))
+           OR documento LIKE '%%' || lower(unaccent(%s)) || '%%'
+    """
+    return sql, [termo, _padrao_like(termo)]
+
+
+def relevancia_busca(termo, coluna='id_livro'):
+    """
+    (sql, params) de uma expressão com a relevância do livro `coluna`:
+    rank do full-text + similaridade por trigramas.
+    """
+    sql = f"""
+        (SELECT (
+            ts_rank_cd(vetor, plainto_tsquery('portuguese', unaccent(%s)))
+            + similarity(documento, lower(unaccent(%s)))
+        )::float8 FROM livro_busca WHERE livro_busca.id_livro = {coluna})
+    """
+    return sql, [termo, termo]
+
+
+def atualizar_indice_busca(cursor, ids_livros=None):
+    """
+    (Re)gera o documento de busca dos livros informados.
+    Sem `ids_livros`, reconstrói o índice inteiro.
+    """
+    filtro = ""
+    params = []
+    if ids_livros is not None:
+        ids_livros = list(ids_livros)
+        if not ids_livros:
+            return 0
+        filtro = "WHERE id_livro = ANY(%s)"
+        params = [ids_livros]
+        cursor.execute("DELETE FROM livro_busca WHERE id_livro = ANY(%s)", params)
+    else:
+        cursor.execute("DELETE FROM livro_busca")
+
+    cursor.execute(
+        f"""
+        INSERT INTO livro_busca (id_livro, documento, vetor)
+        SELECT
+            id_livro,
+            lower(unaccent(concat_ws(' ', nome, autores, genero, isbn))),
+            setweight(to_tsvector('portuguese', unaccent(coalesce(nome, ''))), 'A')
+            || setweight(to_tsvector('simple', coalesce(isbn, '')), 'A')
+            || setweight(to_tsvector('portuguese', unaccent(coalesce(autores, ''))), 'B')
+            || setweight(to_tsvector('portuguese', unaccent(coalesce(genero, ''))), 'C')
+        FROM (
+            SELECT
+                id_livro, nome, genero, isbn,
+                (
+                    SELECT string_agg(nome, ' ') FROM Autor
+                    WHERE id_autor IN (SELECT id_autor FROM autor_livro WHERE id_livro = Livro.id_livro)
+                ) AS autores
+            FROM Livro
+            {filtro}
+        ) AS livros
+        """,
+        params
+    )
+    return cursor.rowcount
+
+
+def atualizar_indice_busca_autor(cursor, id_autor):
+    """Regera os documentos dos livros de um autor (ex: nome corrigido)."""
+    cursor.execute("SELECT id_livro FROM autor_livro WHERE id_autor = %s", [id_autor])
+    return atualizar_indice_busca(cursor, [row[0] for row in cursor.fetchall()])
+
+
+def remover_indice_busca(cursor, id_livro):
+    """Remove o documento de um livro excluído."""
+    cursor.execute("DELETE FROM livro_busca WHERE id_livro = %s", [id_livro])
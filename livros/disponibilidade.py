@@ -0,0 +1,101 @@
+"""
+Contadores de disponibilidade por livro (tabela `livro_disponibilidade`).
+
+Em vez de contar Exemplar e Emprestimo a cada acesso ao catálogo, cada
+escrita que muda esses números (cadastro/exclusão de exemplar, empréstimo,
+devolução...) ajusta os contadores NA MESMA TRANSAÇÃO da operação.
+O comando `recalcular_disponibilidade` reconstrói a tabela do zero.
+"""
+
+
+def criar_disponibilidade(cursor, id_livro):
+    """Cria a linha zerada de um livro recém-cadastrado."""
+    cursor.execute(
+        """
+        INSERT INTO livro_disponibilidade (id_livro, total_exemplares, qtd_emprestados)
+        VALUES (%s, 0, 0)
+        ON CONFLICT (id_livro) DO NOTHING
+        """,
+        [id_livro]
+    )
+
+
+def remover_disponibilidade(cursor, id_livro):
+    """Remove os contadores de um livro excluído."""
+    cursor.execute("DELETE FROM livro_disponibilidade WHERE id_livro = %s", [id_livro])
+
+
+def ajustar_disponibilidade(cursor, id_exemplar, total=0, emprestados=0):
+    """
+    Soma os deltas aos contadores do livro ao qual o exemplar pertence.
+    Ex: novo empréstimo -> emprestados=1; devolução -> emprestados=-1.
+
+    O UPDATE incremental trava a linha do livro, então operações
+    simultâneas no mesmo livro não perdem contagem.
+    """
+    cursor.execute(
+        """
+        INSERT INTO livro_disponibilidade (id_livro, total_exemplares, qtd_emprestados)
+        SELECT id_livro, %s, %s FROM Exemplar WHERE id_exemplar = %s
+        ON CONFLICT (id_livro) DO UPDATE
+        SET total_exemplares = livro_disponibilidade.total_exemplares + EXCLUDED.total_exemplares,
+            qtd_emprestados = livro_disponibilidade.qtd_emprestados + EXCLUDED.qtd_emprestados
+        """,
+        [total, emprestados, id_exemplar]
+    )
+
+
+def ajustar_disponibilidade_lote(cursor, ids_exemplares, total=0, emprestados=0):
+    """
+    Como `ajustar_disponibilidade`, para vários exemplares num só comando
+    (ex: empréstimo de vários livros de uma vez). Os deltas são somados por
+    livro e as linhas travadas em ordem de id_livro, evitando deadlock entre
+    dois lotes com livros em comum.
+    """
+    if not ids_exemplares:
+        return
+    cursor.execute(
+        """
+        INSERT INTO livro_disponibilidade (id_livro, total_exemplares, qtd_emprestados)
+        SELECT id_livro, COUNT(*) * %s, COUNT(*) * %s
+        FROM Exemplar WHERE id_exemplar = ANY(%s)
+        GROUP BY id_livro
+        ORDER BY id_livro
+        ON CONFLICT (id_livro) DO UPDATE
+        SET total_exemplares = livro_disponibilidade.total_exemplares + EXCLUDED.total_exemplares,
+            qtd_emprestados = livro_disponibilidade.qtd_emprestados + EXCLUDED.qtd_emprestados
+        """,
+        [total, emprestados, list(ids_exemplares)]
+    )
+
+
+def recalcular_disponibilidade(cursor, ids_livros=None):
+    """
+    Recalcula os contadores a partir das tabelas Exemplar e Emprestimo.
+    Sem `ids_livros`, reconstrói a tabela inteira.
+    """
+    filtro_contadores = ""
+    filtro_livros = ""
+    params = []
+    if ids_livros is not None:
+        filtro_contadores = "WHERE id_livro = ANY(%s)"
+        filtro_livros = "WHERE l.id_livro = ANY(%s)"
+        params = [list(ids_livros)]
+
+    cursor.execute(f"DELETE FROM livro_disponibilidade {filtro_contadores}", params)
+    cursor.execute(
+        f"""
+        INSERT INTO livro_disponibilidade (id_livro, total_exemplares, qtd_emprestados)
+        SELECT
+            l.id_livro,
+            COUNT(DISTINCT e.id_exemplar),
+            COUNT(emp.id_emprestimo)
+        FROM Livro l
+        LEFT JOIN Exemplar e ON e.id_livro = l.id_livro
+        LEFT JOIN Emprestimo emp ON emp.id_exemplar = e.id_exemplar AND emp.status = 'Em Andamento'
+        {filtro_livros}
+        GROUP BY l.id_livro
+        """,
+        params
+    )
+    return cursor.rowcount
@@ -1,8 +1,12 @@
 from django import forms
 from django.db import connection
+from gestao_biblioteca.cache_escolhas import escolhas_em_cache
 
 def get_autores_choices():
-    """Busca todos os autores no banco para usar como opções no formulário."""
+    """Busca todos os autores no banco para usar como opções no formulário (com cache por versão)."""
+    return escolhas_em_cache('autores', ['Autor'], _buscar_autores_choices)
+
+def _buscar_autores_choices():
     with connection.cursor() as cursor:
         cursor.execute("SELECT id_autor, nome FROM Autor ORDER BY nome")
         # Formata como uma lista de tuplas: [(id, nome), (id, nome), ...]
@@ -60,4 +64,30 @@ class LivroForm(forms.Form):
         """Sobrescreve o __init__ para preencher as 'choices' de autores."""
         super().__init__(*args, **kwargs)
         # Preenche o campo 'autores' com os dados buscados do banco
-        self.fields['autores'].choices = get_autores_choices()
\ No newline at end of file
+        self.fields['autores'].choices = get_autores_choices()
+
+class ImportacaoCatalogoForm(forms.Form):
+    """Upload da planilha de importação em massa (livros/importacao.py)."""
+    arquivo = forms.FileField(
+        label='Arquivo (.csv ou .json)',
+        required=True,
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control-file', 'accept': '.csv,.json'})
+    )
+    estrito = forms.BooleanField(
+        label='Cancelar tudo se alguma linha tiver erro',
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    simular = forms.BooleanField(
+        label='Apenas simular (validar sem gravar)',
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        extensao = arquivo.name.rsplit('.', 1)[-1].lower()
+        if extensao not in ('csv', 'json'):
+            raise forms.ValidationError('Envie um arquivo .csv ou .json.')
+        self.formato = extensao
+        return arquivo
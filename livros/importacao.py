@@ -0,0 +1,462 @@
+"""
+Importação em massa do catálogo (Livro, Autor, autor_livro e Exemplar).
+
+Entrada: CSV (';' ou ',') ou JSON (lista de objetos), uma linha por obra
+ou por exemplar. Colunas:
+
+    isbn*, nome (título; obrigatório para obras novas), genero, status,
+    autores (nomes separados por '|'; no JSON também pode ser uma lista),
+    exemplares (quantos criar, numerados depois do maior patrimônio),
+    patrimonio (cria exatamente este exemplar), localizacao, edicao,
+    dt_aquisicao, dt_publicacao (dd/mm/aaaa ou aaaa-mm-dd)
+
+Etapas, todas numa única transação:
+
+1. cada linha é validada em Python e as válidas vão para uma tabela
+   temporária via COPY (nada de um INSERT por linha);
+2. conflitos que dependem do banco (patrimônio repetido, obra nova sem
+   título) são apontados por linha e descartados;
+3. autores são resolvidos pelo nome normalizado (sem acento, caixa e
+   espaços extras) e os que faltam são criados;
+4. livros são atualizados/criados pelo ISBN, autor_livro é ligado e os
+   exemplares criados, cada etapa com um único comando SQL;
+5. disponibilidade, índice de busca e contadores do painel são acertados
+   só para os livros tocados.
+
+Linhas com erro não interrompem a importação (a menos que `estrito`) e
+voltam no relatório com o número da linha no arquivo.
+"""
+import csv
+import io
+import json
+import re
+from datetime import datetime
+
+from django.db import transaction
+
+from gestao_biblioteca.cache_escolhas import invalidar_tabelas
+from gestao_biblioteca.estatisticas import ajustar_contador
+
+from .busca import atualizar_indice_busca
+from .disponibilidade import recalcular_disponibilidade
+
+STATUS_VALIDOS = {'Disponível', 'Emprestado', 'Manutenção', 'Descartado'}
+
+# Cabeçalhos aceitos -> nome interno
+ALIASES = {
+    'titulo': 'nome', 'título': 'nome', 'obra': 'nome',
+    'gênero': 'genero', 'categoria': 'genero',
+    'autor': 'autores',
+    'quantidade': 'exemplares', 'qtde_exemplares': 'exemplares',
+    'patrimônio': 'patrimonio', 'numero_patrimonio': 'patrimonio',
+    'localização': 'localizacao', 'edição': 'edicao',
+}
+
+COLUNAS_STAGING = [
+    'linha', 'isbn', 'nome', 'genero', 'status', 'autores', 'exemplares',
+    'patrimonio', 'localizacao', 'edicao', 'dt_aquisicao', 'dt_publicacao',
+]
+
+# Mesma normalização dos dois lados (arquivo e tabela Autor)
+NORMALIZAR_NOME = "lower(unaccent(regexp_replace(btrim({}), '\\s+', ' ', 'g')))"
+
+
+class ErroImportacao(ValueError):
+    """Arquivo ilegível (formato, codificação, cabeçalho)."""
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.linhas = 0
+        self.livros_criados = 0
+        self.livros_atualizados = 0
+        self.autores_criados = 0
+        self.vinculos_criados = 0
+        self.exemplares_criados = 0
+        self.erros = []  # [(linha, mensagem)]
+        self.simulado = False
+
+    @property
+    def linhas_importadas(self):
+        return self.linhas - len({linha for linha, _msg in self.erros})
+
+    def resumo(self):
+        return (
+            f'{self.linhas_importadas} de {self.linhas} linha(s) importada(s): '
+            f'{self.livros_criados} livro(s) novo(s), {self.livros_atualizados} atualizado(s), '
+            f'{self.autores_criados} autor(es) novo(s), {self.exemplares_criados} exemplar(es).'
+        )
+
+
+# --- Leitura e validação (Python) ---
+
+def _cabecalho(nome):
+    nome = (nome or '').strip().lower()
+    return ALIASES.get(nome, nome)
+
+
+def ler_registros(arquivo, formato):
+    """
+    (número da linha, dict) de um arquivo binário. No CSV o número é a linha
+    do arquivo (cabeçalho = 1); no JSON, a posição na lista (a partir de 1).
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    try:
+        if formato == 'json':
+            dados = json.load(texto)
+            if not isinstance(dados, list):
+                raise ErroImportacao('O JSON deve ser uma lista de objetos.')
+            for posicao, item in enumerate(dados, start=1):
+                if not isinstance(item, dict):
+                    item = {}
+                yield posicao, {_cabecalho(chave): valor for chave, valor in item.items()}
+            return
+
+        primeira = texto.readline()
+        delimitador = ';' if primeira.count(';') >= primeira.count(',') else ','
+        leitor = csv.reader(io.StringIO(primeira), delimiter=delimitador)
+        colunas = [_cabecalho(nome) for nome in next(leitor, [])]
+        if 'isbn' not in colunas:
+            raise ErroImportacao("Cabeçalho sem a coluna 'isbn'.")
+        for numero, valores in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+            if any(valor.strip() for valor in valores):
+                yield numero, dict(zip(colunas, valores))
+    except UnicodeDecodeError:
+        raise ErroImportacao('O arquivo deve estar em UTF-8.')
+    except json.JSONDecodeError as e:
+        raise ErroImportacao(f'JSON inválido: {e}')
+    finally:
+        texto.detach()
+
+
+def _texto(valor, tamanho):
+    if valor is None:
+        return None
+    valor = re.sub(r'\s+', ' ', str(valor)).strip()
+    if len(valor) > tamanho:
+        raise ValueError(f"texto com mais de {tamanho} caracteres: '{valor[:30]}...'")
+    return valor or None
+
+
+def _inteiro(valor, campo):
+    if valor is None or str(valor).strip() == '':
+        return None
+    try:
+        numero = int(str(valor).strip())
+    except ValueError:
+        raise ValueError(f"{campo} inválido: '{valor}'")
+    if numero < 0:
+        raise ValueError(f'{campo} não pode ser negativo')
+    return numero
+
+
+def _data(valor, campo):
+    if valor is None or str(valor).strip() == '':
+        return None
+    valor = str(valor).strip()
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"{campo} inválida: '{valor}' (use dd/mm/aaaa)")
+
+
+def _autores(valor):
+    if not valor:
+        return None
+    nomes = valor if isinstance(valor, list) else str(valor).split('|')
+    # Autor.nome é VARCHAR(150): mais que isso derrubaria o merge inteiro
+    nomes = [_texto(nome, 150) for nome in nomes]
+    return '|'.join(nome for nome in nomes if nome) or None
+
+
+def validar_registro(linha, registro):
+    """Tupla na ordem de COLUNAS_STAGING, ou ValueError com a mensagem."""
+    isbn = re.sub(r'[\s-]', '', str(registro.get('isbn') or ''))
+    if not re.fullmatch(r'\d{9}[\dXx]|\d{13}', isbn):
+        raise ValueError(f"ISBN inválido: '{registro.get('isbn') or ''}'")
+
+    status = _texto(registro.get('status'), 50)
+    if status and status not in STATUS_VALIDOS:
+        raise ValueError(f"status inválido: '{status}'")
+
+    patrimonio = _inteiro(registro.get('patrimonio'), 'patrimônio')
+    exemplares = _inteiro(registro.get('exemplares'), 'quantidade de exemplares') or 0
+    if patrimonio is not None:
+        exemplares = 1
+
+    return (
+        linha,
+        isbn.upper(),
+        _texto(registro.get('nome'), 200),
+        _texto(registro.get('genero'), 100),
+        status,
+        _autores(registro.get('autores')),
+        exemplares,
+        patrimonio,
+        _texto(registro.get('localizacao'), 500) or '',
+        _texto(registro.get('edicao'), 300) or '',
+        _data(registro.get('dt_aquisicao'), 'data de aquisição'),
+        _data(registro.get('dt_publicacao'), 'data de publicação'),
+    )
+
+
+# --- Carga (SQL) ---
+
+def _criar_staging(cursor):
+    cursor.execute(
+        """
+        CREATE TEMP TABLE importacao_livro (
+            linha INTEGER PRIMARY KEY,
+            isbn TEXT NOT NULL,
+            nome TEXT,
+            genero TEXT,
+            status TEXT,
+            autores TEXT,
+            exemplares INTEGER NOT NULL,
+            patrimonio INTEGER,
+            localizacao TEXT NOT NULL,
+            edicao TEXT NOT NULL,
+            dt_aquisicao DATE,
+            dt_publicacao DATE,
+            id_livro INTEGER
+        ) ON COMMIT DROP
+        """
+    )
+
+
+def _copiar(cursor, registros, resultado):
+    """Valida e envia as linhas para a tabela temporária com COPY."""
+    comando = f"COPY importacao_livro ({', '.join(COLUNAS_STAGING)}) FROM STDIN"
+    # cursor.cursor: cursor do psycopg por baixo do wrapper do Django
+    with cursor.cursor.copy(comando) as copia:
+        for linha, registro in registros:
+            resultado.linhas += 1
+            try:
+                copia.write_row(validar_registro(linha, registro))
+            except ValueError as e:
+                resultado.erros.append((linha, str(e)))
+
+
+def _descartar_linhas(cursor, resultado, sql):
+    """Executa a consulta de conflitos (linha, mensagem) e tira essas linhas da staging."""
+    cursor.execute(sql)
+    conflitos = cursor.fetchall()
+    if conflitos:
+        resultado.erros.extend(conflitos)
+        cursor.execute(
+            "DELETE FROM importacao_livro WHERE linha = ANY(%s)",
+            [[linha for linha, _msg in conflitos]]
+        )
+
+
+def _descartar_conflitos(cursor, resultado):
+    """Erros que só o banco enxerga; as linhas envolvidas saem da staging."""
+    _descartar_linhas(
+        cursor, resultado,
+        """
+        SELECT linha, 'patrimônio ' || patrimonio || ' repetido no arquivo'
+        FROM (
+            SELECT linha, patrimonio, COUNT(*) OVER (PARTITION BY patrimonio) AS vezes
+            FROM importacao_livro WHERE patrimonio IS NOT NULL
+        ) AS p
+        WHERE vezes > 1
+        UNION ALL
+        SELECT i.linha, 'patrimônio ' || i.patrimonio || ' já cadastrado'
+        FROM importacao_livro i
+        WHERE EXISTS (SELECT 1 FROM Exemplar e WHERE e.numero_patrimonio = i.patrimonio)
+        """
+    )
+    # Só depois de descartar os patrimônios: o título de uma obra nova pode
+    # estar justamente numa linha que acabou de sair
+    _descartar_linhas(
+        cursor, resultado,
+        """
+        SELECT i.linha, 'obra nova (ISBN ' || i.isbn || ') sem título'
+        FROM importacao_livro i
+        WHERE NOT EXISTS (SELECT 1 FROM Livro l WHERE l.isbn = i.isbn)
+          AND NOT EXISTS (
+              SELECT 1 FROM importacao_livro t WHERE t.isbn = i.isbn AND t.nome IS NOT NULL
+          )
+        """
+    )
+
+
+def _resolver_autores(cursor, resultado):
+    """Tabela importacao_autor (isbn, id_autor), criando os autores que faltam."""
+    normalizado = NORMALIZAR_NOME.format('nome')
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE importacao_autor ON COMMIT DROP AS
+        SELECT DISTINCT ON (isbn, chave) isbn, chave, nome, NULL::INTEGER AS id_autor
+        FROM (
+            SELECT isbn, linha, nome, {normalizado} AS chave
+            FROM importacao_livro, unnest(string_to_array(autores, '|')) AS nome
+        ) AS a
+        ORDER BY isbn, chave, linha
+        """
+    )
+    cursor.execute(
+        f"""
+        UPDATE importacao_autor i SET id_autor = a.id_autor
+        FROM (
+            SELECT DISTINCT ON (chave) chave, id_autor
+            FROM (SELECT id_autor, {normalizado} AS chave FROM Autor) AS existentes
+            ORDER BY chave, id_autor
+        ) AS a
+        WHERE a.chave = i.chave
+        """
+    )
+    cursor.execute(
+        """
+        WITH novos AS (
+            INSERT INTO Autor (nome, nacionalidade, biografia)
+            SELECT DISTINCT ON (chave) nome, '', ''
+            FROM importacao_autor WHERE id_autor IS NULL
+            ORDER BY chave, nome
+            RETURNING id_autor, nome
+        )
+        SELECT id_autor, nome FROM novos
+        """
+    )
+    novos = cursor.fetchall()
+    resultado.autores_criados = len(novos)
+    if novos:
+        cursor.execute(
+            f"""
+            UPDATE importacao_autor i SET id_autor = n.id_autor
+            FROM unnest(%s::INTEGER[], %s::TEXT[]) AS n(id_autor, nome)
+            WHERE i.id_autor IS NULL AND i.chave = {NORMALIZAR_NOME.format('n.nome')}
+            """,
+            [[id_autor for id_autor, _nome in novos], [nome for _id, nome in novos]]
+        )
+
+
+def _gravar_livros(cursor, resultado):
+    """Upsert por ISBN; os dados da obra vêm da primeira linha de cada ISBN."""
+    cursor.execute(
+        """
+        CREATE TEMP TABLE importacao_obra ON COMMIT DROP AS
+        SELECT
+            isbn,
+            (array_agg(nome ORDER BY linha) FILTER (WHERE nome IS NOT NULL))[1] AS nome,
+            (array_agg(genero ORDER BY linha) FILTER (WHERE genero IS NOT NULL))[1] AS genero,
+            (array_agg(status ORDER BY linha) FILTER (WHERE status IS NOT NULL))[1] AS status,
+            SUM(exemplares) AS exemplares
+        FROM importacao_livro
+        GROUP BY isbn
+        """
+    )
+    cursor.execute(
+        """
+        UPDATE Livro l SET
+            nome = COALESCE(o.nome, l.nome),
+            genero = COALESCE(o.genero, l.genero),
+            status = COALESCE(o.status, l.status),
+            qtde_exemplares = l.qtde_exemplares + o.exemplares
+        FROM importacao_obra o
+        WHERE l.isbn = o.isbn
+        """
+    )
+    resultado.livros_atualizados = cursor.rowcount
+    cursor.execute(
+        """
+        INSERT INTO Livro (nome, genero, isbn, qtde_exemplares, status)
+        SELECT o.nome, COALESCE(o.genero, ''), o.isbn, o.exemplares, COALESCE(o.status, 'Disponível')
+        FROM importacao_obra o
+        WHERE NOT EXISTS (SELECT 1 FROM Livro l WHERE l.isbn = o.isbn)
+        """
+    )
+    resultado.livros_criados = cursor.rowcount
+    cursor.execute(
+        """
+        UPDATE importacao_livro i SET id_livro = l.id_livro
+        FROM (SELECT isbn, MIN(id_livro) AS id_livro FROM Livro GROUP BY isbn) AS l
+        WHERE l.isbn = i.isbn
+        """
+    )
+
+
+def _vincular_autores(cursor, resultado):
+    cursor.execute(
+        """
+        INSERT INTO autor_livro (id_livro, id_autor)
+        SELECT DISTINCT l.id_livro, a.id_autor
+        FROM importacao_autor a
+        JOIN (SELECT DISTINCT isbn, id_livro FROM importacao_livro) AS l ON l.isbn = a.isbn
+        WHERE NOT EXISTS (
+            SELECT 1 FROM autor_livro al WHERE al.id_livro = l.id_livro AND al.id_autor = a.id_autor
+        )
+        """
+    )
+    resultado.vinculos_criados = cursor.rowcount
+
+
+def _criar_exemplares(cursor, resultado):
+    """Patrimônios informados são usados; os demais continuam a numeração."""
+    cursor.execute(
+        """
+        INSERT INTO Exemplar (id_livro, numero_patrimonio, localizacao, dt_aquisicao, dt_publicacao, edicao)
+        SELECT
+            i.id_livro,
+            COALESCE(
+                i.patrimonio,
+                base.maior + row_number() OVER (PARTITION BY i.patrimonio IS NULL ORDER BY i.linha, n)
+            ),
+            i.localizacao, i.dt_aquisicao, i.dt_publicacao, i.edicao
+        FROM importacao_livro i
+        CROSS JOIN generate_series(1, i.exemplares) AS n
+        CROSS JOIN (
+            SELECT GREATEST(
+                (SELECT COALESCE(MAX(numero_patrimonio), 0) FROM Exemplar),
+                (SELECT COALESCE(MAX(patrimonio), 0) FROM importacao_livro)
+            ) AS maior
+        ) AS base
+        """
+    )
+    resultado.exemplares_criados = cursor.rowcount
+
+
+def importar_catalogo(cursor, registros, estrito=False, simular=False):
+    """
+    Importa `registros` ((linha, dict), ver ler_registros) numa transação.
+
+    estrito: qualquer linha com erro cancela a importação inteira;
+    simular: valida e executa tudo, mas desfaz no final (prévia).
+    """
+    resultado = ResultadoImportacao()
+    resultado.simulado = simular
+
+    with transaction.atomic():
+        # Uma importação por vez: a numeração de patrimônio e o upsert por
+        # ISBN assumem que ninguém mais está importando ao mesmo tempo
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('importacao_catalogo'))")
+
+        _criar_staging(cursor)
+        _copiar(cursor, registros, resultado)
+        _descartar_conflitos(cursor, resultado)
+        resultado.erros.sort()
+
+        if resultado.erros and estrito:
+            transaction.set_rollback(True)
+            return resultado
+
+        _resolver_autores(cursor, resultado)
+        _gravar_livros(cursor, resultado)
+        _vincular_autores(cursor, resultado)
+        _criar_exemplares(cursor, resultado)
+
+        cursor.execute("SELECT DISTINCT id_livro FROM importacao_livro")
+        ids_livros = [row[0] for row in cursor.fetchall()]
+        recalcular_disponibilidade(cursor, ids_livros)
+        atualizar_indice_busca(cursor, ids_livros)
+        ajustar_contador(cursor, 'livros', resultado.livros_criados)
+        ajustar_contador(cursor, 'exemplares', resultado.exemplares_criados)
+
+        if simular:
+            transaction.set_rollback(True)
+        else:
+            invalidar_tabelas('Livro', 'Autor')
+
+    return resultado
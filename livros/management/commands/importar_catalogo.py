@@ -0,0 +1,51 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from livros.importacao import ErroImportacao, importar_catalogo, ler_registros
+
+
+class Command(BaseCommand):
+    help = 'Importa livros, autores e exemplares de um CSV ou JSON (ver livros/importacao.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo .csv ou .json')
+        parser.add_argument('--formato', choices=['csv', 'json'],
+                            help='Padrão: pela extensão do arquivo')
+        parser.add_argument('--estrito', action='store_true',
+                            help='Cancela tudo se alguma linha tiver erro')
+        parser.add_argument('--simular', action='store_true',
+                            help='Valida e mostra o resultado sem gravar')
+        parser.add_argument('--erros', metavar='ARQUIVO',
+                            help='Grava o relatório de erros (linha;erro) neste CSV')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or os.path.splitext(options['arquivo'])[1].lstrip('.').lower()
+        if formato not in ('csv', 'json'):
+            raise CommandError('Informe --formato csv ou json.')
+
+        try:
+            with open(options['arquivo'], 'rb') as arquivo, connection.cursor() as cursor:
+                resultado = importar_catalogo(
+                    cursor, ler_registros(arquivo, formato),
+                    estrito=options['estrito'], simular=options['simular'],
+                )
+        except (OSError, ErroImportacao) as e:
+            raise CommandError(str(e))
+
+        if options['erros']:
+            with open(options['erros'], 'w', newline='', encoding='utf-8') as saida:
+                escritor = csv.writer(saida, delimiter=';')
+                escritor.writerow(['linha', 'erro'])
+                escritor.writerows(resultado.erros)
+        else:
+            for linha, mensagem in resultado.erros:
+                self.stdout.write(self.style.WARNING(f'Linha {linha}: {mensagem}'))
+
+        if resultado.erros and options['estrito']:
+            raise CommandError(f'{len(resultado.erros)} erro(s); nada foi importado (--estrito).')
+
+        prefixo = '[simulação, nada gravado] ' if resultado.simulado else ''
+        self.stdout.write(self.style.SUCCESS(prefixo + resultado.resumo()))
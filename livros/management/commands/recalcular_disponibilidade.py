@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from livros.disponibilidade import recalcular_disponibilidade
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero os contadores de disponibilidade (livro_disponibilidade).'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                total = recalcular_disponibilidade(cursor)
+
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados para {total} livro(s).'))
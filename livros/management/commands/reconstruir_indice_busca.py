@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from livros.busca import atualizar_indice_busca
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero o índice de busca do catálogo (livro_busca).'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                total = atualizar_indice_busca(cursor)
+
+        self.stdout.write(self.style.SUCCESS(f'Índice de busca reconstruído para {total} livro(s).'))
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        # Contadores desnormalizados de disponibilidade (um registro por Livro).
+        # Após aplicar, popule com: python manage.py recalcular_disponibilidade
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS livro_disponibilidade (
+                    id_livro INTEGER PRIMARY KEY,
+                    total_exemplares INTEGER NOT NULL DEFAULT 0,
+                    qtd_emprestados INTEGER NOT NULL DEFAULT 0,
+                    exemplares_disponiveis INTEGER GENERATED ALWAYS AS (
+                        GREATEST(total_exemplares - qtd_emprestados, 0)
+                    ) STORED
+                );
+            """,
+            reverse_sql="DROP TABLE IF EXISTS livro_disponibilidade;",
+        ),
+    ]
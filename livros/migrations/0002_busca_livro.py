@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0001_disponibilidade_livro'),
+    ]
+
+    operations = [
+        # Documento de busca por livro (full-text + trigramas, sem acentos).
+        # Após aplicar, popule com: python manage.py reconstruir_indice_busca
+        migrations.RunSQL(
+            sql="""
+                CREATE EXTENSION IF NOT EXISTS unaccent;
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+                CREATE TABLE IF NOT EXISTS livro_busca (
+                    id_livro INTEGER PRIMARY KEY,
+                    documento TEXT NOT NULL DEFAULT '',
+                    vetor TSVECTOR NOT NULL
+                );
+
+                CREATE INDEX IF NOT EXISTS livro_busca_vetor_idx
+                    ON livro_busca USING GIN (vetor);
+                CREATE INDEX IF NOT EXISTS livro_busca_documento_trgm_idx
+                    ON livro_busca USING GIN (documento gin_trgm_ops);
+            """,
+            reverse_sql="DROP TABLE IF EXISTS livro_busca;",
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0001_esquema_base'),
+        ('livros', '0002_busca_livro'),
+    ]
+
+    operations = [
+        # Upsert por ISBN e checagem de patrimônio da importação em massa
+        # (livros/importacao.py)
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX IF NOT EXISTS livro_isbn_idx ON Livro (isbn);
+                CREATE INDEX IF NOT EXISTS exemplar_patrimonio_idx ON Exemplar (numero_patrimonio);
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS livro_isbn_idx;
+                DROP INDEX IF EXISTS exemplar_patrimonio_idx;
+            """,
+        ),
+    ]
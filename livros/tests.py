@@ -1,3 +1,38 @@
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from gestao_biblioteca.dados_sinteticos import gerar_biblioteca
+
+from .importacao import importar_catalogo
+
+
+class ImportacaoCatalogoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            gerar_biblioteca(cursor, livros=5, autores=3, leitores=5, anos=1)
+            cursor.execute("SELECT MIN(numero_patrimonio) FROM Exemplar")
+            cls.patrimonio_existente = cursor.fetchone()[0]
+
+    def test_titulo_em_linha_descartada_nao_vale_para_obra_nova(self):
+        # A linha 2 traz o título da obra nova, mas cai pelo patrimônio; a
+        # linha 3 fica sem título e tem de voltar no relatório, em vez de
+        # derrubar a importação no NOT NULL de Livro.nome
+        registros = [
+            (2, {'isbn': '9990000000017', 'nome': 'Obra Nova', 'patrimonio': str(self.patrimonio_existente)}),
+            (3, {'isbn': '9990000000017', 'exemplares': '2'}),
+        ]
+        with connection.cursor() as cursor:
+            resultado = importar_catalogo(cursor, registros)
+
+            self.assertEqual(
+                resultado.erros,
+                [
+                    (2, f'patrimônio {self.patrimonio_existente} já cadastrado'),
+                    (3, 'obra nova (ISBN 9990000000017) sem título'),
+                ],
+            )
+            self.assertEqual(resultado.livros_criados, 0)
+            cursor.execute("SELECT COUNT(*) FROM Livro WHERE isbn = '9990000000017'")
+            self.assertEqual(cursor.fetchone()[0], 0)
@@ -16,4 +16,7 @@ urlpatterns = [
     
     # (DELETE) /livros/excluir/5/
     path('excluir/<int:pk>/', views.excluir_livro_view, name='excluir_livro'),
+
+    # Importação em massa (CSV/JSON) /livros/importar/
+    path('importar/', views.importar_livros_view, name='importar_livros'),
 ]
@@ -1,7 +1,15 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.db import connection, IntegrityError
-from .forms import LivroForm
+from django.db import connection, IntegrityError, transaction
+from .forms import ImportacaoCatalogoForm, LivroForm
+from .disponibilidade import criar_disponibilidade, remover_disponibilidade
+from gestao_biblioteca.estatisticas import ajustar_contador
+from .busca import atualizar_indice_busca, condicao_busca, relevancia_busca, remover_indice_busca
+from .importacao import ErroImportacao, importar_catalogo, ler_registros
+from gestao_biblioteca.hidratacao import hidratar, hidratar_autores
+from gestao_biblioteca.paginacao import paginar
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
+from gestao_biblioteca.cache_escolhas import invalidar_tabelas
 
 # --- Helper Function ---
 def dictfetchall(cursor):
@@ -18,7 +26,7 @@ def cadastrar_livro_view(request):
         if form.is_valid():
             dados = form.cleaned_data
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     # 1. Insere o livro
                     cursor.execute(
                         """
@@ -40,7 +48,13 @@ def cadastrar_livro_view(request):
                             """,
                             [id_livro_novo, id_autor_loop]
                         )
+
+                    # 3. Cria os contadores de disponibilidade (zerados) e o documento de busca
+                    criar_disponibilidade(cursor, id_livro_novo)
+                    ajustar_contador(cursor, 'livros', 1)
+                    atualizar_indice_busca(cursor, [id_livro_novo])
                         
+                invalidar_tabelas('Livro')
                 messages.success(request, 'Livro cadastrado com sucesso!')
                 return redirect('livros:livro_list')
             except Exception as e:
@@ -52,68 +66,43 @@ def cadastrar_livro_view(request):
 
 
 # READ (Consultar Livros)
+@leitura_na_replica
 def consultar_livros_view(request):
     query = request.GET.get('q', '')
     
-    with connection.cursor() as cursor:
+    with conexao_leitura().cursor() as cursor:
         # 1. Busca os livros (Tabela principal apenas)
         sql = "SELECT id_livro AS pk, nome, isbn, genero, status FROM Livro"
         params = []
         
         if query:
-            # Filtro simples na tabela Livro
-            sql += " WHERE nome ILIKE %s OR isbn ILIKE %s"
-            params.extend([f'%{query}%', f'%{query}%'])
-        
-        sql += " ORDER BY nome"
-        
-        cursor.execute(sql, params)
-        livros = dictfetchall(cursor)
+            # Busca no índice textual (título, ISBN, gênero e autores, sem acentos),
+            # paginada por relevância (pk desempata)
+            relevancia, params_relevancia = relevancia_busca(query, 'Livro.id_livro')
+            filtro, params_filtro = condicao_busca(query)
+            sql = f"""
+                SELECT id_livro AS pk, nome, isbn, genero, status, {relevancia} AS relevancia
+                FROM Livro
+                WHERE id_livro IN ({filtro})
+            """
+            params = params_relevancia + params_filtro
+            pagina = paginar(request, cursor, sql, params, ['relevancia', 'pk'], decrescente=True)
+        else:
+            # Paginação por chave: ordena por nome (pk desempata)
+            pagina = paginar(request, cursor, sql, params, ['nome', 'pk'])
+        livros = pagina.itens
+
+        # 2. Dados relacionados em lote (SEM JOIN e sem uma query por livro):
+        # disponibilidade vem dos contadores mantidos pelas escritas
+        hidratar(request, cursor, livros, {'pk': 'livro_disponibilidade'})
+        hidratar_autores(request, cursor, livros, campo='pk')
 
-        # 2. Loop para buscar dados relacionados (O "JOIN manual" via Python)
         for livro in livros:
-            livro_id = livro['pk']
-
-            # A) Conta total de exemplares físicos
-            cursor.execute("SELECT COUNT(*) FROM Exemplar WHERE id_livro = %s", [livro_id])
-            total_fisico = cursor.fetchone()[0]
-            livro['total_fisico'] = total_fisico
-
-            # B) Conta quantos estão emprestados 
-            # (Precisamos saber quais exemplares deste livro estão em emprestimos ativos)
-            # Fazemos sub-query ou filtro direto
-            cursor.execute(
-                """
-                SELECT COUNT(*) 
-                FROM Emprestimo 
-                WHERE status = 'Em Andamento' 
-                AND id_exemplar IN (SELECT id_exemplar FROM Exemplar WHERE id_livro = %s)
-                """, 
-                [livro_id]
-            )
-            total_emprestado = cursor.fetchone()[0]
-            
-            # C) Calcula disponibilidade
-            livro['disponiveis'] = total_fisico - total_emprestado
-
-            # D) Busca os Autores (Sem JOIN)
-            # Primeiro: pega os IDs dos autores na tabela de ligação
-            cursor.execute("SELECT id_autor FROM autor_livro WHERE id_livro = %s", [livro_id])
-            rows_autores = cursor.fetchall()
-            ids_autores = [r[0] for r in rows_autores]
-            
-            autores_list = []
-            if ids_autores:
-                # Segundo: para cada ID, busca o nome na tabela Autor
-                # (Poderíamos usar IN, mas um loop simples também resolve se quiser evitar SQL complexo)
-                # Vamos usar IN para ser um pouco mais otimizado, mas sem JOIN
-                placeholders = ','.join(['%s'] * len(ids_autores))
-                cursor.execute(f"SELECT nome FROM Autor WHERE id_autor IN ({placeholders})", ids_autores)
-                autores_list = dictfetchall(cursor)
-            
-            livro['autores_list'] = autores_list
+            contadores = livro['livro_disponibilidade'] or {}
+            livro['total_fisico'] = contadores.get('total_exemplares', 0)
+            livro['disponiveis'] = contadores.get('exemplares_disponiveis', 0)
 
-    return render(request, 'livro/consultar_livro.html', {'livros': livros})
+    return render(request, 'livro/consultar_livro.html', {'livros': livros, 'pagina': pagina})
 
 
 # UPDATE (Atualizar Livro)
@@ -141,7 +130,7 @@ def atualizar_livro_view(request, pk):
         if form.is_valid():
             dados = form.cleaned_data
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     # 1. Atualiza Livro
                     cursor.execute(
                         """
@@ -161,7 +150,11 @@ def atualizar_livro_view(request, pk):
                             "INSERT INTO autor_livro (id_livro, id_autor) VALUES (%s, %s)",
                             [pk, id_autor_loop]
                         )
+
+                    # 3. Atualiza o documento de busca (título, autores...)
+                    atualizar_indice_busca(cursor, [pk])
                         
+                invalidar_tabelas('Livro')
                 messages.success(request, 'Livro atualizado com sucesso!')
                 return redirect('livros:livro_list')
             except Exception as e:
@@ -190,7 +183,7 @@ def excluir_livro_view(request, pk):
 
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 # 2. LIMPEZA MANUAL DA TABELA ASSOCIATIVA (N:M)
                 # Como Livro tem relação N:M com Autor, precisamos deletar 
                 # o vínculo na tabela 'autor_livro' ANTES de deletar o livro.
@@ -199,7 +192,12 @@ def excluir_livro_view(request, pk):
                 # 3. EXCLUSÃO DA ENTIDADE PRINCIPAL
                 # Agora que a tabela de ligação está limpa, podemos apagar o livro.
                 cursor.execute("DELETE FROM Livro WHERE id_livro = %s", [pk])
+                if cursor.rowcount:
+                    ajustar_contador(cursor, 'livros', -1)
+                remover_disponibilidade(cursor, pk)
+                remover_indice_busca(cursor, pk)
             
+            invalidar_tabelas('Livro')
             messages.success(request, f'Obra "{livro[0]}" excluída com sucesso.')
             return redirect('livros:livro_list')
             
@@ -214,4 +212,40 @@ def excluir_livro_view(request, pk):
             messages.error(request, f'Ocorreu um erro ao excluir: {e}')
             return redirect('livros:livro_list')
 
-    return render(request, 'livro/excluir_livro.html', {'livro': {'nome': livro[0]}})
\ No newline at end of file
+    return render(request, 'livro/excluir_livro.html', {'livro': {'nome': livro[0]}})
+
+# --- IMPORTAÇÃO EM MASSA ---
+
+# Erros exibidos na tela (o comando importar_catalogo grava todos em arquivo)
+LIMITE_ERROS_EXIBIDOS = 500
+
+def importar_livros_view(request):
+    resultado = None
+    if request.method == 'POST':
+        form = ImportacaoCatalogoForm(request.POST, request.FILES)
+        if form.is_valid():
+            dados = form.cleaned_data
+            try:
+                with connection.cursor() as cursor:
+                    resultado = importar_catalogo(
+                        cursor, ler_registros(dados['arquivo'], form.formato),
+                        estrito=dados['estrito'], simular=dados['simular'],
+                    )
+                if resultado.erros and dados['estrito']:
+                    messages.error(request, f'{len(resultado.erros)} linha(s) com erro: nada foi importado.')
+                elif resultado.simulado:
+                    messages.info(request, 'Simulação (nada gravado): ' + resultado.resumo())
+                else:
+                    messages.success(request, resultado.resumo())
+            except ErroImportacao as e:
+                messages.error(request, f'Não foi possível ler o arquivo: {e}')
+            except Exception as e:
+                messages.error(request, f'Ocorreu um erro na importação: {e}')
+    else:
+        form = ImportacaoCatalogoForm()
+
+    contexto = {'form': form, 'resultado': resultado}
+    if resultado:
+        contexto['erros'] = resultado.erros[:LIMITE_ERROS_EXIBIDOS]
+        contexto['erros_ocultos'] = max(0, len(resultado.erros) - LIMITE_ERROS_EXIBIDOS)
+    return render(request, 'livro/importar_livros.html', contexto)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from relatorios.snapshots import SNAPSHOTS, atualizar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Atualiza (REFRESH CONCURRENTLY) os snapshots dos relatórios. '
+        'Feito para rodar agendado, ex.: */15 * * * * python manage.py atualizar_relatorios'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'relatorios', nargs='*',
+            help=f"Relatórios a atualizar (padrão: todos). Opções: {', '.join(SNAPSHOTS)}",
+        )
+
+    def handle(self, *args, **options):
+        invalidos = set(options['relatorios']) - set(SNAPSHOTS)
+        if invalidos:
+            raise CommandError(f"Relatório(s) desconhecido(s): {', '.join(sorted(invalidos))}")
+
+        with connection.cursor() as cursor:
+            resultado = atualizar_snapshots(cursor, options['relatorios'])
+
+        for relatorio, atualizado in resultado.items():
+            if atualizado:
+                self.stdout.write(self.style.SUCCESS(f'{relatorio}: snapshot atualizado.'))
+            else:
+                self.stdout.write(self.style.WARNING(f'{relatorio}: já estava sendo atualizado, ignorado.'))
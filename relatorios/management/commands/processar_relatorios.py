@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from relatorios.tarefas import (
+    devolver_para_fila, executar_tarefa, iniciar_processo, limpar_vencidas, reservar_proxima,
+)
+
+# Limpeza das tarefas vencidas, no máximo uma vez por este intervalo (s)
+INTERVALO_LIMPEZA = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker dos relatórios em segundo plano: reserva as tarefas da fila (relatorio_tarefa) e gera '
+        'os arquivos num pool de processos. Manter rodando (systemd, supervisor) ou usar --uma-vez no cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=0,
+                            help='Tarefas em paralelo (padrão: RELATORIOS_TAREFAS_PROCESSOS).')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos entre as consultas à fila quando ela está vazia.')
+        parser.add_argument('--uma-vez', action='store_true',
+                            help='Processa o que estiver na fila e termina.')
+
+    def _novo_pool(self, processos):
+        # spawn: processos limpos, sem herdar as conexões (e o pool) do worker
+        return ProcessPoolExecutor(
+            max_workers=processos,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=iniciar_processo,
+        )
+
+    def handle(self, *args, **options):
+        processos = options['processos'] or getattr(settings, 'RELATORIOS_TAREFAS_PROCESSOS', 2)
+        pool = self._novo_pool(processos)
+        em_andamento = {}
+        proxima_limpeza = 0
+        self.stdout.write(f'Worker de relatórios com {processos} processo(s).')
+
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() >= proxima_limpeza:
+                    with connection.cursor() as cursor:
+                        apagadas = limpar_vencidas(cursor)
+                    if apagadas:
+                        self.stdout.write(f'{apagadas} tarefa(s) vencida(s) apagada(s).')
+                    proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA
+
+                while len(em_andamento) < processos:
+                    with connection.cursor() as cursor:
+                        id_tarefa = reservar_proxima(cursor)
+                    if id_tarefa is None:
+                        break
+                    em_andamento[pool.submit(executar_tarefa, id_tarefa)] = id_tarefa
+                    self.stdout.write(f'Tarefa {id_tarefa} iniciada.')
+
+                if not em_andamento:
+                    if options['uma_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                concluidas, _pendentes = wait(em_andamento, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                quebrado = False
+                for futuro in concluidas:
+                    id_tarefa = em_andamento.pop(futuro)
+                    try:
+                        status = futuro.result()
+                    except BrokenProcessPool:
+                        quebrado = True
+                        self.stderr.write(f'Tarefa {id_tarefa}: o processo do pool morreu.')
+                        continue
+                    self.stdout.write(f'Tarefa {id_tarefa}: {status}.')
+
+                if quebrado:
+                    # Processo morto (falta de memória, sinal) derruba o pool inteiro.
+                    # As tarefas dele voltam para a fila depois de
+                    # RELATORIOS_TAREFAS_ABANDONO segundos.
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    em_andamento.clear()
+                    pool = self._novo_pool(processos)
+        except KeyboardInterrupt:
+            self.stdout.write('Encerrando: as tarefas em andamento voltam para a fila.')
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            if em_andamento:
+                with connection.cursor() as cursor:
+                    devolver_para_fila(cursor, em_andamento.values())
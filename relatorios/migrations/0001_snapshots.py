@@ -0,0 +1,98 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acervo', '0001_esquema_base'),
+    ]
+
+    operations = [
+        # Snapshots dos relatórios (relatorios/snapshots.py). Cada materialized
+        # view precisa de um índice UNIQUE para o REFRESH ... CONCURRENTLY.
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS relatorio_snapshot (
+                    nome VARCHAR(50) PRIMARY KEY,
+                    atualizado_em TIMESTAMPTZ NOT NULL
+                );
+
+                -- Empréstimos em andamento; o filtro "atrasado" (CURRENT_DATE)
+                -- é aplicado na leitura, então o snapshot não envelhece à meia-noite
+                CREATE MATERIALIZED VIEW IF NOT EXISTS relatorio_atrasados_mv AS
+                SELECT
+                    emp.id_emprestimo,
+                    emp.id_leitor,
+                    COALESCE(l.nome, 'Desconhecido') AS leitor_nome,
+                    l.telefone AS leitor_telefone,
+                    ex.numero_patrimonio,
+                    COALESCE(lv.nome, 'Desconhecido') AS livro_nome,
+                    emp.dt_prevista_devolucao
+                FROM Emprestimo emp
+                LEFT JOIN Leitor l ON l.id_leitor = emp.id_leitor
+                LEFT JOIN Exemplar ex ON ex.id_exemplar = emp.id_exemplar
+                LEFT JOIN Livro lv ON lv.id_livro = ex.id_livro
+                WHERE emp.status = 'Em Andamento'
+                WITH DATA;
+                CREATE UNIQUE INDEX IF NOT EXISTS relatorio_atrasados_mv_pk
+                    ON relatorio_atrasados_mv (id_emprestimo);
+                CREATE INDEX IF NOT EXISTS relatorio_atrasados_mv_prevista_idx
+                    ON relatorio_atrasados_mv (dt_prevista_devolucao, id_emprestimo);
+
+                CREATE MATERIALIZED VIEW IF NOT EXISTS relatorio_emprestados_mv AS
+                SELECT
+                    emp.id_emprestimo,
+                    COALESCE(l.nome, 'Desconhecido') AS leitor_nome,
+                    ex.numero_patrimonio,
+                    COALESCE(lv.nome, '-') AS livro_nome,
+                    COALESCE(lv.nome, '') AS livro_ordem,
+                    COALESCE((
+                        SELECT array_agg(a.nome ORDER BY a.nome)
+                        FROM autor_livro al JOIN Autor a ON a.id_autor = al.id_autor
+                        WHERE al.id_livro = ex.id_livro
+                    ), '{}') AS autores,
+                    emp.dt_emprestimo,
+                    emp.dt_prevista_devolucao
+                FROM Emprestimo emp
+                LEFT JOIN Leitor l ON l.id_leitor = emp.id_leitor
+                LEFT JOIN Exemplar ex ON ex.id_exemplar = emp.id_exemplar
+                LEFT JOIN Livro lv ON lv.id_livro = ex.id_livro
+                WHERE emp.status = 'Em Andamento'
+                WITH DATA;
+                CREATE UNIQUE INDEX IF NOT EXISTS relatorio_emprestados_mv_pk
+                    ON relatorio_emprestados_mv (id_emprestimo);
+                CREATE INDEX IF NOT EXISTS relatorio_emprestados_mv_ordem_idx
+                    ON relatorio_emprestados_mv (livro_ordem, id_emprestimo);
+
+                CREATE MATERIALIZED VIEW IF NOT EXISTS relatorio_historico_mv AS
+                SELECT
+                    emp.id_emprestimo,
+                    ex.id_livro,
+                    ex.numero_patrimonio,
+                    COALESCE(l.nome, 'Desconhecido') AS leitor_nome,
+                    emp.dt_emprestimo,
+                    emp.dt_devolucao,
+                    emp.status
+                FROM Emprestimo emp
+                JOIN Exemplar ex ON ex.id_exemplar = emp.id_exemplar
+                LEFT JOIN Leitor l ON l.id_leitor = emp.id_leitor
+                WITH DATA;
+                CREATE UNIQUE INDEX IF NOT EXISTS relatorio_historico_mv_pk
+                    ON relatorio_historico_mv (id_emprestimo);
+                CREATE INDEX IF NOT EXISTS relatorio_historico_mv_livro_idx
+                    ON relatorio_historico_mv (id_livro, dt_emprestimo, id_emprestimo);
+
+                INSERT INTO relatorio_snapshot (nome, atualizado_em) VALUES
+                    ('leitores_atrasados', now()),
+                    ('livros_emprestados', now()),
+                    ('historico_livro', now())
+                ON CONFLICT (nome) DO NOTHING;
+            """,
+            reverse_sql="""
+                DROP MATERIALIZED VIEW IF EXISTS relatorio_atrasados_mv;
+                DROP MATERIALIZED VIEW IF EXISTS relatorio_emprestados_mv;
+                DROP MATERIALIZED VIEW IF EXISTS relatorio_historico_mv;
+                DROP TABLE IF EXISTS relatorio_snapshot;
+            """,
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relatorios', '0001_snapshots'),
+    ]
+
+    operations = [
+        # Fila dos relatórios gerados em segundo plano (relatorios/tarefas.py).
+        # O worker (processar_relatorios) reserva as pendentes com
+        # FOR UPDATE SKIP LOCKED; atualizada_em serve de sinal de vida.
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS relatorio_tarefa (
+                    id_tarefa BIGSERIAL PRIMARY KEY,
+                    relatorio VARCHAR(50) NOT NULL,
+                    formato VARCHAR(10) NOT NULL,
+                    params JSONB NOT NULL DEFAULT '[]',
+                    id_funcionario INTEGER,
+                    status VARCHAR(20) NOT NULL DEFAULT 'Pendente'
+                        CHECK (status IN ('Pendente', 'Executando', 'Concluída', 'Falhou')),
+                    progresso INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER,
+                    tentativas SMALLINT NOT NULL DEFAULT 0,
+                    arquivo VARCHAR(255),
+                    erro TEXT,
+                    criada_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    atualizada_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    concluida_em TIMESTAMPTZ
+                );
+
+                -- Fila: só as tarefas não terminadas, na ordem de chegada
+                CREATE INDEX IF NOT EXISTS relatorio_tarefa_fila_idx
+                    ON relatorio_tarefa (id_tarefa)
+                    WHERE status IN ('Pendente', 'Executando');
+                -- Limpeza dos arquivos vencidos
+                CREATE INDEX IF NOT EXISTS relatorio_tarefa_criada_idx
+                    ON relatorio_tarefa (criada_em);
+            """,
+            reverse_sql="DROP TABLE IF EXISTS relatorio_tarefa;",
+        ),
+    ]
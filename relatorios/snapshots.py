@@ -0,0 +1,106 @@
+"""
+Snapshots (materialized views) dos relatórios.
+
+Cada relatório tem uma materialized view com o resultado já montado
+(nomes de leitor, patrimônio, livro e autores na própria linha) e índices
+na ordem de paginação. A tela lê o snapshot com uma consulta simples em vez
+de recalcular tudo a partir de Emprestimo.
+
+Atualização:
+- agendada: comando `atualizar_relatorios` (cron, ex.: a cada 15 minutos);
+- sob demanda: botão "Atualizar snapshot" da tela (POST).
+
+O REFRESH é CONCURRENTLY: quem está lendo continua vendo o snapshot anterior
+até o novo ficar pronto. A hora de cada atualização fica em
+`relatorio_snapshot` e aparece na tela; snapshots mais velhos que
+RELATORIOS_SNAPSHOT_VALIDADE (ou ausentes) fazem a tela calcular ao vivo,
+assim como o parâmetro ?ao_vivo=1.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from gestao_biblioteca.banco_async import consultar_valor
+
+# Relatório -> (materialized view, rota da tela)
+SNAPSHOTS = {
+    'leitores_atrasados': ('relatorio_atrasados_mv', 'relatorios:relatorio_leitores_atrasados'),
+    'livros_emprestados': ('relatorio_emprestados_mv', 'relatorios:relatorio_livros_emprestados'),
+    'historico_livro': ('relatorio_historico_mv', 'relatorios:relatorio_historico_livro'),
+}
+
+SQL_ATUALIZADO_EM = "SELECT atualizado_em FROM relatorio_snapshot WHERE nome = %s"
+
+
+def atualizar_snapshot(cursor, relatorio):
+    """
+    REFRESH CONCURRENTLY da materialized view do relatório. Retorna False se
+    outro processo já estiver atualizando o mesmo snapshot.
+    """
+    visao, _rota = SNAPSHOTS[relatorio]
+    with transaction.atomic():
+        # Uma atualização por vez para cada snapshot (trava liberada no COMMIT)
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", [visao])
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {visao}")
+        cursor.execute(
+            """
+            INSERT INTO relatorio_snapshot (nome, atualizado_em) VALUES (%s, now())
+            ON CONFLICT (nome) DO UPDATE SET atualizado_em = EXCLUDED.atualizado_em
+            """,
+            [relatorio]
+        )
+    return True
+
+
+def atualizar_snapshots(cursor, relatorios=None):
+    """Atualiza os snapshots pedidos (todos, por padrão): {relatorio: atualizado?}."""
+    return {relatorio: atualizar_snapshot(cursor, relatorio) for relatorio in relatorios or SNAPSHOTS}
+
+
+def _valido(atualizado_em):
+    if atualizado_em is None:
+        return False
+    validade = getattr(settings, 'RELATORIOS_SNAPSHOT_VALIDADE', 60 * 60)
+    return (timezone.now() - atualizado_em).total_seconds() <= validade
+
+
+def _ao_vivo(request):
+    return request.GET.get('ao_vivo') == '1'
+
+
+def get_snapshot(request, cursor, relatorio):
+    """Hora do snapshot a usar nesta requisição, ou None para calcular ao vivo."""
+    if _ao_vivo(request):
+        return None
+    cursor.execute(SQL_ATUALIZADO_EM, [relatorio])
+    row = cursor.fetchone()
+    atualizado_em = row[0] if row else None
+    return atualizado_em if _valido(atualizado_em) else None
+
+
+async def get_snapshot_async(request, relatorio):
+    if _ao_vivo(request):
+        return None
+    atualizado_em = await consultar_valor(SQL_ATUALIZADO_EM, [relatorio])
+    return atualizado_em if _valido(atualizado_em) else None
+
+
+def contexto_snapshot(request, relatorio, snapshot_em):
+    """Dados da faixa "snapshot de ... / calculado ao vivo" dos templates."""
+    params = request.GET.copy()
+    # Trocar de fonte volta para a primeira página
+    for chave in ('apos', 'antes', 'ao_vivo'):
+        params.pop(chave, None)
+    url_snapshot = f'?{params.urlencode()}'
+    params['ao_vivo'] = '1'
+    return {
+        'snapshot': {
+            'relatorio': relatorio,
+            'atualizado_em': snapshot_em,
+            'ao_vivo': snapshot_em is None,
+            'url_ao_vivo': f'?{params.urlencode()}',
+            'url_snapshot': url_snapshot,
+        }
+    }
@@ -0,0 +1,220 @@
+"""
+Relatórios gerados em segundo plano.
+
+Exportar um relatório grande (o histórico de um título muito emprestado, a
+lista completa de atrasos) pode passar do tempo limite do proxy. Em vez de
+gerar o arquivo durante a requisição:
+
+1. a view grava uma tarefa em `relatorio_tarefa` (enfileirar) e responde na
+   hora com o id;
+2. o worker (`manage.py processar_relatorios`) reserva as pendentes com
+   FOR UPDATE SKIP LOCKED (dois workers nunca pegam a mesma) e gera cada
+   arquivo num processo do pool, gravando o progresso enquanto escreve;
+3. a tela da tarefa consulta o status (JSON) até a conclusão e libera o
+   download.
+
+Uma tarefa 'Executando' sem progresso há RELATORIOS_TAREFAS_ABANDONO
+segundos (worker derrubado) volta para a fila, até MAXIMO_TENTATIVAS vezes.
+Tarefas e arquivos com mais de RELATORIOS_TAREFAS_VALIDADE segundos são
+apagados pelo próprio worker.
+"""
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.utils import timezone
+
+from gestao_biblioteca.exportacao import gravar_exportacao
+from gestao_biblioteca.replica import ALIAS_REPLICA, replica_em_dia
+
+logger = logging.getLogger('biblioteca.tarefas')
+
+STATUS_PENDENTE = 'Pendente'
+STATUS_EXECUTANDO = 'Executando'
+STATUS_CONCLUIDA = 'Concluída'
+STATUS_FALHOU = 'Falhou'
+
+MAXIMO_TENTATIVAS = 3
+
+# Cada gravação do progresso é um UPDATE: no máximo uma por este intervalo (s)
+INTERVALO_PROGRESSO = 1.0
+
+COLUNAS = [
+    'id_tarefa', 'relatorio', 'formato', 'params', 'id_funcionario', 'status',
+    'progresso', 'total', 'arquivo', 'erro', 'criada_em', 'concluida_em',
+]
+
+
+def caminho_arquivo(tarefa):
+    """Arquivo gerado para a tarefa (o id evita colisão entre tarefas iguais)."""
+    return os.path.join(
+        str(settings.RELATORIOS_TAREFAS_DIR), f"{tarefa['id_tarefa']}_{tarefa['arquivo']}.{tarefa['formato']}"
+    )
+
+
+def enfileirar(cursor, relatorio, formato, params, arquivo, id_funcionario):
+    """Cria a tarefa pendente e retorna o id. `arquivo`: nome do download, sem extensão."""
+    cursor.execute(
+        """
+        INSERT INTO relatorio_tarefa (relatorio, formato, params, arquivo, id_funcionario)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id_tarefa
+        """,
+        [relatorio, formato, json.dumps(params), arquivo, id_funcionario],
+    )
+    return cursor.fetchone()[0]
+
+
+def obter_tarefa(cursor, id_tarefa):
+    """Tarefa como dict (colunas de COLUNAS) ou None."""
+    cursor.execute(f"SELECT {', '.join(COLUNAS)} FROM relatorio_tarefa WHERE id_tarefa = %s", [id_tarefa])
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    tarefa = dict(zip(COLUNAS, row))
+    if isinstance(tarefa['params'], str):
+        tarefa['params'] = json.loads(tarefa['params'])
+    return tarefa
+
+
+def reservar_proxima(cursor):
+    """
+    Marca a próxima tarefa da fila como 'Executando' e retorna o id (ou
+    None). Tarefas abandonadas voltam aqui; as que já esgotaram as
+    tentativas são dadas como falhas.
+    """
+    abandono = getattr(settings, 'RELATORIOS_TAREFAS_ABANDONO', 10 * 60)
+    cursor.execute(
+        """
+        UPDATE relatorio_tarefa
+        SET status = 'Falhou', erro = 'Interrompida sem concluir (o worker parou).', atualizada_em = now()
+        WHERE status = 'Executando'
+          AND atualizada_em < now() - make_interval(secs => %s)
+          AND tentativas >= %s
+        """,
+        [abandono, MAXIMO_TENTATIVAS],
+    )
+    cursor.execute(
+        """
+        UPDATE relatorio_tarefa
+        SET status = 'Executando', tentativas = tentativas + 1, progresso = 0, atualizada_em = now()
+        WHERE id_tarefa = (
+            SELECT id_tarefa FROM relatorio_tarefa
+            WHERE status = 'Pendente'
+               OR (status = 'Executando' AND atualizada_em < now() - make_interval(secs => %s))
+            ORDER BY id_tarefa
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id_tarefa
+        """,
+        [abandono],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def devolver_para_fila(cursor, ids_tarefas):
+    """Tarefas interrompidas pelo próprio worker (encerramento) voltam a 'Pendente'."""
+    cursor.execute(
+        """
+        UPDATE relatorio_tarefa
+        SET status = 'Pendente', tentativas = tentativas - 1, progresso = 0, atualizada_em = now()
+        WHERE id_tarefa = ANY(%s) AND status = 'Executando'
+        """,
+        [list(ids_tarefas)],
+    )
+
+
+def _atualizar(id_tarefa, **campos):
+    """UPDATE imediato (autocommit): quem consulta o status vê na hora."""
+    atribuicoes = ', '.join(f'{campo} = %s' for campo in campos)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE relatorio_tarefa SET {atribuicoes}, atualizada_em = now() WHERE id_tarefa = %s",
+            [*campos.values(), id_tarefa],
+        )
+
+
+def executar_tarefa(id_tarefa):
+    """Gera o arquivo da tarefa (roda num processo do pool). Retorna o status final."""
+    # As definições das exportações (SQL, colunas, hidratação) ficam nas views
+    from .views import EXPORTACOES
+
+    close_old_connections()
+    with connection.cursor() as cursor:
+        tarefa = obter_tarefa(cursor, id_tarefa)
+    if tarefa is None:
+        # Apagada (limpeza) depois de reservada
+        return None
+    exportacao = EXPORTACOES[tarefa['relatorio']]
+    # Leitura pesada: na réplica, se ela estiver em dia
+    alias = ALIAS_REPLICA if replica_em_dia() else DEFAULT_DB_ALIAS
+
+    caminho = caminho_arquivo(tarefa)
+    parcial = caminho + '.parcial'
+    ultimo_progresso = time.monotonic()
+
+    def progresso(linhas):
+        nonlocal ultimo_progresso
+        if time.monotonic() - ultimo_progresso >= INTERVALO_PROGRESSO:
+            _atualizar(id_tarefa, progresso=linhas)
+            ultimo_progresso = time.monotonic()
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({exportacao['sql']}) AS linhas", tarefa['params'])
+            _atualizar(id_tarefa, total=cursor.fetchone()[0])
+
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(parcial, 'wb') as destino:
+            gravadas = gravar_exportacao(
+                destino, tarefa['formato'], exportacao['colunas'], exportacao['sql'], tarefa['params'],
+                completar=exportacao['completar'], alias=alias, progresso=progresso,
+            )
+        # O download só enxerga o arquivo completo
+        os.replace(parcial, caminho)
+    except Exception as erro:
+        logger.exception('Tarefa %s (%s) falhou.', id_tarefa, tarefa['relatorio'])
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        _atualizar(id_tarefa, status=STATUS_FALHOU, erro=str(erro))
+        return STATUS_FALHOU
+    finally:
+        close_old_connections()
+
+    _atualizar(
+        id_tarefa, status=STATUS_CONCLUIDA, progresso=gravadas, total=gravadas,
+        erro=None, concluida_em=timezone.now(),
+    )
+    return STATUS_CONCLUIDA
+
+
+def limpar_vencidas(cursor):
+    """Apaga tarefas (e arquivos) mais velhas que RELATORIOS_TAREFAS_VALIDADE. Retorna quantas."""
+    validade = getattr(settings, 'RELATORIOS_TAREFAS_VALIDADE', 7 * 24 * 60 * 60)
+    cursor.execute(
+        f"""
+        DELETE FROM relatorio_tarefa
+        WHERE criada_em < now() - make_interval(secs => %s)
+          AND status <> 'Executando'
+        RETURNING {', '.join(COLUNAS)}
+        """,
+        [validade],
+    )
+    vencidas = [dict(zip(COLUNAS, row)) for row in cursor.fetchall()]
+    for tarefa in vencidas:
+        caminho = caminho_arquivo(tarefa)
+        if os.path.exists(caminho):
+            os.remove(caminho)
+    return len(vencidas)
+
+
+def iniciar_processo():
+    """initializer do pool: processos novos (spawn) precisam carregar o Django."""
+    import django
+
+    django.setup()
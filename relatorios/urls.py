@@ -8,11 +8,23 @@ urlpatterns = [
     path('', views.relatorio_index_view, name='relatorio_index'),
     
     # /relatorios/leitores_atrasados/
-    path('leitores_atrasados/', views.relatorio_leitores_atrasados_view, name='relatorio_leitores_atrasados'),
+    path('leitores_atrasados/', views.relatorio_leitores_atrasados_async_view, name='relatorio_leitores_atrasados'),
     
     # /relatorios/historico_livro/
-    path('historico_livro/', views.relatorio_historico_livro_view, name='relatorio_historico_livro'),
+    path('historico_livro/', views.relatorio_historico_livro_async_view, name='relatorio_historico_livro'),
     
     # /relatorios/livros_emprestados/
-    path('livros_emprestados/', views.relatorio_livros_emprestados_view, name='relatorio_livros_emprestados'),
+    path('livros_emprestados/', views.relatorio_livros_emprestados_async_view, name='relatorio_livros_emprestados'),
+
+    # Atualização sob demanda dos snapshots (POST)
+    path('snapshot/<str:relatorio>/atualizar/', views.atualizar_snapshot_view, name='atualizar_snapshot'),
+
+    # /relatorios/exportar/leitores_atrasados/?formato=xlsx
+    path('exportar/<str:relatorio>/', views.exportar_relatorio_view, name='exportar_relatorio'),
+
+    # Exportação em segundo plano: pedido (POST), acompanhamento, status (JSON) e download
+    path('tarefas/<str:relatorio>/solicitar/', views.solicitar_relatorio_view, name='solicitar_relatorio'),
+    path('tarefas/<int:id_tarefa>/', views.tarefa_relatorio_view, name='tarefa_relatorio'),
+    path('tarefas/<int:id_tarefa>/status/', views.status_tarefa_view, name='status_tarefa'),
+    path('tarefas/<int:id_tarefa>/baixar/', views.baixar_tarefa_view, name='baixar_tarefa'),
 ]
@@ -1,7 +1,21 @@
+import asyncio
+import os
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.db import connection
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from datetime import date
+from gestao_biblioteca.banco_async import consultar, view_async
+from gestao_biblioteca.exportacao import FORMATOS, resposta_exportacao
+from gestao_biblioteca.hidratacao import hidratar, hidratar_async, hidratar_autores, hidratar_autores_async
+from gestao_biblioteca.paginacao import paginar, paginar_async
+from gestao_biblioteca.replica import conexao_leitura, leitura_na_replica
+from emprestimos.multas import preencher_multas_projetadas, preencher_multas_projetadas_async
+from .snapshots import SNAPSHOTS, atualizar_snapshot, contexto_snapshot, get_snapshot, get_snapshot_async
+from .tarefas import STATUS_CONCLUIDA, caminho_arquivo, enfileirar, obter_tarefa
 
 # --- Helper Function ---
 def dictfetchall(cursor):
@@ -9,24 +23,124 @@ def dictfetchall(cursor):
     columns = [col[0] for col in cursor.description]
     return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-def _get_autores_para_livro(livro_id):
-    """
-    Função auxiliar para buscar autores SEM JOIN.
-    Usa sub-query: WHERE id_autor IN (SELECT ...)
-    """
-    with connection.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT nome 
-            FROM Autor 
-            WHERE id_autor IN (
-                SELECT id_autor FROM autor_livro WHERE id_livro = %s
+# --- Consultas dos Relatórios ---
+# Compartilhadas pelas views síncronas (WSGI) e async (ASGI, consultas em paralelo)
+
+SQL_ATRASADOS = """
+    SELECT 
+        id_emprestimo,
+        id_leitor,
+        id_exemplar,
+        dt_prevista_devolucao
+    FROM Emprestimo 
+    WHERE status = 'Em Andamento' 
+      AND dt_prevista_devolucao < CURRENT_DATE
+"""
+
+SQL_EMPRESTADOS = """
+    SELECT 
+        id_emprestimo,
+        id_exemplar,
+        id_leitor,
+        dt_emprestimo,
+        dt_prevista_devolucao,
+        COALESCE((
+            SELECT nome FROM Livro WHERE id_livro = (
+                SELECT id_livro FROM Exemplar WHERE id_exemplar = Emprestimo.id_exemplar
             )
-            ORDER BY nome
-            """,
-            [livro_id]
-        )
-        return dictfetchall(cursor)
+        ), '') AS livro_ordem
+    FROM Emprestimo 
+    WHERE status = 'Em Andamento'
+"""
+
+# TRUQUE: Usamos sub-select no WHERE para filtrar pelos exemplares do livro
+SQL_HISTORICO = """
+    SELECT 
+        id_emprestimo,
+        id_exemplar,
+        id_leitor,
+        dt_emprestimo,
+        dt_devolucao,
+        status
+    FROM Emprestimo 
+    WHERE id_exemplar IN (
+        SELECT id_exemplar FROM Exemplar WHERE id_livro = %s
+    )
+"""
+
+SQL_TODOS_LIVROS = "SELECT id_livro AS pk, nome FROM Livro ORDER BY nome"
+
+# Leituras dos snapshots (relatorios/snapshots.py): linhas já com os nomes
+SQL_ATRASADOS_SNAPSHOT = """
+    SELECT * FROM relatorio_atrasados_mv
+    WHERE dt_prevista_devolucao < CURRENT_DATE
+"""
+
+SQL_EMPRESTADOS_SNAPSHOT = "SELECT * FROM relatorio_emprestados_mv"
+
+SQL_HISTORICO_SNAPSHOT = "SELECT * FROM relatorio_historico_mv WHERE id_livro = %s"
+
+def _formatar_atrasados(emprestimos):
+    """Campos de exibição do relatório de atrasos (linhas já hidratadas)."""
+    hoje = date.today()
+    
+    for emp in emprestimos:
+        # Calcula dias de atraso no Python
+        if emp['dt_prevista_devolucao']:
+            emp['dias_atraso'] = (hoje - emp['dt_prevista_devolucao']).days
+        else:
+            emp['dias_atraso'] = 0
+
+        # Leitor (Nome e Telefone)
+        if emp['leitor']:
+            emp['leitor_nome'] = emp['leitor']['nome']
+            emp['leitor_telefone'] = emp['leitor']['telefone']
+        else:
+            emp['leitor_nome'] = "Desconhecido"
+            emp['leitor_telefone'] = "-"
+
+        # Exemplar (Patrimônio) e Livro
+        if emp['exemplar']:
+            emp['numero_patrimonio'] = emp['exemplar']['numero_patrimonio']
+            livro = emp['exemplar']['livro']
+            emp['livro_nome'] = livro['nome'] if livro else "Desconhecido"
+        else:
+            emp['numero_patrimonio'] = "?"
+            emp['livro_nome'] = "?"
+
+def _formatar_emprestados(emprestimos):
+    """Campos de exibição do relatório de livros emprestados (linhas já hidratadas)."""
+    hoje = date.today()
+
+    for emp in emprestimos:
+        # Lógica de Atraso
+        emp['is_atrasado'] = emp['dt_prevista_devolucao'] < hoje
+        
+        emp['leitor_nome'] = emp['leitor']['nome'] if emp['leitor'] else "Desconhecido"
+
+        if emp['exemplar']:
+            emp['numero_patrimonio'] = emp['exemplar']['numero_patrimonio']
+            emp['livro_nome'] = emp['livro']['nome'] if emp['livro'] else "Desconhecido"
+        else:
+            emp['numero_patrimonio'] = "-"
+            emp['livro_nome'] = "-"
+
+def _formatar_atrasados_snapshot(emprestimos):
+    hoje = date.today()
+    for emp in emprestimos:
+        emp['dias_atraso'] = (hoje - emp['dt_prevista_devolucao']).days
+
+def _formatar_emprestados_snapshot(emprestimos):
+    hoje = date.today()
+    for emp in emprestimos:
+        emp['is_atrasado'] = emp['dt_prevista_devolucao'] < hoje
+        emp['autores_list'] = [{'nome': nome} for nome in emp['autores']]
+
+def _formatar_historico(emprestimos):
+    """Campos de exibição do histórico (linhas já hidratadas)."""
+    for emp in emprestimos:
+        emp['leitor_nome'] = emp['leitor']['nome'] if emp['leitor'] else "Desconhecido"
+        emp['numero_patrimonio'] = emp['exemplar']['numero_patrimonio'] if emp['exemplar'] else "-"
 
 # --- Views de Relatório ---
 
@@ -34,6 +148,7 @@ def relatorio_index_view(request):
     """Apenas renderiza a página principal (menu) de relatórios."""
     return render(request, 'relatorio/relatorio.html')
 
+@leitura_na_replica
 def relatorio_leitores_atrasados_view(request):
     """
     Busca empréstimos atrasados SEM JOIN.
@@ -41,60 +156,30 @@ def relatorio_leitores_atrasados_view(request):
     """
     contexto = {}
     try:
-        with connection.cursor() as cursor:
-            # 1. Busca dados brutos da tabela de Empréstimo
-            cursor.execute(
-                """
-                SELECT 
-                    id_emprestimo,
-                    id_leitor,
-                    id_exemplar,
-                    dt_prevista_devolucao
-                FROM Emprestimo 
-                WHERE status = 'Em Andamento' 
-                  AND dt_prevista_devolucao < CURRENT_DATE
-                ORDER BY dt_prevista_devolucao ASC
-                """
-            )
-            emprestimos = dictfetchall(cursor)
-            
-            # 2. Enriquecimento de dados (Loop Python)
-            hoje = date.today()
-            
-            for emp in emprestimos:
-                # Calcula dias de atraso no Python
-                if emp['dt_prevista_devolucao']:
-                    emp['dias_atraso'] = (hoje - emp['dt_prevista_devolucao']).days
-                else:
-                    emp['dias_atraso'] = 0
-
-                # Busca Leitor (Nome e Telefone)
-                cursor.execute("SELECT nome, telefone FROM Leitor WHERE id_leitor = %s", [emp['id_leitor']])
-                row_leitor = cursor.fetchone()
-                if row_leitor:
-                    emp['leitor_nome'] = row_leitor[0]
-                    emp['leitor_telefone'] = row_leitor[1]
-                else:
-                    emp['leitor_nome'] = "Desconhecido"
-                    emp['leitor_telefone'] = "-"
-
-                # Busca Exemplar (Patrimônio e ID do Livro)
-                cursor.execute("SELECT numero_patrimonio, id_livro FROM Exemplar WHERE id_exemplar = %s", [emp['id_exemplar']])
-                row_exemplar = cursor.fetchone()
-                
-                if row_exemplar:
-                    emp['numero_patrimonio'] = row_exemplar[0]
-                    id_livro = row_exemplar[1]
-                    
-                    # Busca Nome do Livro
-                    cursor.execute("SELECT nome FROM Livro WHERE id_livro = %s", [id_livro])
-                    row_livro = cursor.fetchone()
-                    emp['livro_nome'] = row_livro[0] if row_livro else "Desconhecido"
-                else:
-                    emp['numero_patrimonio'] = "?"
-                    emp['livro_nome'] = "?"
+        with conexao_leitura().cursor() as cursor:
+            snapshot_em = get_snapshot(request, cursor, 'leitores_atrasados')
+            contexto.update(contexto_snapshot(request, 'leitores_atrasados', snapshot_em))
+
+            if snapshot_em:
+                # Snapshot: linhas prontas, só calcula os dias de atraso
+                pagina = paginar(request, cursor, SQL_ATRASADOS_SNAPSHOT, [], ['dt_prevista_devolucao', 'id_emprestimo'], contar=True)
+                emprestimos = pagina.itens
+                _formatar_atrasados_snapshot(emprestimos)
+            else:
+                # 1. Busca dados brutos da tabela de Empréstimo (paginado por data prevista)
+                pagina = paginar(request, cursor, SQL_ATRASADOS, [], ['dt_prevista_devolucao', 'id_emprestimo'], contar=True)
+                emprestimos = pagina.itens
+
+                # 2. Enriquecimento de dados (Hidratação em lote: 1 query por tabela)
+                hidratar(request, cursor, emprestimos, {'id_leitor', 'id_exemplar'})
+                hidratar(request, cursor, [emp['exemplar'] for emp in emprestimos if emp['exemplar']], {'id_livro'})
+                _formatar_atrasados(emprestimos)
+
+            # 3. Multa projetada: lida do extrato noturno (calcular_multas), não recalculada
+            preencher_multas_projetadas(cursor, emprestimos)
 
             contexto['emprestimos_atrasados'] = emprestimos
+            contexto['pagina'] = pagina
 
     except Exception as e:
         messages.error(request, f"Ocorreu um erro ao gerar o relatório: {e}")
@@ -102,65 +187,37 @@ def relatorio_leitores_atrasados_view(request):
 
     return render(request, 'relatorio/leitores_atrasados.html', contexto)
 
+@leitura_na_replica
 def relatorio_livros_emprestados_view(request):
     """
     Busca livros emprestados SEM JOIN.
     """
     contexto = {}
     try:
-        with connection.cursor() as cursor:
-            # 1. Busca dados da tabela Empréstimo
-            cursor.execute(
-                """
-                SELECT 
-                    id_emprestimo,
-                    id_exemplar,
-                    id_leitor,
-                    dt_emprestimo,
-                    dt_prevista_devolucao
-                FROM Emprestimo 
-                WHERE status = 'Em Andamento'
-                ORDER BY (
-                    SELECT nome FROM Livro WHERE id_livro = (
-                        SELECT id_livro FROM Exemplar WHERE id_exemplar = Emprestimo.id_exemplar
-                    )
-                ) ASC
-                """
-            )
-            emprestimos = dictfetchall(cursor)
-            
-            hoje = date.today()
+        with conexao_leitura().cursor() as cursor:
+            snapshot_em = get_snapshot(request, cursor, 'livros_emprestados')
+            contexto.update(contexto_snapshot(request, 'livros_emprestados', snapshot_em))
 
-            # 2. Loop para preencher os dados relacionais
-            for emp in emprestimos:
-                # Lógica de Atraso
-                emp['is_atrasado'] = emp['dt_prevista_devolucao'] < hoje
-                
-                # Busca Leitor
-                cursor.execute("SELECT nome FROM Leitor WHERE id_leitor = %s", [emp['id_leitor']])
-                leitor_row = cursor.fetchone()
-                emp['leitor_nome'] = leitor_row[0] if leitor_row else "Desconhecido"
-
-                # Busca Exemplar e Livro
-                cursor.execute("SELECT numero_patrimonio, id_livro FROM Exemplar WHERE id_exemplar = %s", [emp['id_exemplar']])
-                ex_row = cursor.fetchone()
-                
-                if ex_row:
-                    emp['numero_patrimonio'] = ex_row[0]
-                    emp['id_livro'] = ex_row[1] # Necessário para buscar autores depois
-                    
-                    cursor.execute("SELECT nome FROM Livro WHERE id_livro = %s", [emp['id_livro']])
-                    l_row = cursor.fetchone()
-                    emp['livro_nome'] = l_row[0] if l_row else "Desconhecido"
-                    
-                    # Busca Autores (usando nossa função auxiliar sem join)
-                    emp['autores_list'] = _get_autores_para_livro(emp['id_livro'])
-                else:
-                    emp['numero_patrimonio'] = "-"
-                    emp['livro_nome'] = "-"
-                    emp['autores_list'] = []
+            if snapshot_em:
+                pagina = paginar(request, cursor, SQL_EMPRESTADOS_SNAPSHOT, [], ['livro_ordem', 'id_emprestimo'], contar=True)
+                emprestimos = pagina.itens
+                _formatar_emprestados_snapshot(emprestimos)
+            else:
+                # 1. Busca dados da tabela Empréstimo (paginado pelo nome do livro)
+                pagina = paginar(request, cursor, SQL_EMPRESTADOS, [], ['livro_ordem', 'id_emprestimo'], contar=True)
+                emprestimos = pagina.itens
+
+                # 2. Hidratação em lote dos dados relacionais (Leitor, Exemplar, Livro e Autores)
+                hidratar(request, cursor, emprestimos, {'id_leitor', 'id_exemplar'})
+                for emp in emprestimos:
+                    # Necessário para buscar livro e autores depois
+                    emp['id_livro'] = emp['exemplar']['id_livro'] if emp['exemplar'] else None
+                hidratar(request, cursor, emprestimos, {'id_livro'})
+                hidratar_autores(request, cursor, emprestimos)
+                _formatar_emprestados(emprestimos)
             
             contexto['emprestimos'] = emprestimos
+            contexto['pagina'] = pagina
             
     except Exception as e:
         messages.error(request, f"Ocorreu um erro ao gerar o relatório: {e}")
@@ -168,15 +225,16 @@ def relatorio_livros_emprestados_view(request):
     
     return render(request, 'relatorio/livros_emprestados.html', contexto)
 
+@leitura_na_replica
 def relatorio_historico_livro_view(request):
     """
     Histórico por livro SEM JOIN.
     """
     contexto = {}
     try:
-        with connection.cursor() as cursor:
+        with conexao_leitura().cursor() as cursor:
             # 1. Dropdown de Livros (Tabela Simples)
-            cursor.execute("SELECT id_livro AS pk, nome FROM Livro ORDER BY nome")
+            cursor.execute(SQL_TODOS_LIVROS)
             todos_livros = dictfetchall(cursor)
             contexto['todos_livros'] = todos_livros
             
@@ -187,42 +245,377 @@ def relatorio_historico_livro_view(request):
                 livro_selecionado_dados = next((livro for livro in todos_livros if livro['pk'] == int(livro_id_selecionado)), None)
                 contexto['livro_selecionado'] = livro_selecionado_dados
                 
-                # 3. Busca o histórico de empréstimos
-                # TRUQUE: Usamos sub-select no WHERE para filtrar pelos exemplares do livro
-                cursor.execute(
-                    """
-                    SELECT 
-                        id_exemplar,
-                        id_leitor,
-                        dt_emprestimo,
-                        dt_devolucao,
-                        status
-                    FROM Emprestimo 
-                    WHERE id_exemplar IN (
-                        SELECT id_exemplar FROM Exemplar WHERE id_livro = %s
-                    )
-                    ORDER BY dt_emprestimo DESC
-                    """,
-                    [livro_id_selecionado]
-                )
-                emprestimos = dictfetchall(cursor)
+                snapshot_em = get_snapshot(request, cursor, 'historico_livro')
+                contexto.update(contexto_snapshot(request, 'historico_livro', snapshot_em))
 
-                # 4. Preenche os nomes (Leitor e Patrimônio)
-                for emp in emprestimos:
-                    # Busca Nome Leitor
-                    cursor.execute("SELECT nome FROM Leitor WHERE id_leitor = %s", [emp['id_leitor']])
-                    l_row = cursor.fetchone()
-                    emp['leitor_nome'] = l_row[0] if l_row else "Desconhecido"
+                # 3. Busca o histórico de empréstimos (snapshot ou SQL_HISTORICO)
+                # Paginado do mais recente para o mais antigo
+                pagina = paginar(
+                    request, cursor, SQL_HISTORICO_SNAPSHOT if snapshot_em else SQL_HISTORICO,
+                    [livro_id_selecionado], ['dt_emprestimo', 'id_emprestimo'], decrescente=True, contar=True
+                )
+                emprestimos = pagina.itens
 
-                    # Busca Patrimônio
-                    cursor.execute("SELECT numero_patrimonio FROM Exemplar WHERE id_exemplar = %s", [emp['id_exemplar']])
-                    e_row = cursor.fetchone()
-                    emp['numero_patrimonio'] = e_row[0] if e_row else "-"
+                # 4. Ao vivo: preenche os nomes (Leitor e Patrimônio) com uma query por tabela
+                if not snapshot_em:
+                    hidratar(request, cursor, emprestimos, {'id_leitor', 'id_exemplar'})
+                    _formatar_historico(emprestimos)
 
                 contexto['emprestimos'] = emprestimos
+                contexto['pagina'] = pagina
     
     except Exception as e:
         messages.error(request, f"Ocorreu um erro ao gerar o relatório: {e}")
         contexto['todos_livros'] = []
         
-    return render(request, 'relatorio/historico_livro.html', contexto)
\ No newline at end of file
+    return render(request, 'relatorio/historico_livro.html', contexto)
+
+# --- Versões async (ASGI) ---
+# Mesmo resultado das views acima, mas as consultas independentes (página e
+# COUNT, Leitor e Exemplar, lista de livros e histórico) rodam ao mesmo tempo
+# pelo driver async (gestao_biblioteca/banco_async.py). No WSGI, o decorator
+# `view_async` delega para a view síncrona correspondente. Nos dois casos as
+# consultas vão para a réplica de leitura quando ela está em dia.
+
+@leitura_na_replica
+@view_async(relatorio_leitores_atrasados_view)
+async def relatorio_leitores_atrasados_async_view(request):
+    contexto = {}
+    try:
+        snapshot_em = await get_snapshot_async(request, 'leitores_atrasados')
+        contexto.update(contexto_snapshot(request, 'leitores_atrasados', snapshot_em))
+
+        if snapshot_em:
+            pagina = await paginar_async(request, SQL_ATRASADOS_SNAPSHOT, [], ['dt_prevista_devolucao', 'id_emprestimo'], contar=True)
+            emprestimos = pagina.itens
+            _formatar_atrasados_snapshot(emprestimos)
+        else:
+            pagina = await paginar_async(request, SQL_ATRASADOS, [], ['dt_prevista_devolucao', 'id_emprestimo'], contar=True)
+            emprestimos = pagina.itens
+
+            await hidratar_async(request, emprestimos, {'id_leitor', 'id_exemplar'})
+            await hidratar_async(request, [emp['exemplar'] for emp in emprestimos if emp['exemplar']], {'id_livro'})
+            _formatar_atrasados(emprestimos)
+
+        await preencher_multas_projetadas_async(emprestimos)
+
+        contexto['emprestimos_atrasados'] = emprestimos
+        contexto['pagina'] = pagina
+
+    except Exception as e:
+        messages.error(request, f"Ocorreu um erro ao gerar o relatório: {e}")
+        contexto['emprestimos_atrasados'] = []
+
+    return await sync_to_async(render)(request, 'relatorio/leitores_atrasados.html', contexto)
+
+@leitura_na_replica
+@view_async(relatorio_livros_emprestados_view)
+async def relatorio_livros_emprestados_async_view(request):
+    contexto = {}
+    try:
+        snapshot_em = await get_snapshot_async(request, 'livros_emprestados')
+        contexto.update(contexto_snapshot(request, 'livros_emprestados', snapshot_em))
+
+        if snapshot_em:
+            pagina = await paginar_async(request, SQL_EMPRESTADOS_SNAPSHOT, [], ['livro_ordem', 'id_emprestimo'], contar=True)
+            emprestimos = pagina.itens
+            _formatar_emprestados_snapshot(emprestimos)
+        else:
+            pagina = await paginar_async(request, SQL_EMPRESTADOS, [], ['livro_ordem', 'id_emprestimo'], contar=True)
+            emprestimos = pagina.itens
+
+            await hidratar_async(request, emprestimos, {'id_leitor', 'id_exemplar'})
+            for emp in emprestimos:
+                emp['id_livro'] = emp['exemplar']['id_livro'] if emp['exemplar'] else None
+            # Livro e autores só dependem do id_livro: rodam juntos
+            await asyncio.gather(
+                hidratar_async(request, emprestimos, {'id_livro'}),
+                hidratar_autores_async(request, emprestimos),
+            )
+            _formatar_emprestados(emprestimos)
+
+        contexto['emprestimos'] = emprestimos
+        contexto['pagina'] = pagina
+
+    except Exception as e:
+        messages.error(request, f"Ocorreu um erro ao gerar o relatório: {e}")
+        contexto['emprestimos'] = []
+
+    return await sync_to_async(render)(request, 'relatorio/livros_emprestados.html', contexto)
+
+@leitura_na_replica
+@view_async(relatorio_historico_livro_view)
+async def relatorio_historico_livro_async_view(request):
+    contexto = {}
+    try:
+        livro_id_selecionado = request.GET.get('livro_id')
+        if not livro_id_selecionado:
+            contexto['todos_livros'] = await consultar(SQL_TODOS_LIVROS)
+        else:
+            snapshot_em = await get_snapshot_async(request, 'historico_livro')
+            contexto.update(contexto_snapshot(request, 'historico_livro', snapshot_em))
+
+            # Dropdown de livros e histórico (página + COUNT) ao mesmo tempo
+            todos_livros, pagina = await asyncio.gather(
+                consultar(SQL_TODOS_LIVROS),
+                paginar_async(
+                    request, SQL_HISTORICO_SNAPSHOT if snapshot_em else SQL_HISTORICO,
+                    [livro_id_selecionado], ['dt_emprestimo', 'id_emprestimo'], decrescente=True, contar=True
+                ),
+            )
+            contexto['todos_livros'] = todos_livros
+            contexto['livro_selecionado'] = next(
+                (livro for livro in todos_livros if livro['pk'] == int(livro_id_selecionado)), None
+            )
+
+            emprestimos = pagina.itens
+            if not snapshot_em:
+                await hidratar_async(request, emprestimos, {'id_leitor', 'id_exemplar'})
+                _formatar_historico(emprestimos)
+
+            contexto['emprestimos'] = emprestimos
+            contexto['pagina'] = pagina
+
+    except Exception as e:
+        messages.error(request, f"Ocorreu um erro ao gerar o relatório: {e}")
+        contexto['todos_livros'] = []
+
+    return await sync_to_async(render)(request, 'relatorio/historico_livro.html', contexto)
+
+
+# --- Snapshots ---
+
+@require_POST
+def atualizar_snapshot_view(request, relatorio):
+    """Atualização sob demanda do snapshot (botão da tela do relatório)."""
+    if relatorio not in SNAPSHOTS:
+        messages.error(request, 'Relatório inválido.')
+        return redirect('relatorios:relatorio_index')
+
+    try:
+        with connection.cursor() as cursor:
+            if atualizar_snapshot(cursor, relatorio):
+                messages.success(request, 'Snapshot do relatório atualizado.')
+            else:
+                messages.info(request, 'O snapshot já está sendo atualizado. Tente novamente em instantes.')
+    except Exception as e:
+        messages.error(request, f"Erro ao atualizar o snapshot: {e}")
+
+    _visao, rota = SNAPSHOTS[relatorio]
+    url = reverse(rota)
+    livro_id = request.POST.get('livro_id', '')
+    if livro_id.isdigit():
+        url += f'?livro_id={livro_id}'
+    return redirect(url)
+
+
+# --- Exportação (CSV / XLSX) ---
+# Relatório completo, sem paginação, lido em lotes por um cursor de servidor
+# e enviado por streaming (gestao_biblioteca/exportacao.py). Cada lote é
+# hidratado com um mapa de identidade próprio, para a memória não crescer.
+
+def _completar_atrasados(cursor, lote):
+    hidratar(None, cursor, lote, {'id_leitor', 'id_exemplar'})
+    hidratar(None, cursor, [emp['exemplar'] for emp in lote if emp['exemplar']], {'id_livro'})
+    _formatar_atrasados(lote)
+    preencher_multas_projetadas(cursor, lote)
+
+async def _completar_atrasados_async(lote):
+    await hidratar_async(None, lote, {'id_leitor', 'id_exemplar'})
+    await hidratar_async(None, [emp['exemplar'] for emp in lote if emp['exemplar']], {'id_livro'})
+    _formatar_atrasados(lote)
+    await preencher_multas_projetadas_async(lote)
+
+def _nomes_autores(lote):
+    for emp in lote:
+        emp['autores'] = ', '.join(autor['nome'] for autor in emp['autores_list'])
+
+def _completar_emprestados(cursor, lote):
+    hidratar(None, cursor, lote, {'id_leitor', 'id_exemplar'})
+    for emp in lote:
+        emp['id_livro'] = emp['exemplar']['id_livro'] if emp['exemplar'] else None
+    hidratar(None, cursor, lote, {'id_livro'})
+    hidratar_autores(None, cursor, lote)
+    _formatar_emprestados(lote)
+    _nomes_autores(lote)
+
+async def _completar_emprestados_async(lote):
+    await hidratar_async(None, lote, {'id_leitor', 'id_exemplar'})
+    for emp in lote:
+        emp['id_livro'] = emp['exemplar']['id_livro'] if emp['exemplar'] else None
+    await asyncio.gather(
+        hidratar_async(None, lote, {'id_livro'}),
+        hidratar_autores_async(None, lote),
+    )
+    _formatar_emprestados(lote)
+    _nomes_autores(lote)
+
+def _completar_historico(cursor, lote):
+    hidratar(None, cursor, lote, {'id_leitor', 'id_exemplar'})
+    _formatar_historico(lote)
+
+async def _completar_historico_async(lote):
+    await hidratar_async(None, lote, {'id_leitor', 'id_exemplar'})
+    _formatar_historico(lote)
+
+EXPORTACOES = {
+    'leitores_atrasados': {
+        'titulo': 'Leitores com Atraso',
+        'arquivo': 'emprestimos_atrasados',
+        'sql': SQL_ATRASADOS + " ORDER BY dt_prevista_devolucao, id_emprestimo",
+        'colunas': [
+            ('Empréstimo', 'id_emprestimo'),
+            ('Leitor', 'leitor_nome'),
+            ('Telefone', 'leitor_telefone'),
+            ('Obra', 'livro_nome'),
+            ('Patrimônio', 'numero_patrimonio'),
+            ('Devolução Prevista', 'dt_prevista_devolucao'),
+            ('Dias de Atraso', 'dias_atraso'),
+            ('Multa Prevista', 'multa_projetada'),
+            ('Data do Extrato', 'multa_referencia'),
+        ],
+        'completar': _completar_atrasados,
+        'completar_async': _completar_atrasados_async,
+    },
+    'livros_emprestados': {
+        'titulo': 'Livros Emprestados',
+        'arquivo': 'livros_emprestados',
+        'sql': SQL_EMPRESTADOS + " ORDER BY livro_ordem, id_emprestimo",
+        'colunas': [
+            ('Empréstimo', 'id_emprestimo'),
+            ('Obra', 'livro_nome'),
+            ('Autores', 'autores'),
+            ('Patrimônio', 'numero_patrimonio'),
+            ('Leitor', 'leitor_nome'),
+            ('Data do Empréstimo', 'dt_emprestimo'),
+            ('Devolução Prevista', 'dt_prevista_devolucao'),
+            ('Atrasado', 'is_atrasado'),
+        ],
+        'completar': _completar_emprestados,
+        'completar_async': _completar_emprestados_async,
+    },
+    'historico_livro': {
+        'titulo': 'Histórico do Livro',
+        'arquivo': 'historico_livro',
+        'sql': SQL_HISTORICO + " ORDER BY dt_emprestimo DESC, id_emprestimo DESC",
+        'colunas': [
+            ('Empréstimo', 'id_emprestimo'),
+            ('Patrimônio', 'numero_patrimonio'),
+            ('Leitor', 'leitor_nome'),
+            ('Data do Empréstimo', 'dt_emprestimo'),
+            ('Data da Devolução', 'dt_devolucao'),
+            ('Status', 'status'),
+        ],
+        'completar': _completar_historico,
+        'completar_async': _completar_historico_async,
+    },
+}
+
+def _parametros_exportacao(request, relatorio, dados):
+    """
+    (params do SQL, nome do arquivo) da exportação pedida em `dados`
+    (GET ou POST), ou a resposta de erro (redirect com mensagem).
+    """
+    exportacao = EXPORTACOES.get(relatorio)
+    formato = dados.get('formato', 'csv')
+    if exportacao is None or formato not in FORMATOS:
+        messages.error(request, 'Relatório ou formato de exportação inválido.')
+        return redirect('relatorios:relatorio_index')
+
+    params = []
+    arquivo = exportacao['arquivo']
+    if relatorio == 'historico_livro':
+        livro_id = dados.get('livro_id', '')
+        if not livro_id.isdigit():
+            messages.error(request, 'Selecione uma obra para exportar o histórico.')
+            return redirect('relatorios:relatorio_historico_livro')
+        params = [int(livro_id)]
+        arquivo = f'{arquivo}_{livro_id}'
+    return params, f'{arquivo}_{date.today():%Y%m%d}'
+
+@leitura_na_replica
+def exportar_relatorio_view(request, relatorio):
+    """
+    /relatorios/exportar/<relatorio>/?formato=csv|xlsx
+    O histórico exige ?livro_id=.
+    """
+    parametros = _parametros_exportacao(request, relatorio, request.GET)
+    if not isinstance(parametros, tuple):
+        return parametros
+    params, arquivo = parametros
+
+    exportacao = EXPORTACOES[relatorio]
+    return resposta_exportacao(
+        request, arquivo, request.GET.get('formato', 'csv'),
+        exportacao['colunas'], exportacao['sql'], params,
+        completar=exportacao['completar'],
+        completar_async=exportacao['completar_async'],
+    )
+
+
+# --- Relatórios em segundo plano (relatorios/tarefas.py) ---
+# O botão de exportar cria uma tarefa e a resposta volta na hora; o arquivo
+# é gerado pelo worker `processar_relatorios` e a tela da tarefa acompanha
+# o progresso até liberar o download.
+
+@require_POST
+def solicitar_relatorio_view(request, relatorio):
+    """Enfileira a exportação e redireciona para a tela da tarefa."""
+    parametros = _parametros_exportacao(request, relatorio, request.POST)
+    if not isinstance(parametros, tuple):
+        return parametros
+    params, arquivo = parametros
+
+    with connection.cursor() as cursor:
+        id_tarefa = enfileirar(
+            cursor, relatorio, request.POST.get('formato', 'csv'), params, arquivo, request.funcionario['id']
+        )
+    return redirect('relatorios:tarefa_relatorio', id_tarefa=id_tarefa)
+
+def _tarefa_do_funcionario(request, id_tarefa):
+    """A tarefa, se foi pedida pelo funcionário logado; senão 404."""
+    with connection.cursor() as cursor:
+        tarefa = obter_tarefa(cursor, id_tarefa)
+    if tarefa is None or tarefa['id_funcionario'] != request.funcionario['id']:
+        raise Http404('Tarefa não encontrada.')
+    return tarefa
+
+def _situacao_tarefa(tarefa):
+    """Status da tarefa para a tela (JSON da consulta periódica)."""
+    concluida = tarefa['status'] == STATUS_CONCLUIDA
+    percentual = 100 if concluida else 0
+    if not concluida and tarefa['total']:
+        percentual = min(99, tarefa['progresso'] * 100 // tarefa['total'])
+    return {
+        'id_tarefa': tarefa['id_tarefa'],
+        'status': tarefa['status'],
+        'progresso': tarefa['progresso'],
+        'total': tarefa['total'],
+        'percentual': percentual,
+        'erro': tarefa['erro'],
+        'url_download': reverse('relatorios:baixar_tarefa', args=[tarefa['id_tarefa']]) if concluida else None,
+    }
+
+def tarefa_relatorio_view(request, id_tarefa):
+    """Acompanhamento da tarefa (a página consulta status_tarefa_view)."""
+    tarefa = _tarefa_do_funcionario(request, id_tarefa)
+    exportacao = EXPORTACOES.get(tarefa['relatorio'], {})
+    return render(request, 'relatorio/tarefa.html', {
+        'tarefa': tarefa,
+        'titulo': exportacao.get('titulo', tarefa['relatorio']),
+        'situacao': _situacao_tarefa(tarefa),
+    })
+
+def status_tarefa_view(request, id_tarefa):
+    return JsonResponse(_situacao_tarefa(_tarefa_do_funcionario(request, id_tarefa)))
+
+def baixar_tarefa_view(request, id_tarefa):
+    tarefa = _tarefa_do_funcionario(request, id_tarefa)
+    caminho = caminho_arquivo(tarefa)
+    if tarefa['status'] != STATUS_CONCLUIDA or not os.path.exists(caminho):
+        messages.error(request, 'O arquivo deste relatório não está disponível.')
+        return redirect('relatorios:tarefa_relatorio', id_tarefa=id_tarefa)
+    return FileResponse(
+        open(caminho, 'rb'), as_attachment=True,
+        filename=f"{tarefa['arquivo']}.{tarefa['formato']}", content_type=FORMATOS[tarefa['formato']],
+    )